@@ -1,5 +1,6 @@
 from flask import Flask
 from flask_login import LoginManager
+from flask_mail import Mail
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 
@@ -11,6 +12,7 @@ migrate = Migrate()
 login = LoginManager()
 login.login_view = 'auth.login'
 login.login_message = 'Пожалуйста пройдите авторизацию.'
+mail = Mail()
 
 
 def create_app(config_class=Config):
@@ -18,6 +20,8 @@ def create_app(config_class=Config):
     app = Flask(__name__, static_url_path='/static')
     app.config.from_object(config_class)
     app.config['SESSION_SQLALCHEMY'] = db
+    from app.fragments import FragmentCacheExtension
+    app.jinja_env.add_extension(FragmentCacheExtension)
     # Регистрация blueprint
     from app.main import bp
     app.register_blueprint(bp)
@@ -28,10 +32,13 @@ def create_app(config_class=Config):
     app.register_blueprint(bp)
     from app.errors import bp
     app.register_blueprint(bp)
+    from app.cli import bp
+    app.register_blueprint(bp)
     # Связка экземпляров с приложением
     db.init_app(app)
     login.init_app(app)
     migrate.init_app(app, db)
+    mail.init_app(app)
     return app
 
 
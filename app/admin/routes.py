@@ -1,18 +1,23 @@
 import os
+from datetime import datetime, time, timedelta
 from functools import wraps
+from typing import Optional
 
 import sqlalchemy as sa
+import sqlalchemy.orm as so
 from flask import (abort, current_app, flash, redirect, render_template,
                    request, url_for)
 from flask_login import current_user, login_required
 from sqlalchemy import func
 from werkzeug.utils import secure_filename
 
-from app import db
+from app import cache, catalog, db, outbox
 from app.admin import bp
 from app.forms import (CreateCategoryForm, CreateProductForm, EditCategoryForm,
-                       EditProductForm, EditStockForm, UploadForm)
-from app.models import Category, Order, Product, Role, User
+                       EditProductForm, EditStockForm, OrderFilterForm,
+                       UploadForm)
+from app.models import STATUSES, Category, Order, Product, User
+from app.pagination import KeysetPage, keyset_paginate
 
 ALLOWED_EXTENSIONS = set(['txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif'])
 
@@ -21,9 +26,7 @@ def admin_only(f):
     """ Декоратор для проверки, что запрашивающий является админом."""
     @wraps(f)
     def wrapper(*args, **kwargs):
-        admin_role = db.session.scalar(
-            sa.select(Role).where(Role.name == 'admin'))
-        if not current_user.role_id == admin_role.id:
+        if not current_user.is_admin:
             abort(403)
         return f(*args, **kwargs)
     return wrapper
@@ -61,6 +64,7 @@ def upload_product_image(id):
         file.save(os.path.join(
             current_app.config['UPLOAD_FOLDER'], filename))
         product.photo_path = f'images/products/{filename}'
+        catalog.details_changed(product)
         db.session.commit()
     flash('Файл был успешно загружен')
     return redirect(request.url)
@@ -76,7 +80,8 @@ def admin():
     orders_amount = db.session.query(func.count(Order.id)).scalar()
     return render_template('admin/admin.html', users_amount=users_amount,
                            products_amount=products_amount,
-                           orders_amount=orders_amount)
+                           orders_amount=orders_amount,
+                           cache_stats=cache.get_cache('listing').stats())
 
 
 @bp.route('/admin/products', methods=('GET', 'POST'))
@@ -84,9 +89,13 @@ def admin():
 @admin_only
 def products():
     """Отображение товаров в панели администратора."""
-    products = db.session.scalars(
-        sa.select(Product).order_by(Product.id.desc()))
-    return render_template('admin/products.html', products=products)
+    products = keyset_paginate(
+        db.session, sa.select(Product), [(Product.id, True)],
+        request.args.get('cursor'),
+        per_page=current_app.config['ADMIN_PAGE_LENGTH'])
+    # Версия каталога входит в ключ кэша строк таблицы
+    return render_template('admin/products.html', products=products,
+                           catalog_version=cache.get_version(cache.CATALOG))
 
 
 @bp.route('/admin/create_product', methods=('GET', 'POST'))
@@ -114,6 +123,7 @@ def create_product():
         ).all()
         product.categories = categories
         db.session.add(product)
+        catalog.product_created(product)
         db.session.commit()
         flash('Товар успешно добавлен')
         return redirect(url_for('admin.products'))
@@ -128,7 +138,9 @@ def edit_stock(id):
     form = EditStockForm()
     if form.validate_on_submit():
         product = db.session.get(Product, id)
+        old_stock = product.stock
         product.stock = form.amount.data
+        catalog.stock_changed(product, old_stock, product.stock)
         db.session.commit()
         flash('Количество товаров в наличии успешно изменено'
               f' на {product.stock}.')
@@ -149,18 +161,20 @@ def edit_product(id):
     if form.validate_on_submit():
         # Изменение товара в соответствии с данными из формы
         product = db.session.get(Product, int(id))
+        if product is None:  # Товар не найден
+            return redirect(url_for('main.product', id=id))
+        before = catalog.capture(product)
         product.name = form.name.data
         product.price = form.price.data
         product.brand = form.brand.data
         product.description = form.description.data
-        if product is None:  # Товар не найден
-            return redirect(url_for('main.product', id=id))
         categories = db.session.scalars(
             sa.select(Category).where(
                 Category.name.in_(form.categories.data)
             )
         ).all()
         product.categories = categories
+        catalog.product_changed(product, before)
         db.session.commit()
         flash('Редактирование завершено успешно.')
         return redirect(url_for('main.product', id=id))
@@ -184,20 +198,71 @@ def delete_product(id):
     product = db.session.get(Product, int(id))
     if product is None:
         return redirect(url_for('admin.products'))
+    catalog.product_deleted(product)
     db.session.delete(product)
     db.session.commit()
     flash('Удаление успешно завершено.')
     return redirect(url_for('admin.products'))
 
 
+def _order_id_bound(condition: sa.ColumnElement,
+                    last: bool) -> Optional[int]:
+    """Id первого (или последнего при last) по дате создания заказа,
+    удовлетворяющего условию на order.created_at, или None."""
+    order_by = ((Order.created_at.desc(), Order.id.desc()) if last
+                else (Order.created_at, Order.id))
+    return db.session.scalar(
+        sa.select(Order.id).where(condition).order_by(*order_by).limit(1))
+
+
 @bp.route('/admin/orders', methods=('GET', 'POST'))
 @login_required
 @admin_only
 def orders():
-    """Отображение заказов в панели администратора."""
-    orders = db.session.scalars(sa.select(Order).order_by(Order.id.desc()))
-    orders_dict = {order: order.customer for order in orders}
-    return render_template('admin/orders.html', orders=orders_dict)
+    """Отображение заказов в панели администратора.
+
+    Покупатель и статус загружаются одним запросом с заказами. Заказы
+    выводятся по убыванию id по индексам (status_id, id) и (user_id, id).
+    Дата создания заказа назначается при вставке и растёт вместе с id,
+    поэтому диапазон дат переводится в диапазон id двумя запросами
+    по индексу order.created_at, и страница выбирается по курсору
+    в пределах этого диапазона. Время отрисовки страницы не зависит
+    от общего количества заказов. При ошибке в фильтрах выводятся
+    ошибки формы и пустой список.
+    """
+    form = OrderFilterForm(request.args)
+    form.status.choices = [('', 'Все')] + [(name, name)
+                                           for name in STATUSES.names()]
+    if not form.validate():
+        return render_template('admin/orders.html', form=form,
+                               orders=KeysetPage([], None, None))
+    query = sa.select(Order).options(so.joinedload(Order.customer),
+                                     so.joinedload(Order.status))
+    if form.status.data:
+        query = query.where(
+            Order.status_id == STATUSES.find_id(form.status.data))
+    if form.customer.data:
+        # Покупатель ищется по уникальному индексу имени пользователя
+        query = query.where(Order.user_id == (
+            sa.select(User.id)
+            .where(User.username == form.customer.data)
+            .scalar_subquery()))
+    if form.date_from.data:
+        condition = Order.created_at >= datetime.combine(form.date_from.data,
+                                                         time.min)
+        bound = _order_id_bound(condition, last=False)
+        query = query.where(condition, Order.id >= bound
+                            if bound is not None else sa.false())
+    if form.date_to.data:  # Дата окончания включается в диапазон
+        condition = Order.created_at < datetime.combine(
+            form.date_to.data + timedelta(days=1), time.min)
+        bound = _order_id_bound(condition, last=True)
+        query = query.where(condition, Order.id <= bound
+                            if bound is not None else sa.false())
+    orders = keyset_paginate(
+        db.session, query, [(Order.id, True)], request.args.get('cursor'),
+        per_page=current_app.config['ADMIN_PAGE_LENGTH'])
+    return render_template('admin/orders.html', orders=orders, form=form)
 
 
 @bp.route('/admin/confirm_order/<order_number>/', methods=('GET', 'POST'))
@@ -214,6 +279,7 @@ def confirm_order(order_number):
         return redirect(url_for('admin.orders'))
     # Смена статуса заказа
     order.set_status('Подтверждён')
+    outbox.order_changed(order)
     db.session.commit()
     flash('Заказ был успешно подтверждён')
     return redirect(url_for('admin.orders'))
@@ -233,6 +299,7 @@ def finish_order(order_number):
         return redirect(url_for('admin.orders'))
     # Смена статуса заказа
     order.set_status('Завершён')
+    outbox.order_changed(order)
     db.session.commit()
     flash('Заказ был успешно завершён')
     return redirect(url_for('admin.orders'))
@@ -243,7 +310,10 @@ def finish_order(order_number):
 @admin_only
 def users():
     """Отображение пользователей в панели администратора."""
-    users = db.session.scalars(sa.select(User).order_by(User.username))
+    users = keyset_paginate(
+        db.session, sa.select(User), [(User.username, False)],
+        request.args.get('cursor'),
+        per_page=current_app.config['ADMIN_PAGE_LENGTH'])
     return render_template('admin/users.html', users=users)
 
 
@@ -320,6 +390,7 @@ def edit_category(id):
         # Изменение товара в соответствии с данными из формы
         category = db.session.get(Category, int(id))
         category.name = form.name.data
+        catalog.category_changed(category)
         db.session.commit()
         flash('Редактирование завершено успешно.')
         return redirect(url_for('admin.categories'))
@@ -339,6 +410,7 @@ def delete_category(id):
     category = db.session.get(Category, int(id))
     if category is None:
         return redirect(url_for('admin.categories'))
+    catalog.category_deleted(category)
     db.session.delete(category)
     db.session.commit()
     flash('Удаление успешно завершено.')
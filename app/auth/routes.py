@@ -5,7 +5,7 @@ import sqlalchemy as sa
 from flask import flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required, login_user, logout_user
 
-from app import db
+from app import db, guest
 from app.auth import bp
 from app.forms import LoginForm, RegistrationForm
 from app.models import User
@@ -33,6 +33,8 @@ def login():
             flash('Неверные имя пользователя или пароль')
             return redirect(url_for('auth.login'))
         login_user(user, remember=form.remember_me.data)  # Логин пользователя
+        guest.merge_into(user)  # Перенос корзины гостя
+        db.session.commit()
         # Перенаправление после аутентификации
         next_page = request.args.get('next')
         if not next_page or urlsplit(next_page).netloc != '':
@@ -56,6 +58,8 @@ def register():
         user.set_password(form.password.data)
         db.session.add(user)
         db.session.commit()
+        guest.merge_into(user)  # Перенос корзины гостя
+        db.session.commit()
         flash('Вы успешно зарегистрированы!')
         return redirect(url_for('auth.login'))
     return render_template('auth/register.html', form=form)
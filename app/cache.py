@@ -0,0 +1,120 @@
+"""Кэширование результатов в памяти процесса.
+
+Записи кэша вытесняются по давности использования (LRU) и по времени
+жизни (TTL). Актуальность данных определяется счётчиками версий
+в таблице cache_version: изменение данных увеличивает версию в той же
+транзакции, а версия входит в ключ кэша, поэтому после фиксации
+изменения все процессы перестают использовать устаревшие записи.
+
+Пример использования:
+>>> cache = get_cache('listing')
+>>> key = (get_version(CATALOG), 'смартфон')
+>>> result = cache.get(key)
+>>> if result is None:
+...     result = compute()
+...     cache.set(key, result)
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional
+
+import sqlalchemy as sa
+from flask import current_app
+
+from app import db
+from app.models import CacheVersion
+from app.sql import insert
+
+CATALOG = 'catalog'
+
+
+class LRUCache:
+    """Кэш ограниченного размера с временем жизни записей.
+
+    Аргументы:
+        maxsize: Максимальное количество записей, 0 отключает кэш.
+        ttl: Время жизни записи в секундах.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Получение значения по ключу, None если записи нет."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._data[key]  # Время жизни записи истекло
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Сохранение значения, при переполнении вытесняется самая
+        давно использованная запись."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Удаление всех записей."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика использования кэша."""
+        requests = self.hits + self.misses
+        return {'size': len(self._data), 'maxsize': self.maxsize,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / requests if requests else 0.0}
+
+
+def get_cache(name: str) -> LRUCache:
+    """Получение кэша приложения, при первом обращении он создаётся
+    с параметрами <NAME>_CACHE_SIZE и <NAME>_CACHE_TTL из конфигурации."""
+    caches = current_app.extensions.setdefault('caches', {})
+    cache = caches.get(name)
+    if cache is None:
+        prefix = name.upper()
+        cache = LRUCache(current_app.config[f'{prefix}_CACHE_SIZE'],
+                         current_app.config[f'{prefix}_CACHE_TTL'])
+        caches[name] = cache
+    return cache
+
+
+def get_version(name: str) -> int:
+    """Получение текущей версии данных."""
+    version = db.session.scalar(
+        sa.select(CacheVersion.version).where(CacheVersion.name == name))
+    return version or 0
+
+
+def bump_version(name: str) -> int:
+    """Увеличение версии данных в текущей транзакции.
+
+    Возвращает:
+        int: Новая версия данных.
+    """
+    stmt = insert(CacheVersion).values(name=name, version=1)
+    return db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[CacheVersion.name],
+        set_={'version': CacheVersion.version + 1})
+        .returning(CacheVersion.version)).scalar_one()
@@ -0,0 +1,113 @@
+"""Обработка изменений каталога товаров.
+
+Производные от таблицы product структуры (поисковой индекс, счётчики
+фасетов, версия каталога для кэша результатов) обновляются здесь в той же
+транзакции, что и сам товар. Снимок каталога в памяти процессов
+перестраивается по изменившейся версии каталога, индекс подсказок
+обновляется по журналу изменённых товаров.
+Маршруты, изменяющие товары, вызывают эти функции перед commit.
+
+Пример использования:
+>>> before = catalog.capture(product)
+>>> product.brand = form.brand.data
+>>> catalog.product_changed(product, before)
+>>> db.session.commit()
+"""
+from typing import Set
+
+import sqlalchemy as sa
+
+from app import cache, db, facets, search, suggest
+from app.models import Basket, Category, Product, StockHold
+
+# Состояние товара до изменения
+ProductState = Set[facets.FacetKey]
+
+
+def _record_change(product: Product) -> None:
+    """Увеличение версии каталога с записью товара в журнал изменений
+    индекса подсказок."""
+    suggest.record_change(product.id, cache.bump_version(cache.CATALOG))
+
+
+def capture(product: Product) -> ProductState:
+    """Сохранение состояния товара перед его изменением."""
+    return facets.product_facets(product)
+
+
+def product_created(product: Product) -> None:
+    """Обработка добавления товара."""
+    db.session.flush()  # Получение id товара
+    search.index_product(product)
+    facets.update_counts((), facets.product_facets(product))
+    _record_change(product)
+
+
+def product_changed(product: Product, before: ProductState) -> None:
+    """Обработка изменения товара, before — результат capture."""
+    db.session.flush()
+    search.index_product(product)
+    facets.update_counts(before, facets.product_facets(product))
+    _record_change(product)
+
+
+def stock_changed(product: Product, old_stock: int, new_stock: int,
+                  reconcile: bool = True) -> None:
+    """Обработка изменения только количества товара в наличии с old_stock
+    на new_stock.
+
+    При уменьшении наличия количество товара в активных корзинах
+    приводится к нему, если reconcile. Заказы передают reconcile=False:
+    изменение чужих корзин в транзакции заказа блокировало бы их строки
+    вслед за строками товаров, а корзины покупателей и так приводятся
+    к наличию при их оформлении (Basket.reconcile).
+
+    Версии кэша не меняются: наличие при каждом заказе меняло бы одну общую
+    строку cache_version и выстраивало бы параллельные заказы в очередь
+    на её блокировке. Актуальное наличие страницы читают через
+    snapshot.with_stock.
+    """
+    facets.update_counts(facets.stock_facets(old_stock),
+                         facets.stock_facets(new_stock))
+    if reconcile and new_stock < old_stock:
+        Basket.reconcile_product(product.id, new_stock)
+
+
+def details_changed(product: Product) -> None:
+    """Обработка изменения полей товара, не влияющих на поиск и фасеты
+    (изображение). Рейтинг в снимок каталога не входит и версию
+    не меняет."""
+    cache.bump_version(cache.CATALOG)
+
+
+def product_deleted(product: Product) -> None:
+    """Обработка удаления товара, вызывается до db.session.delete."""
+    search.remove_product(product.id)
+    facets.update_counts(facets.product_facets(product), ())
+    # Резервы удаляемого товара теряют смысл
+    db.session.execute(
+        sa.delete(StockHold).where(StockHold.product_id == product.id))
+    _record_change(product)
+
+
+def category_changed(category: Category) -> None:
+    """Обработка переименования категории."""
+    cache.bump_version(cache.CATALOG)
+
+
+def category_deleted(category: Category) -> None:
+    """Обработка удаления категории."""
+    facets.remove_category(category.id)
+    cache.bump_version(cache.CATALOG)
+
+
+def rebuild() -> int:
+    """Полное перестроение производных структур каталога.
+
+    Возвращает:
+        int: Количество проиндексированных товаров.
+    """
+    count = search.rebuild_index()
+    facets.rebuild_counts()
+    cache.bump_version(cache.CATALOG)
+    return count
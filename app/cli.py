@@ -0,0 +1,100 @@
+from datetime import timedelta
+
+import click
+from flask import Blueprint, current_app
+
+from app import (catalog, compaction, db, idempotency, outbox,
+                 reservations)
+
+bp = Blueprint('cli', __name__, cli_group=None)
+
+
+@bp.cli.group('search')
+def search_group():
+    """Команды управления поисковым индексом."""
+
+
+@search_group.command('reindex')
+def reindex():
+    """Перестроение поискового индекса и счётчиков фасетов товаров."""
+    count = catalog.rebuild()
+    db.session.commit()
+    click.echo(f'Проиндексировано товаров: {count}')
+
+
+@bp.cli.group('baskets')
+def baskets_group():
+    """Команды обслуживания корзин."""
+
+
+@baskets_group.command('compact')
+@click.option('--days', type=int, default=None,
+              help='Возраст брошенной корзины в днях '
+                   '(по умолчанию BASKET_MAX_AGE_DAYS).')
+@click.option('--chunk-size', type=int, default=None,
+              help='Количество корзин, удаляемых в одной транзакции '
+                   '(по умолчанию BASKET_COMPACT_CHUNK).')
+def compact(days, chunk_size):
+    """Удаление брошенных корзин, на которые не ссылаются заказы."""
+    days = days or current_app.config['BASKET_MAX_AGE_DAYS']
+    chunk_size = chunk_size or current_app.config['BASKET_COMPACT_CHUNK']
+
+    def progress(result):
+        click.echo(f'Удалено корзин: {result.baskets}, '
+                   f'товаров в корзинах: {result.items}')
+
+    result = compaction.compact(timedelta(days=days), chunk_size, progress)
+    click.echo(f'Готово: корзин {result.baskets}, товаров {result.items} '
+               f'за {result.seconds:.2f} с '
+               f'({result.rows_per_second:.0f} строк/с)')
+
+
+@bp.cli.group('reservations')
+def reservations_group():
+    """Команды управления резервами товаров."""
+
+
+@reservations_group.command('sweep')
+def sweep():
+    """Снятие резервов товаров с истёкшим сроком."""
+    count = reservations.release_expired()
+    db.session.commit()
+    click.echo(f'Снято резервов: {count}')
+
+
+@bp.cli.group('idempotency')
+def idempotency_group():
+    """Команды обслуживания ключей идемпотентности."""
+
+
+@idempotency_group.command('purge')
+def purge():
+    """Удаление результатов запросов старше IDEMPOTENCY_KEY_TTL."""
+    count = idempotency.purge_expired()
+    db.session.commit()
+    click.echo(f'Удалено ключей: {count}')
+
+
+@bp.cli.group('worker')
+def worker_group():
+    """Команды фоновой обработки сообщений outbox."""
+
+
+@worker_group.command('run')
+@click.option('--once', is_flag=True,
+              help='Завершить работу, когда готовых сообщений не осталось.')
+@click.option('--batch-size', type=int, default=None,
+              help='Количество сообщений в пакете '
+                   '(по умолчанию OUTBOX_BATCH_SIZE).')
+@click.option('--pool-size', type=int, default=None,
+              help='Количество потоков (по умолчанию OUTBOX_POOL_SIZE).')
+def worker_run(once, batch_size, pool_size):
+    """Отправка писем и уведомлений о заказах из outbox."""
+    config = current_app.config
+
+    def progress(result):
+        click.echo(f'Выполнено: {result.sent}, с ошибкой: {result.failed}')
+
+    outbox.run(batch_size or config['OUTBOX_BATCH_SIZE'],
+               pool_size or config['OUTBOX_POOL_SIZE'],
+               config['OUTBOX_POLL_INTERVAL'], once=once, progress=progress)
@@ -0,0 +1,103 @@
+"""Удаление брошенных корзин.
+
+Брошенной считается корзина старше заданного возраста, на которую
+не ссылается заказ, если она неактивна или её владелец не заходил
+с тех пор. Корзины удаляются вместе с записями basket_products
+и резервами товаров (stock_hold) частями по chunk_size корзин, каждая
+часть в отдельной короткой транзакции, поэтому задача не держит
+блокировки долго и её можно запускать по расписанию (flask baskets
+compact) во время работы магазина.
+
+Пример использования:
+>>> result = compact(timedelta(days=30), chunk_size=500)
+>>> result.rows_per_second
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, NamedTuple, Optional
+
+import sqlalchemy as sa
+
+from app import db, reservations
+from app.models import Basket, BasketProduct, Order, User
+
+
+class CompactionResult(NamedTuple):
+    """Итог удаления брошенных корзин."""
+    baskets: int
+    items: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        """Количество удалённых строк (корзин и товаров в них) в секунду."""
+        if not self.seconds:
+            return 0.0
+        return (self.baskets + self.items) / self.seconds
+
+
+def abandoned(cutoff: datetime) -> sa.ColumnElement:
+    """Условие отбора брошенных корзин, созданных до cutoff."""
+    return sa.and_(
+        Basket.created_at < cutoff,
+        ~sa.exists().where(Order.basket_id == Basket.id),
+        sa.or_(Basket.active == sa.false(),
+               ~sa.exists().where(User.id == Basket.user_id,
+                                  User.last_seen >= cutoff)))
+
+
+def compact(max_age: timedelta, chunk_size: int,
+            progress: Optional[Callable[[CompactionResult], None]] = None
+            ) -> CompactionResult:
+    """Удаление брошенных корзин старше max_age частями по chunk_size.
+
+    Каждая часть фиксируется отдельно, после неё вызывается progress
+    с итогом на текущий момент.
+
+    Возвращает:
+        CompactionResult: Количество удалённых корзин, товаров в них
+          и время работы.
+    """
+    cutoff = datetime.now(timezone.utc) - max_age
+    condition = abandoned(cutoff)
+    started = time.monotonic()
+    baskets = items = 0
+    last_id = 0
+    while True:
+        ids = db.session.scalars(
+            sa.select(Basket.id)
+            .where(Basket.id > last_id, condition)
+            .order_by(Basket.id).limit(chunk_size)).all()
+        if not ids:
+            break
+        last_id = ids[-1]
+        # Условие повторяется при удалении на случай, если по корзине
+        # успели оформить заказ
+        chunk = sa.select(Basket.id).where(Basket.id.in_(ids), condition)
+        # Резервы корзин снимаются с возвратом счётчиков reserved
+        reservations.release_baskets(chunk)
+        items += db.session.execute(
+            sa.select(sa.func.count()).select_from(BasketProduct)
+            .where(BasketProduct.basket_id.in_(chunk))).scalar_one()
+        # Корзины удаляются до своих товаров, поэтому триггер итогов
+        # корзины при удалении товаров не находит корзину и ничего
+        # не изменяет. На PostgreSQL товары удаляются каскадно вместе
+        # с корзиной, на SQLite (внешние ключи не проверяются) —
+        # следующим запросом
+        deleted = db.session.scalars(
+            sa.delete(Basket).where(Basket.id.in_(ids), condition)
+            .returning(Basket.id)
+            .execution_options(synchronize_session=False)).all()
+        baskets += len(deleted)
+        if deleted:
+            db.session.execute(
+                sa.delete(BasketProduct)
+                .where(BasketProduct.basket_id.in_(deleted))
+                .execution_options(synchronize_session=False))
+        db.session.commit()
+        if progress is not None:
+            progress(CompactionResult(baskets, items,
+                                      time.monotonic() - started))
+        if len(ids) < chunk_size:
+            break
+    return CompactionResult(baskets, items, time.monotonic() - started)
@@ -0,0 +1,134 @@
+"""Кэш справочников (ролей и статусов заказов) в памяти процесса.
+
+Справочник загружается одним запросом при первом обращении и хранится
+в app.extensions в виде словаря имя -> id, поэтому поиск роли или статуса
+по имени не обращается к базе. Имя, которого нет в кэше, вызывает одну
+повторную загрузку (справочник мог пополниться в другом процессе); если
+записи нет и после неё, имя запоминается как отсутствующее до следующего
+сброса кэша. Отсутствующая запись, необходимая для работы, создаётся
+в текущей транзакции без её фиксации.
+
+Изменение записей справочника через ORM сбрасывает кэш. До окончания
+транзакции, в которой справочник изменился, загруженные в этой сессии
+данные не сохраняются, так как транзакция может быть откачена. Признак
+изменения хранится в session.info изменившей сессии, поэтому завершение
+транзакций других сессий на него не влияет.
+
+Пример использования:
+>>> ROLES = EnumRegistry(Role)
+>>> user.role_id = ROLES.get_id('admin')
+"""
+from typing import Dict, List, Optional
+
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from flask import current_app, has_app_context
+
+from app import db
+
+# Ключ session.info со справочниками, изменёнными в текущей транзакции
+PENDING_KEY = 'enums_pending'
+
+
+class EnumRegistry:
+    """Кэш справочника модели с полями id и name."""
+
+    def __init__(self, model):
+        self.model = model
+        sa.event.listen(model, 'after_insert', self._changed)
+        sa.event.listen(model, 'after_update', self._updated)
+        sa.event.listen(model, 'after_delete', self._changed)
+
+    def _state(self) -> dict:
+        """Состояние кэша текущего приложения."""
+        registries = current_app.extensions.setdefault('enums', {})
+        return registries.setdefault(self.model.__tablename__,
+                                     {'ids': None, 'missing': set()})
+
+    def _changed(self, mapper, connection, target) -> None:
+        """Сброс кэша при добавлении или удалении записи справочника."""
+        self._mark_pending(so.object_session(target))
+
+    def _updated(self, mapper, connection, target) -> None:
+        """Сброс кэша при изменении записи справочника. Изменение только
+        связей записи (например, списка пользователей роли) кэш
+        не затрагивает."""
+        attrs = sa.inspect(target).attrs
+        if attrs.name.history.has_changes() or attrs.id.history.has_changes():
+            self._mark_pending(so.object_session(target))
+
+    def _mark_pending(self, session: Optional[so.Session]) -> None:
+        """Сброс кэша и запрет его заполнения в сессии session до окончания
+        её транзакции."""
+        self.invalidate()
+        if session is not None:
+            session.info.setdefault(PENDING_KEY, set()).add(self)
+
+    def invalidate(self) -> None:
+        """Сброс кэша."""
+        state = self._state()
+        state['ids'] = None
+        state['missing'] = set()
+
+    def load(self) -> Dict[str, int]:
+        """Загрузка справочника одним запросом.
+
+        Возвращает:
+            Dict[str, int]: Словарь, где ключ — имя, а значение — id.
+        """
+        rows = db.session.execute(
+            sa.select(self.model.name, self.model.id)
+            .order_by(self.model.id)).all()
+        # При повторе имени используется запись с наименьшим id
+        ids: Dict[str, int] = {}
+        for name, id in rows:
+            ids.setdefault(name, id)
+        if self._cacheable():
+            self._state()['ids'] = ids
+        return ids
+
+    def _cacheable(self) -> bool:
+        """Можно ли кэшировать данные, прочитанные в текущей сессии."""
+        return self not in db.session.info.get(PENDING_KEY, ())
+
+    def find_id(self, name: str) -> Optional[int]:
+        """Id записи по имени или None, если записи нет."""
+        state = self._state()
+        ids = state['ids']
+        if ids is not None and (name in ids or name in state['missing']):
+            return ids.get(name)
+        ids = self.load()
+        if name not in ids and self._cacheable():
+            state['missing'].add(name)
+        return ids.get(name)
+
+    def get_id(self, name: str) -> int:
+        """Id записи по имени. Отсутствующая запись добавляется в текущую
+        транзакцию, транзакция не фиксируется."""
+        id = self.find_id(name)
+        if id is None:  # В базе отсутствует запись, необходимая для работы
+            record = self.model(name=name)
+            db.session.add(record)
+            db.session.flush([record])
+            id = record.id
+        return id
+
+    def names(self) -> List[str]:
+        """Имена всех записей в порядке id."""
+        ids = self._state()['ids']
+        if ids is None:
+            ids = self.load()
+        return list(ids)
+
+
+@sa.event.listens_for(so.Session, 'after_commit')
+@sa.event.listens_for(so.Session, 'after_rollback')
+def _transaction_ended(session: so.Session) -> None:
+    """Сброс кэша справочников, изменённых в завершённой транзакции сессии,
+    и разрешение его заполнения."""
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending or not has_app_context():
+        return
+    # Другие сессии могли заполнить кэш данными до фиксации изменений
+    for registry in pending:
+        registry.invalidate()
@@ -0,0 +1,201 @@
+"""Фасетная фильтрация каталога.
+
+Количество товаров по каждому значению фасета хранится в таблице
+facet_count и изменяется на разницу при каждом изменении товара, поэтому
+страница каталога читает готовые счётчики, а не выполняет GROUP BY
+по всем товарам. После изменения PRICE_RANGES счётчики необходимо
+перестроить командой flask search reindex.
+"""
+from collections import Counter
+from typing import (Dict, Iterable, List, Mapping, NamedTuple, Optional, Set,
+                    Tuple)
+
+import sqlalchemy as sa
+from flask import current_app
+
+from app import db
+from app.models import Category, FacetCount, Product, categories
+from app.sql import insert
+
+# Фасет и его значение, например ('brand', 'Apple')
+FacetKey = Tuple[str, str]
+FACETS = ('category', 'brand', 'price', 'stock')
+FACET_TITLES = {'category': 'Категория', 'brand': 'Бренд', 'price': 'Цена',
+                'stock': 'Наличие'}
+IN_STOCK = 'in'
+
+
+class FacetValue(NamedTuple):
+    """Значение фасета для отображения в фильтрах."""
+    value: str
+    label: str
+    total: int
+
+
+def price_ranges() -> List[Tuple[int, Optional[int]]]:
+    """Диапазоны цен [нижняя граница, верхняя граница) из конфигурации."""
+    bounds = list(current_app.config['PRICE_RANGES'])
+    return list(zip(bounds, bounds[1:] + [None]))
+
+
+def price_values() -> List[str]:
+    """Значения фасета цены, например ['0-1000', ..., '100000-']."""
+    return [f'{low}-{high}' if high is not None else f'{low}-'
+            for low, high in price_ranges()]
+
+
+def price_range(price: int) -> Optional[str]:
+    """Значение фасета цены для товара."""
+    for (low, high), value in zip(price_ranges(), price_values()):
+        if price >= low and (high is None or price < high):
+            return value
+    return None
+
+
+def product_facets(product: Product) -> Set[FacetKey]:
+    """Получение значений фасетов, к которым относится товар."""
+    keys = {('category', str(category.id))
+            for category in product.categories}
+    if product.brand:
+        keys.add(('brand', product.brand))
+    price = price_range(product.price)
+    if price is not None:
+        keys.add(('price', price))
+    if product.stock > 0:
+        keys.add(('stock', IN_STOCK))
+    return keys
+
+
+def stock_facets(stock: int) -> Set[FacetKey]:
+    """Значения фасетов, зависящие только от количества товара."""
+    return {('stock', IN_STOCK)} if stock > 0 else set()
+
+
+def update_counts(before: Iterable[FacetKey],
+                  after: Iterable[FacetKey]) -> None:
+    """Изменение счётчиков на разницу между состояниями товара.
+
+    Пример использования:
+    >>> before = product_facets(product)
+    >>> product.brand = 'Новый бренд'
+    >>> update_counts(before, product_facets(product))
+    """
+    deltas = Counter(after)
+    deltas.subtract(before)
+    rows = [{'facet': facet, 'value': value, 'count': delta}
+            for (facet, value), delta in deltas.items() if delta]
+    if not rows:
+        return
+    stmt = insert(FacetCount)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[FacetCount.facet, FacetCount.value],
+        set_={'count': FacetCount.count + stmt.excluded.count}), rows)
+
+
+def remove_category(category_id: int) -> None:
+    """Удаление счётчика удаляемой категории."""
+    db.session.execute(sa.delete(FacetCount).where(
+        FacetCount.facet == 'category',
+        FacetCount.value == str(category_id)))
+
+
+def get_counts() -> Dict[str, List[FacetValue]]:
+    """Получение счётчиков всех фасетов для отображения в фильтрах.
+
+    Возвращает:
+        Dict[str, List[FacetValue]]: Словарь, где ключ — фасет,
+          а значение — список его значений с количеством товаров.
+    """
+    counts: Dict[str, List[FacetValue]] = {facet: [] for facet in FACETS}
+    rows = db.session.execute(
+        sa.select(FacetCount.facet, FacetCount.value, FacetCount.count)
+        .where(FacetCount.count > 0)).all()
+    category_names = {}
+    if any(facet == 'category' for facet, _, _ in rows):
+        category_names = {str(id): name for id, name in db.session.execute(
+            sa.select(Category.id, Category.name))}
+    for facet, value, count in rows:
+        if facet not in counts:
+            continue
+        if facet == 'category':
+            label = category_names.get(value, value)
+        elif facet == 'price':
+            low, high = value.split('-')
+            label = f'{low} – {high}' if high else f'от {low}'
+        elif facet == 'stock':
+            label = 'В наличии'
+        else:
+            label = value
+        counts[facet].append(FacetValue(value, label, count))
+    counts['category'].sort(key=lambda item: item.label)
+    counts['brand'].sort(key=lambda item: item.label)
+    counts['price'].sort(key=lambda item: int(item.value.split('-')[0]))
+    return counts
+
+
+def parse_filters(args: Mapping[str, str]) -> Dict[str, str]:
+    """Получение корректных фильтров из параметров запроса."""
+    filters = {}
+    category = args.get('category', '')
+    if category.isdigit():
+        filters['category'] = category
+    if args.get('brand'):
+        filters['brand'] = args['brand']
+    price = args.get('price', '')
+    if price in price_values():
+        filters['price'] = price
+    if args.get('stock') == IN_STOCK:
+        filters['stock'] = IN_STOCK
+    return filters
+
+
+def filter_query(query: sa.Select, filters: Mapping[str, str]) -> sa.Select:
+    """Применение фильтров (результат parse_filters) к запросу товаров."""
+    if 'category' in filters:
+        query = query.where(Product.id.in_(
+            sa.select(categories.c.product_id)
+            .where(categories.c.category_id == int(filters['category']))))
+    if 'brand' in filters:
+        query = query.where(Product.brand == filters['brand'])
+    if 'price' in filters:
+        low, high = filters['price'].split('-')
+        query = query.where(Product.price >= int(low))
+        if high:
+            query = query.where(Product.price < int(high))
+    if 'stock' in filters:
+        query = query.where(Product.stock > 0)
+    return query
+
+
+def rebuild_counts() -> int:
+    """Полный пересчёт счётчиков фасетов по таблице product.
+
+    Возвращает:
+        int: Количество записанных значений фасетов.
+    """
+    db.session.execute(sa.delete(FacetCount))
+    rows = [{'facet': 'category', 'value': str(category_id), 'count': count}
+            for category_id, count in db.session.execute(
+                sa.select(categories.c.category_id, sa.func.count())
+                .group_by(categories.c.category_id))]
+    rows += [{'facet': 'brand', 'value': brand, 'count': count}
+             for brand, count in db.session.execute(
+                 sa.select(Product.brand, sa.func.count())
+                 .where(Product.brand.is_not(None), Product.brand != '')
+                 .group_by(Product.brand))]
+    price_counts: Counter = Counter()
+    for price, count in db.session.execute(
+            sa.select(Product.price, sa.func.count())
+            .group_by(Product.price)):
+        value = price_range(price)
+        if value is not None:
+            price_counts[value] += count
+    rows += [{'facet': 'price', 'value': value, 'count': count}
+             for value, count in price_counts.items()]
+    in_stock = db.session.scalar(
+        sa.select(sa.func.count()).where(Product.stock > 0))
+    if in_stock:
+        rows.append({'facet': 'stock', 'value': IN_STOCK, 'count': in_stock})
+    if rows:
+        db.session.execute(sa.insert(FacetCount), rows)
+    return len(rows)
@@ -1,7 +1,11 @@
+import uuid
+
 from flask_wtf import FlaskForm
-from wtforms import SubmitField
+from wtforms import HiddenField, SubmitField
 
 
 class CancelOrderForm(FlaskForm):
     """Форма отмены заказа."""
+    # Ключ идемпотентности (app.idempotency)
+    idempotency_key = HiddenField(default=lambda: uuid.uuid4().hex)
     submit = SubmitField('Отменить заказ')
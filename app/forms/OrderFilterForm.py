@@ -0,0 +1,16 @@
+from flask_wtf import FlaskForm
+from wtforms import DateField, SelectField, StringField, SubmitField
+from wtforms.validators import Length, Optional
+
+
+class OrderFilterForm(FlaskForm):
+    """Форма фильтрации заказов в панели администратора (GET запрос)."""
+    class Meta:
+        csrf = False
+
+    status = SelectField('Статус', choices=[('', 'Все')], default='')
+    customer = StringField('Покупатель (имя пользователя)',
+                           validators=[Optional(), Length(max=64)])
+    date_from = DateField('Создан с', validators=[Optional()])
+    date_to = DateField('Создан по', validators=[Optional()])
+    submit = SubmitField('Найти')
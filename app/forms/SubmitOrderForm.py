@@ -1,5 +1,7 @@
+import uuid
+
 from flask_wtf import FlaskForm
-from wtforms import StringField, SubmitField
+from wtforms import HiddenField, StringField, SubmitField
 from wtforms.validators import DataRequired, Length
 
 
@@ -7,4 +9,6 @@ class SubmitOrderForm(FlaskForm):
     """Форма оформления заказа."""
     address = StringField('Адрес', validators=[DataRequired(),
                                                Length(max=60)])
+    # Повторная отправка формы с тем же ключом не создаёт второй заказ
+    idempotency_key = HiddenField(default=lambda: uuid.uuid4().hex)
     submit = SubmitField('Оформить заказ')
@@ -13,9 +13,10 @@ from app.forms.FinishOrderForm import FinishOrderForm
 from app.forms.CreateCategoryForm import CreateCategoryForm
 from app.forms.EditCategoryForm import EditCategoryForm
 from app.forms.ReviewForm import ReviewForm
+from app.forms.OrderFilterForm import OrderFilterForm
 
 __all__ = ['LoginForm', 'RegistrationForm', 'UploadForm', 'EditProfileForm',
            'CheckoutForm', 'SubmitOrderForm', 'CancelOrderForm',
            'CreateProductForm', 'EditStockForm', 'EditProductForm',
            'ConfirmOrderForm', 'FinishOrderForm', 'CreateCategoryForm',
-           'EditCategoryForm', 'ReviewForm']
+           'EditCategoryForm', 'ReviewForm', 'OrderFilterForm']
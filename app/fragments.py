@@ -0,0 +1,51 @@
+"""Кэширование фрагментов шаблонов.
+
+Расширение Jinja добавляет тег cache, результат отрисовки тела которого
+сохраняется в кэше 'fragment' (app.cache) по ключу из перечисленных
+значений. Ключ должен включать всё, от чего зависит фрагмент, обычно id
+объекта и версию данных; если какое-либо значение ключа не определено
+в контексте шаблона, фрагмент отрисовывается без кэша.
+
+Попадание в кэш стоит около 10 мкс (benchmarks/fragment_benchmark.py),
+поэтому кэшируются только фрагменты, отрисовка которых заметно дороже,
+например строки таблицы с несколькими вызовами url_for.
+
+Пример использования в шаблоне:
+    {% cache 'product', product.id, catalog_version %}
+        <h5>{{ product.name }}</h5>
+    {% endcache %}
+"""
+from typing import Callable, List
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from jinja2.runtime import Undefined
+from markupsafe import Markup
+
+from app import cache
+
+
+class FragmentCacheExtension(Extension):
+    """Тег {% cache ключ, ... %}...{% endcache %}."""
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render', [nodes.List(key)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, parts: List, caller: Callable[[], str]) -> str:
+        if any(isinstance(part, Undefined) for part in parts):
+            return caller()
+        fragments = cache.get_cache('fragment')
+        key = tuple(parts)
+        fragment = fragments.get(key)
+        if fragment is None:
+            fragment = Markup(caller())
+            fragments.set(key, fragment)
+        return fragment
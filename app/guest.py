@@ -0,0 +1,148 @@
+"""Корзина гостя.
+
+Пока покупатель не вошёл в систему, содержимое корзины хранится
+в подписанной cookie сессии Flask в виде {"<id товара>": количество},
+поэтому просмотр каталога и работа с корзиной гостя не изменяют базу
+данных. При входе и регистрации корзина гостя переносится в корзину
+пользователя одним запросом (merge_into).
+
+Пример использования:
+>>> basket = GuestBasket()
+>>> basket.add_product(product_id)
+>>> merge_into(user)  # После login_user
+"""
+from typing import Dict, List, Optional
+
+import sqlalchemy as sa
+from flask import current_app, session
+
+from app import db
+from app.models import Product, User
+
+SESSION_KEY = 'basket'
+
+
+class GuestBasket:
+    """Корзина гостя в сессии с тем же интерфейсом, что и Basket
+    для маршрутов корзины. Количество товаров ограничено настройкой
+    GUEST_BASKET_SIZE, чтобы cookie оставалась небольшой."""
+
+    def __init__(self):
+        self.amounts: Dict[int, int] = {
+            int(product_id): amount
+            for product_id, amount in session.get(SESSION_KEY, {}).items()}
+
+    def __repr__(self):
+        return f'<GuestBasket products={len(self.amounts)}>'
+
+    def _save(self) -> None:
+        if self.amounts:
+            session[SESSION_KEY] = {str(product_id): amount for
+                                    product_id, amount in self.amounts.items()}
+        else:
+            session.pop(SESSION_KEY, None)
+
+    def get_basket_amounts(self, product_ids: List[int]) -> Dict[int, int]:
+        """Получение количества заданных товаров в корзине."""
+        return {product_id: self.amounts[product_id]
+                for product_id in product_ids if product_id in self.amounts}
+
+    def get_basket_products(self) -> Dict[Product, int]:
+        """ Получение количества товаров в корзине.
+
+        Возвращает:
+            Dict[Product, int]: Словарь, где ключ — продукт,
+              а значение — количество.
+        """
+        if not self.amounts:
+            return {}
+        basket_items = dict()
+        products = db.session.scalars(
+            sa.select(Product).where(Product.id.in_(self.amounts))
+            .order_by(Product.id.desc()))
+        for product in products:
+            # Наличие могло уменьшиться после добавления в корзину
+            amount = min(self.amounts[product.id], product.stock)
+            if amount:
+                basket_items[product] = amount
+        return basket_items
+
+    def get_total_amount(self) -> int:
+        """ Получение суммарной стоимости всех товаров в корзине."""
+        return sum(product.price * amount
+                   for product, amount in self.get_basket_products().items())
+
+    def add_product(self, product_id: int, count: int = 1) -> Optional[int]:
+        """Добавление count единиц товара в корзину.
+
+        Возвращает:
+            Optional[int]: Количество товара в корзине после добавления
+              или None, если товар не найден.
+        """
+        stock = db.session.scalar(
+            sa.select(Product.stock).where(Product.id == product_id))
+        if stock is None:
+            return None
+        amount = self.amounts.get(product_id, 0)
+        if (product_id not in self.amounts and len(self.amounts)
+                >= current_app.config['GUEST_BASKET_SIZE']):
+            return amount  # Корзина гостя заполнена
+        if amount < stock:
+            amount = min(amount + count, stock)
+            self.amounts[product_id] = amount
+            self._save()
+        return amount
+
+    def remove_product(self, product_id: int,
+                       count: int = 1) -> Optional[int]:
+        """Удаление count единиц товара из корзины.
+
+        Возвращает:
+            Optional[int]: Количество товара в корзине после удаления
+              или None, если товар не найден.
+        """
+        if product_id not in self.amounts:
+            return self._get_amount(product_id)
+        amount = max(self.amounts[product_id] - count, 0)
+        if amount:
+            self.amounts[product_id] = amount
+        else:
+            del self.amounts[product_id]
+        self._save()
+        return amount
+
+    def update_products(self, deltas: Dict[int, int]
+                        ) -> Dict[int, Optional[int]]:
+        """Изменение количества нескольких товаров в корзине.
+
+        Возвращает:
+            Dict[int, Optional[int]]: Количество товаров после изменения,
+              None для ненайденных товаров.
+        """
+        amounts = {}
+        for product_id, delta in sorted(deltas.items()):
+            if delta > 0:
+                amounts[product_id] = self.add_product(product_id, delta)
+            elif delta < 0:
+                amounts[product_id] = self.remove_product(product_id, -delta)
+            else:
+                amounts[product_id] = self._get_amount(product_id)
+        return amounts
+
+    def _get_amount(self, product_id: int) -> Optional[int]:
+        """Количество товара в корзине, None если товар не найден."""
+        if product_id in self.amounts:
+            return self.amounts[product_id]
+        exists = db.session.scalar(
+            sa.select(Product.id).where(Product.id == product_id))
+        return None if exists is None else 0
+
+
+def merge_into(user: User) -> None:
+    """Перенос корзины гостя в актуальную корзину пользователя одним
+    запросом и очистка корзины в сессии. Транзакция не фиксируется."""
+    guest = GuestBasket()
+    if not guest.amounts:
+        return
+    user.get_basket().add_products(guest.amounts)
+    session.pop(SESSION_KEY, None)
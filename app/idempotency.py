@@ -0,0 +1,109 @@
+"""Идемпотентность запросов, изменяющих заказы.
+
+Запрос с ключом идемпотентности (скрытое поле формы idempotency_key или
+заголовок Idempotency-Key) выполняется один раз: ключ занимается записью
+IdempotencyKey до выполнения обработчика, а после него в запись
+сохраняется результат (код ответа, адрес перенаправления и сообщение
+flash). Повторный запрос с тем же ключом получает сохранённый результат
+одним чтением по первичному ключу и не затрагивает заказы и товары.
+Записи старше IDEMPOTENCY_KEY_TTL секунд удаляются командой
+flask idempotency purge.
+
+Пример использования:
+>>> @bp.route('/submit_order/', methods=('POST',))
+... @login_required
+... @idempotent
+... def submit_order():
+...     ...
+"""
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from typing import Optional
+
+import sqlalchemy as sa
+from flask import (current_app, flash, redirect, request, session,
+                   url_for)
+from flask_login import current_user
+
+from app import db
+from app.models import IdempotencyKey
+from app.sql import insert
+
+FORM_FIELD = 'idempotency_key'
+HEADER = 'Idempotency-Key'
+
+
+def request_key() -> Optional[str]:
+    """Ключ идемпотентности текущего запроса."""
+    key = request.form.get(FORM_FIELD) or request.headers.get(HEADER)
+    if not key or len(key) > 64:
+        return None
+    return key
+
+
+def _replay(stored: IdempotencyKey):
+    """Ответ на повторный запрос."""
+    if stored.status_code is None:  # Первый запрос ещё выполняется
+        flash('Запрос уже выполняется')
+        return redirect(url_for('main.index'))
+    if stored.message:
+        flash(stored.message)
+    return redirect(stored.location or url_for('main.index'),
+                    code=stored.status_code)
+
+
+def idempotent(view):
+    """Декоратор маршрута, выполняющий его один раз для каждого ключа
+    идемпотентности. Ответ маршрута должен быть перенаправлением."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request_key()
+        if key is None:
+            return view(*args, **kwargs)
+        identity = {'user_id': current_user.id, 'key': key}
+        stored = db.session.get(IdempotencyKey, (current_user.id, key))
+        if stored is not None:
+            return _replay(stored)
+        # Ключ занимается в отдельной транзакции, чтобы параллельный
+        # повторный запрос увидел, что запрос уже выполняется
+        claimed = db.session.scalar(
+            insert(IdempotencyKey).values(**identity)
+            .on_conflict_do_nothing()
+            .returning(IdempotencyKey.key))
+        db.session.commit()
+        if claimed is None:
+            return _replay(db.session.get(IdempotencyKey,
+                                          (current_user.id, key)))
+        flashes = len(session.get('_flashes', ()))
+        try:
+            response = view(*args, **kwargs)
+        except Exception:
+            # Запрос не выполнен, ключ освобождается для повтора
+            db.session.rollback()
+            db.session.execute(sa.delete(IdempotencyKey).filter_by(
+                **identity))
+            db.session.commit()
+            raise
+        messages = session.get('_flashes', [])[flashes:]
+        db.session.execute(
+            sa.update(IdempotencyKey).filter_by(**identity)
+            .values(status_code=response.status_code,
+                    location=response.headers.get('Location'),
+                    message=messages[0][1] if messages else None))
+        db.session.commit()
+        return response
+    return wrapper
+
+
+def purge_expired() -> int:
+    """Удаление записей старше IDEMPOTENCY_KEY_TTL секунд одним запросом.
+    Транзакция не фиксируется.
+
+    Возвращает:
+        int: Количество удалённых записей.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(
+        seconds=current_app.config['IDEMPOTENCY_KEY_TTL'])
+    return db.session.execute(
+        sa.delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff)
+    ).rowcount
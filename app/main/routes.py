@@ -1,36 +1,84 @@
+from typing import Dict, List, NamedTuple, Optional, Union
+
 import sqlalchemy as sa
+import sqlalchemy.orm as so
 from flask import (abort, current_app, flash, jsonify, redirect,
                    render_template, request, url_for)
 from flask_login import current_user, login_required
 
-from app import db
+from app import (cache, catalog, db, facets, outbox, reservations, search,
+                 snapshot, suggest)
+from app.idempotency import idempotent
 from app.forms import (CancelOrderForm, CheckoutForm, ConfirmOrderForm,
                        EditProfileForm, EditStockForm, FinishOrderForm,
                        ReviewForm, SubmitOrderForm, UploadForm)
+from app.guest import GuestBasket
 from app.main import bp
-from app.models import Basket, BasketProduct, Order, Product, Review
+from app.models import Basket, Order, Product, Review
+from app.pagination import SortKey, keyset_paginate
+
+
+# Наибольшее количество товаров в одном запросе изменения корзины
+MAX_BATCH_ITEMS = 100
+# Наибольшее изменение количества одного товара в запросе
+MAX_ITEM_DELTA = 10_000
+# Наибольший id товара (BIGINT), большие значения не помещаются в запрос
+MAX_PRODUCT_ID = 2 ** 63 - 1
+
+
+class ExplorePage(NamedTuple):
+    """Страница каталога в виде, пригодном для кэширования."""
+    ids: List[int]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+    fuzzy: bool
+
+
+def current_basket() -> Union[Basket, GuestBasket]:
+    """Корзина текущего покупателя: из базы данных для вошедшего
+    пользователя, из сессии для гостя."""
+    if current_user.is_authenticated:
+        return current_user.get_basket()
+    return GuestBasket()
+
+
+def basket_amounts(product_ids: List[int]) -> Dict[int, int]:
+    """Количество заданных товаров в корзине текущего покупателя."""
+    if current_user.is_authenticated:
+        return current_user.get_basket_amounts(product_ids)
+    return GuestBasket().get_basket_amounts(product_ids)
 
 
 @bp.route('/', methods=('GET', 'POST'))
 @bp.route('/index', methods=('GET', 'POST'))
 @login_required
 def index():
-    """Отображение стартовой страницы."""
-    orders = current_user.user_orders
+    """Отображение стартовой страницы с историей заказов.
+
+    Заказы выводятся постранично по курсору вместе со статусами (joinedload),
+    поэтому количество запросов не зависит от числа заказов на странице.
+    """
+    orders = keyset_paginate(
+        db.session,
+        sa.select(Order).where(Order.user_id == current_user.id)
+        .options(so.joinedload(Order.status)),
+        [(Order.id, True)], request.args.get('cursor'),
+        per_page=current_app.config['PAGE_LENGTH'])
     return render_template('main/index.html', orders=orders)
 
 
 @bp.route('/product/<id>', methods=('GET', 'POST'))
-@login_required
 def product(id):
     """Отображение информации о товаре по id."""
-    product = db.session.get(Product, int(id))
+    # Страница товара отображается из снимка каталога
+    product = snapshot.get_snapshot().get(int(id))
     if product is None:  # Продукт не найден
         abort(404)
     form = UploadForm()
     edit_stock_form = EditStockForm()
     review_form = ReviewForm()
-    if review_form.validate_on_submit():  # Если был написан отзыв
+    # Если был написан отзыв (отзывы оставляют только вошедшие пользователи)
+    if current_user.is_authenticated and review_form.validate_on_submit():
         previous_review = db.session.scalar(
             sa.select(Review)
             .where(Review.user_id == current_user.id,
@@ -43,19 +91,29 @@ def product(id):
         review = Review(user_id=current_user.id, product_id=product.id,
                         rating=rating, review=review_text)
         db.session.add(review)
-        product.update_rating()  # Обновление среднего рейтинга товара
+        db_product = db.session.get(Product, product.id)
+        db_product.update_rating()  # Обновление среднего рейтинга товара
         db.session.commit()
+    # Наличие и рейтинг меняются без изменения версии каталога и читаются
+    # из базы одним запросом
+    row = db.session.execute(
+        sa.select(Product.stock, Product.rating)
+        .where(Product.id == product.id)).first()
+    if row is None:  # Товар удалён после построения снимка
+        abort(404)
+    if row.stock != product.stock:
+        product = product.replace(stock=row.stock)
+    reviews = db.session.scalars(
+        sa.select(Review).where(Review.product_id == product.id)
+        .options(so.joinedload(Review.user))
+        .order_by(Review.id.desc())).all()
     # Получение количества заданного продукта в корзине
-    basket = current_user.get_basket()
-    basket_item = db.session.scalar(sa.select(BasketProduct).where(
-        BasketProduct.basket_id == basket.id,
-        BasketProduct.product_id == product.id
-    ))
-    amount = basket_item.amount if basket_item else 0
+    amount = basket_amounts([product.id]).get(product.id, 0)
     return render_template('main/product.html', product=product,
+                           rating=row.rating,
                            categories=product.categories, amount=amount,
                            form=form, edit_stock_form=edit_stock_form,
-                           review_form=review_form, reviews=product.reviews)
+                           review_form=review_form, reviews=reviews)
 
 
 @bp.route('/profile', methods=('GET', 'POST'))
@@ -97,133 +155,178 @@ def order(order_number):
     if order is None:  # Заказ не найден
         abort(404)
     # Пользователь не владелец заказа и не админ
-    elif (current_user.role.name != 'admin'
+    elif (not current_user.is_admin
           and current_user.id != order.user_id):
         abort(404)  # Посторонний не получает информацию о наличии заказа
-    # Получение информации о корзине по заказу
-    basket = db.session.get(Basket, order.basket_id)
-    basket_items = basket.get_basket_products()
-    total_amount = basket.get_total_amount(basket_items)
     cancel_form = CancelOrderForm()
     confirm_form = ConfirmOrderForm()
     finish_form = FinishOrderForm()
     return render_template('main/order.html', order=order,
-                           products=basket_items, total_amount=total_amount,
+                           items=order.items,
+                           total_amount=order.total_amount,
                            cancel_form=cancel_form, confirm_form=confirm_form,
                            finish_form=finish_form)
 
 
+def explore_page(search_query: str, filters: Dict[str, str],
+                 cursor: Optional[str]) -> ExplorePage:
+    """Получение id товаров страницы каталога и курсоров соседних страниц."""
+    # Если был введён поисковой запрос, то результат берётся из
+    # полнотекстового индекса и сортируется по релевантности
+    query = sa.select(Product.id)
+    keys: List[SortKey] = [(Product.id, True)]
+    if search_query:
+        query = search.search_products(search_query)
+        relevance = query.selected_columns.relevance
+        query = query.with_only_columns(Product.id, relevance,
+                                        maintain_column_froms=True)
+        keys = [(relevance, False), (Product.id, True)]
+    # Фильтрация по выбранным значениям фасетов
+    query = facets.filter_query(query, filters)
+    products = keyset_paginate(db.session, query, keys, cursor,
+                               per_page=current_app.config['PAGE_LENGTH'])
+    ids = products.items
+    # Если по запросу ничего не найдено, то показываются товары
+    # с похожими названиями (запрос мог быть введён с опечаткой)
+    fuzzy = False
+    if search_query and not ids and cursor is None:
+        ids = [product.id for product in search.fuzzy_search(
+            search_query, limit=current_app.config['PAGE_LENGTH'])]
+        if filters and ids:
+            allowed = set(db.session.scalars(facets.filter_query(
+                sa.select(Product.id).where(Product.id.in_(ids)), filters)))
+            ids = [id for id in ids if id in allowed]
+        fuzzy = bool(ids)
+    return ExplorePage(ids, products.next_cursor, products.prev_cursor, fuzzy)
+
+
 @bp.route('/explore/', methods=('GET', 'POST'))
-@login_required
 def explore():
     """Отображение главной страницы поиска товаров."""
-    page = request.args.get('page', 1, type=int)
-    # Проверка наличия товаров в корзине
-    if current_user.is_authenticated:
-        basket = current_user.get_basket()
-        basket_items = basket.get_basket_products()
-    else:
-        basket_items = {}
-    # Если был введён поисковой запрос, то фильтруется результат
-    query = sa.select(Product).order_by(Product.id.desc())
+    cursor = request.args.get('cursor')
     search_query = request.args.get('q', '').strip()
-    if search_query:
-        query = query.where(
-            sa.or_(
-                Product.name.ilike(f'%{search_query}%'),
-                Product.description.ilike(f'%{search_query}%')
-            )
-        )
-    # Составление списка продуктов
-    products = db.paginate(query, page=page,
-                           per_page=current_app.config['PAGE_LENGTH'],
-                           error_out=False)
-    next_url = (url_for('main.explore', page=products.next_num, q=search_query)
-                if products.has_next else None)
-    prev_url = (url_for('main.explore', page=products.prev_num)
-                if products.has_prev else None)
-    products = dict.fromkeys(products, 0)
-    products.update({product: amount
-                     for product, amount in basket_items.items()
-                     if product in products})
+    filters = facets.parse_filters(request.args)
+    # Страница берётся из кэша, пока версия каталога не изменилась
+    listing_cache = cache.get_cache('listing')
+    version = cache.get_version(cache.CATALOG)
+    key = (version, ' '.join(search.tokenize(search_query)),
+           tuple(sorted(filters.items())), cursor)
+    page = listing_cache.get(key)
+    if page is None:
+        page = explore_page(key[1], filters, cursor)
+        listing_cache.set(key, page)
+    # Товары берутся из снимка каталога, наличие — из базы
+    found = snapshot.with_stock(
+        snapshot.get_snapshot(version).get_many(page.ids))
+    if 'stock' in filters:
+        # Закончившиеся после кэширования страницы товары не выводятся,
+        # появившиеся в наличии попадут в список по истечении
+        # LISTING_CACHE_TTL
+        found = [product for product in found if product.stock > 0]
+    url_args = dict(filters, q=search_query or None)
+    next_url = (url_for('main.explore', cursor=page.next_cursor,
+                        **url_args)
+                if page.next_cursor else None)
+    prev_url = (url_for('main.explore', cursor=page.prev_cursor,
+                        **url_args)
+                if page.prev_cursor else None)
+    # Количество в корзине запрашивается только для товаров страницы
+    amounts = basket_amounts([product.id for product in found])
+    products = {product: min(amounts.get(product.id, 0), product.stock)
+                for product in found}
     return render_template('main/explore.html', products=products,
                            modify_amount=True, next_url=next_url,
-                           prev_url=prev_url, search_query=search_query)
+                           prev_url=prev_url, search_query=search_query,
+                           fuzzy=page.fuzzy, filters=filters,
+                           facet_counts=facets.get_counts(),
+                           facet_titles=facets.FACET_TITLES)
+
+
+@bp.route('/explore/suggest')
+def suggestions():
+    """Получение подсказок для строки поиска в формате json.
+    Функция предназначена для AJAX вызова.
+    """
+    search_query = request.args.get('q', '')
+    items = suggest.get_index().suggest(
+        search_query, limit=current_app.config['SUGGEST_LIMIT'])
+    return jsonify(suggestions=[
+        {'label': item.label,
+         'url': (url_for('main.product', id=item.product_id)
+                 if item.product_id is not None
+                 else url_for('main.explore', brand=item.label))}
+        for item in items])
 
 
 @bp.route('/basket/', methods=('GET', 'POST'))
-@login_required
 def basket():
     """Отображение корзины."""
     # Получение информации об актуальной корзине покупателя
-    basket = current_user.get_basket()
+    basket = current_basket()
     basket_items = basket.get_basket_products()
-    total_amount = basket.get_total_amount(basket_items)
+    total_amount = basket.get_total_amount()
     form = CheckoutForm()
     return render_template('main/basket.html', products=basket_items,
                            total_amount=total_amount, form=form,
                            modify_amount=True)
 
 
-@login_required
 @bp.route('/basket/add_product/<product_id>', methods=('GET', 'POST'))
 def add_item(product_id):
     """Добавление единицы продукта в корзину, с последующим возвращением
     актуального количества товара и полной стоимости по корзине в формате json.
     Функция предназначена для AJAX вызова.
     """
-    product = db.session.get(Product, int(product_id))
-    if product is None:
+    basket = current_basket()
+    amount = basket.add_product(int(product_id))
+    if amount is None:
         abort(404)
-    basket = current_user.get_basket()
-    basket_item = db.session.scalar(sa.select(BasketProduct).where(
-        BasketProduct.basket_id == basket.id,
-        BasketProduct.product_id == product.id
-    ))
-    if basket_item is None:
-        basket_item = BasketProduct(basket_id=basket.id,
-                                    product_id=product.id,
-                                    amount=0)
-    if basket_item.amount < product.stock:
-        basket_item.amount = basket_item.amount + 1
-    db.session.add(basket_item)
     db.session.commit()
-    total_amount = (basket.get_total_amount()
-                    if request.headers.get('Referer')
-                    and 'basket' in request.headers.get('Referer')
-                    else None
-                    )
-    return jsonify(amount=basket_item.amount, total_amount=total_amount)
+    return jsonify(amount=amount, total_amount=basket.get_total_amount())
 
 
 @bp.route('/basket/remove_product/<product_id>', methods=('GET', 'POST'))
-@login_required
 def remove_item(product_id):
     """Удаление единицы продукта из корзины, с последующим возвращением
     актуального количества товара и полной стоимости по корзине в формате json.
     Функция предназначена для AJAX вызова.
     """
-    product = db.session.get(Product, int(product_id))
-    if product is None:
+    basket = current_basket()
+    amount = basket.remove_product(int(product_id))
+    if amount is None:
         abort(404)
-    basket = current_user.get_basket()
-    basket_item = db.session.scalar(sa.select(BasketProduct).where(
-        BasketProduct.basket_id == basket.id,
-        BasketProduct.product_id == product.id
-    ))
-    basket_item.amount = basket_item.amount - 1
-    total_amount = (basket.get_total_amount()
-                    if request.headers.get('Referer')
-                    and 'basket' in request.headers.get('Referer')
-                    else None
-                    )
-    if basket_item.amount < 1:
-        db.session.delete(basket_item)
-        db.session.commit()
-        return jsonify(amount=0, total_amount=total_amount)
-    db.session.add(basket_item)
     db.session.commit()
-    return jsonify(amount=basket_item.amount, total_amount=total_amount)
+    return jsonify(amount=amount, total_amount=basket.get_total_amount())
+
+
+@bp.route('/basket/update', methods=('POST',))
+def update_items():
+    """Изменение количества нескольких товаров в корзине одним запросом.
+
+    Принимает json {"items": {"<id товара>": <изменение количества>}},
+    изменения применяются в одной транзакции. Возвращает количество
+    товаров после изменения (null для ненайденных) и полную стоимость
+    корзины. Запрос с изменением больше MAX_ITEM_DELTA по модулю
+    отклоняется. Функция предназначена для AJAX вызова.
+    """
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else None
+    if not isinstance(items, dict) or len(items) > MAX_BATCH_ITEMS:
+        abort(400)
+    try:
+        deltas = {int(product_id): int(delta)
+                  for product_id, delta in items.items()}
+    except (TypeError, ValueError):
+        abort(400)
+    if any(abs(product_id) > MAX_PRODUCT_ID or abs(delta) > MAX_ITEM_DELTA
+           for product_id, delta in deltas.items()):
+        abort(400)
+    basket = current_basket()
+    amounts = basket.update_products(deltas)
+    db.session.commit()
+    return jsonify(amounts={str(product_id): amount
+                            for product_id, amount in amounts.items()},
+                   total_amount=basket.get_total_amount())
 
 
 @bp.route('/checkout/', methods=('GET', 'POST'))
@@ -236,11 +339,20 @@ def checkout():
         return redirect(url_for('main.basket'))
     # Получение информации об актуальной корзине покупателя
     basket = current_user.get_basket()
+    # Количество товаров приводится к наличию перед оформлением
+    if basket.reconcile():
+        db.session.commit()
     basket_items = basket.get_basket_products()
     if not basket_items:  # Корзина пуста
         flash('Корзина пуста')
         return redirect(url_for('main.basket'))
-    total_amount = basket.get_total_amount(basket_items)
+    # Товары резервируются на время оформления заказа
+    if not reservations.hold(basket, basket_items):
+        db.session.rollback()
+        flash('В наличии недостаточно товаров для оформления заказа')
+        return redirect(url_for('main.basket'))
+    db.session.commit()
+    total_amount = basket.get_total_amount()
     shipment_date = basket.get_shipment_date()
     order_form = SubmitOrderForm()
     order_form.address.data = current_user.address
@@ -249,8 +361,9 @@ def checkout():
                            shipment_date=shipment_date)
 
 
-@login_required
 @bp.route('/submit_order/', methods=('GET', 'POST'))
+@login_required
+@idempotent
 def submit_order():
     """Формирование заказа."""
     form = SubmitOrderForm()
@@ -259,15 +372,34 @@ def submit_order():
         return redirect(url_for('main.basket'))
     # Получение информации об актуальной корзине покупателя
     basket = current_user.get_basket()
+    # Наличие изменилось после подтверждения заказа
+    if basket.reconcile():
+        db.session.commit()
+        flash('Количество товаров в корзине изменено по наличию')
+        return redirect(url_for('main.basket'))
     basket_items = basket.get_basket_products()
-    total_amount = basket.get_total_amount(basket_items)
-    # Подготовка к списанию товаров из доступных к продаже
-    for product, amount in basket_items.items():
-        # Если товаров не хватает для оформления заказов
-        if product.stock < amount:
+    if not basket_items:  # Корзина пуста
+        flash('Корзина пуста')
+        return redirect(url_for('main.basket'))
+    # Резервы корзины переходят в списание наличия в этой же транзакции,
+    # истёкшие резервы других корзин на эти товары снимаются
+    reservations.release(basket, [product.id for product in basket_items])
+    total_amount = basket.get_total_amount()
+    # Списание товаров условными запросами в порядке id; если товаров
+    # не хватает (с учётом резервов других покупателей), заказ целиком
+    # откатывается. Строки товаров блокируются раньше строки корзины,
+    # как и при изменении наличия администратором
+    for product, amount in sorted(basket_items.items(),
+                                  key=lambda item: item[0].id):
+        stock = product.take_stock(amount)
+        if stock is None:
+            db.session.rollback()
             flash('В наличии недостаточно товаров для оформления заказа')
             return redirect(url_for('main.basket'))
-        product.stock -= amount
+        catalog.stock_changed(product, stock + amount, stock,
+                              reconcile=False)
+    # Смена статуса корзины с актуальной на архивную
+    basket.active = False
     # Формирование заказа
     order = Order(shipment_date=basket.get_shipment_date(),
                   total_amount=total_amount,
@@ -275,14 +407,16 @@ def submit_order():
                   address=form.address.data,
                   basket_id=basket.id)
     db.session.add(order)
-    basket.active = False  # Смена статуса корзины с актуальной на архивную
+    order.add_items(basket_items)
+    outbox.order_changed(order)
     db.session.commit()  # Подтверждение всех действий с БД в рамках транзакции
     flash('Ваш заказ был успешно оформлен')
     return redirect(url_for('main.order', order_number=order.order_number))
 
 
-@login_required
 @bp.route('/cancel_order/<order_number>', methods=('GET', 'POST'))
+@login_required
+@idempotent
 def cancel_order(order_number):
     """Отмена заказа."""
     form = CancelOrderForm()
@@ -294,7 +428,7 @@ def cancel_order(order_number):
     if order is None:  # Заказ не найден
         abort(404)
     # Пользователь не владелец заказа и не админ
-    elif (current_user.role.name != 'admin'
+    elif (not current_user.is_admin
           and current_user.id != order.user_id):
         abort(404)  # Посторонний не получает информацию о наличии заказа
     if order.status.name == 'Отменён':  # Заказ уже был отменён
@@ -303,10 +437,15 @@ def cancel_order(order_number):
     # Смена статуса заказа
     order.set_status('Отменён')
     # Возвращение количества товаров в наличие
-    basket = order.basket
-    basket_items = basket.get_basket_products()
-    for product, amount in basket_items.items():
-        product.stock += amount
+    amounts = {item.product_id: item.amount for item in order.items}
+    products = db.session.scalars(
+        sa.select(Product).where(Product.id.in_(amounts)))
+    for product in products:  # Удалённые товары пропускаются
+        stock = product.return_stock(amounts[product.id])
+        if stock is not None:
+            catalog.stock_changed(product, stock - amounts[product.id],
+                                  stock)
+    outbox.order_changed(order)
     db.session.commit()
     flash('Заказ был успешно отменён')
     return redirect(url_for('main.index'))
@@ -1,5 +1,5 @@
 from datetime import date, datetime, timezone, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 import uuid
 import sqlalchemy as sa
 import sqlalchemy.orm as so
@@ -7,6 +7,8 @@ from flask_login import UserMixin
 from werkzeug.security import check_password_hash, generate_password_hash
 
 from app import db, login
+from app.enums import EnumRegistry
+from app.sql import insert, least
 
 categories = sa.Table(
     'categories',
@@ -22,8 +24,9 @@ class BasketProduct(db.Model):  # type: ignore[name-defined]
     """Модель БД таблица Many-To-Many продуктов в корзине."""
     __tablename__ = 'basket_products'
 
+    # Записи удаляются вместе с корзиной (удаление брошенных корзин)
     basket_id: so.Mapped[int] = so.mapped_column(db.Integer, db.ForeignKey(
-        'basket.id'), primary_key=True)
+        'basket.id', ondelete='CASCADE'), primary_key=True)
     product_id: so.Mapped[int] = so.mapped_column(db.Integer, db.ForeignKey(
         'product.id'), primary_key=True)
     amount: so.Mapped[int] = so.mapped_column(db.Integer, default=1)
@@ -47,6 +50,17 @@ class Role(db.Model):  # type: ignore[name-defined]
         return f'<Role {self.name}>'
 
 
+ROLES = EnumRegistry(Role)
+
+
+def _expire_relationship(instance, key: str) -> None:
+    """Сброс загруженной связи после изменения внешнего ключа, чтобы
+    при обращении она загрузилась по новому значению."""
+    state = sa.inspect(instance)
+    if state.persistent and key in state.dict:
+        db.session.expire(instance, [key])
+
+
 class User(UserMixin, db.Model):  # type: ignore[name-defined]
     """Модель БД таблица user."""
     __tablename__ = 'user'
@@ -94,44 +108,73 @@ class User(UserMixin, db.Model):  # type: ignore[name-defined]
         return check_password_hash(self.password_hash, password)
 
     def set_role(self, role_name: str = 'user') -> None:
-        """Назначение роли.
+        """Назначение роли. Роль ищется в кэше ролей (app.enums),
+        отсутствующая роль создаётся без фиксации транзакции.
 
         Пример использования:
         >>> user = User()
         >>> user.set_role('admin')
         """
-        role = db.session.scalar(sa.select(Role).where(Role.name == role_name))
-        if role is None:  # В базе отсутствует роль, необходимая для работы
-            role = Role(name=role_name)
-            db.session.add(role)
-            db.session.commit()
-        self.role = role
+        self.role_id = ROLES.get_id(role_name)
+        _expire_relationship(self, 'role')
 
     def get_basket(self) -> 'Basket':
         """Получение актуальной корзины покупателя, если таковой нету,
          то создаётся новая.
 
+        Активная корзина у пользователя одна (частичный уникальный индекс
+        ix_basket_user_id_active), поэтому поиск выполняется одним
+        запросом по индексу. Корзина создаётся через INSERT ... ON CONFLICT
+        DO NOTHING, и параллельные запросы получают одну и ту же корзину.
+
         Возвращает:
             Basket: Активная корзина пользователя.
         """
-        active_baskets = db.session.scalars(
-            sa.select(Basket)
-            .where(Basket.user_id == self.id)
-            .where(Basket.active.is_(True))
-            .order_by(Basket.created_at)).all()
-        if not active_baskets:  # Корзина отсутствует
-            basket = Basket(user_id=self.id, active=True)
-            db.session.add(basket)
+        active = Basket.active == sa.true()
+        query = sa.select(Basket).where(Basket.user_id == self.id, active)
+        basket = db.session.scalar(query)
+        if basket is None:  # Корзина отсутствует
+            db.session.execute(
+                insert(Basket).values(user_id=self.id, active=True)
+                .on_conflict_do_nothing(index_elements=[Basket.user_id],
+                                        index_where=active))
             db.session.commit()
-        else:
-            basket = active_baskets[-1]
+            # Корзина создана этим или параллельным запросом
+            basket = db.session.scalars(query).one()
         return basket
 
+    def get_basket_amounts(self, product_ids: List[int]) -> Dict[int, int]:
+        """Получение количества заданных товаров в актуальной корзине.
+
+        В отличие от get_basket выполняет один запрос и ничего не изменяет
+        в базе: корзина не создаётся.
+
+        Возвращает:
+            Dict[int, int]: Словарь, где ключ — id товара,
+              а значение — количество в корзине.
+        """
+        if not product_ids:
+            return {}
+        basket_id = (sa.select(Basket.id)
+                     .where(Basket.user_id == self.id,
+                            Basket.active == sa.true())
+                     .scalar_subquery())
+        rows = db.session.execute(
+            sa.select(BasketProduct.product_id, BasketProduct.amount)
+            .where(BasketProduct.basket_id == basket_id,
+                   BasketProduct.product_id.in_(product_ids)))
+        return {product_id: amount for product_id, amount in rows}
+
     @property
     def is_active(self):
         """Проверка доступа пользователя в систему."""
         return not self.banned
 
+    @property
+    def is_admin(self) -> bool:
+        """Проверка роли администратора без запроса к базе."""
+        return self.role_id == ROLES.find_id('admin')
+
 
 class Product(db.Model):  # type: ignore[name-defined]
     """Модель БД таблица product."""
@@ -146,6 +189,9 @@ class Product(db.Model):  # type: ignore[name-defined]
     brand: so.Mapped[Optional[str]] = so.mapped_column(
         sa.String(40), nullable=True, default=None)
     stock: so.Mapped[int] = so.mapped_column(default=0)
+    # Количество, зарезервированное оформляемыми заказами (app.reservations)
+    reserved: so.Mapped[int] = so.mapped_column(default=0,
+                                                server_default='0')
     photo_path: so.Mapped[Optional[str]] = so.mapped_column(sa.String(200))
     categories: so.Mapped[List['Category']] = so.relationship(
         secondary=categories,
@@ -159,6 +205,54 @@ class Product(db.Model):  # type: ignore[name-defined]
     def __repr__(self):
         return f'<Product {self.name}>'
 
+    def take_stock(self, amount: int) -> Optional[int]:
+        """Списание amount единиц товара из наличия.
+
+        Списание выполняется условным запросом UPDATE ... WHERE
+        stock - reserved >= amount, поэтому параллельные заказы не могут
+        списать больше, чем есть в наличии. Наличие и резерв объекта
+        заменяются значениями из RETURNING. Транзакция не фиксируется.
+
+        Возвращает:
+            Optional[int]: Наличие после списания или None, если товара
+            не хватило.
+        """
+        row = db.session.execute(
+            sa.update(Product)
+            .where(Product.id == self.id,
+                   Product.stock - Product.reserved >= amount)
+            .values(stock=Product.stock - amount)
+            .returning(Product.stock, Product.reserved)
+            .execution_options(synchronize_session=False)).first()
+        if row is None:
+            return None
+        self._set_stock(*row)
+        return row.stock
+
+    def return_stock(self, amount: int) -> Optional[int]:
+        """Возвращение amount единиц товара в наличие одним запросом
+        UPDATE. Транзакция не фиксируется.
+
+        Возвращает:
+            Optional[int]: Наличие после возвращения или None, если товар
+            удалён.
+        """
+        row = db.session.execute(
+            sa.update(Product).where(Product.id == self.id)
+            .values(stock=Product.stock + amount)
+            .returning(Product.stock, Product.reserved)
+            .execution_options(synchronize_session=False)).first()
+        if row is None:
+            return None
+        self._set_stock(*row)
+        return row.stock
+
+    def _set_stock(self, stock: int, reserved: int) -> None:
+        """Замена наличия и резерва объекта значениями из базы без пометки
+        их изменёнными."""
+        so.attributes.set_committed_value(self, 'stock', stock)
+        so.attributes.set_committed_value(self, 'reserved', reserved)
+
     def get_path(self) -> Optional[str]:
         """ Получение пути к изображению продукта. """
         return self.photo_path
@@ -204,14 +298,32 @@ class Category(db.Model):  # type: ignore[name-defined]
 
 
 class Basket(db.Model):  # type: ignore[name-defined]
-    """Модель БД таблица basket."""
+    """Модель БД таблица basket.
+
+    У пользователя не больше одной активной корзины, это обеспечивает
+    частичный уникальный индекс по user_id для активных корзин.
+    Стоимость (total_amount) и количество товаров (items_count) хранятся
+    в строке корзины и изменяются триггерами базы данных тем же запросом,
+    что и количество товара в basket_products, а для активных корзин также
+    при изменении цены товара.
+    """
     __tablename__ = 'basket'
+    __table_args__ = (
+        sa.Index('ix_basket_user_id_active', 'user_id', unique=True,
+                 sqlite_where=sa.text('active = 1'),
+                 postgresql_where=sa.text('active = true')),
+    )
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
     user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey(User.id),
                                                index=True)
     active: so.Mapped[bool] = so.mapped_column(sa.Boolean, default=True)
     created_at: so.Mapped[Optional[datetime]] = so.mapped_column(
         default=lambda: datetime.now(timezone.utc))
+    # Поддерживаются триггерами на basket_products и product.price
+    total_amount: so.Mapped[int] = so.mapped_column(default=0,
+                                                    server_default='0')
+    items_count: so.Mapped[int] = so.mapped_column(default=0,
+                                                   server_default='0')
     products: so.Mapped[List['Product']] = so.relationship(
         secondary='basket_products',
         back_populates='baskets'
@@ -226,47 +338,222 @@ class Basket(db.Model):  # type: ignore[name-defined]
     def get_basket_products(self) -> Dict['Product', int]:
         """ Получение количества товаров в корзине.
 
+        Только чтение: количество не сверяется с наличием, для этого
+        перед оформлением заказа вызывается reconcile.
+
         Возвращает:
             Dict[Product, int]: Словарь, где ключ — продукт,
               а значение — количество.
         """
-        basket_items = dict()
-
-        # Получаем все записи BasketProduct и связанные с ними продукты
         basket_products = db.session.execute(
-            sa.select(BasketProduct, Product)
-            .join(Product, BasketProduct.product_id == Product.id)
+            sa.select(Product, BasketProduct.amount)
+            .join(BasketProduct, BasketProduct.product_id == Product.id)
             .where(BasketProduct.basket_id == self.id)
             .order_by(Product.id.desc())
         ).all()
-        for basket_product, product in basket_products:
-            if self.active:  # Корзина изменяется только если активна
-                # Если в наличии меньшее количество товара, чем в корзине
-                if basket_product.amount > product.stock:
-                    basket_product.amount = product.stock
-                # Если количество товара в корзине равно нулю
-                if not basket_product.amount:
-                    db.session.delete(basket_product)
-                db.session.commit()
-            basket_items[product] = basket_product.amount
-
-        return basket_items
-
-    def get_total_amount(self,
-                         basket_items: Optional[Dict['Product', int]] = None
-                         ) -> int:
-        """ Получение суммарной стоимости всех товаров в корзине.
+        return {product: amount for product, amount in basket_products}
 
-        Если ранее был получен словарь, содержащий количество товаров
-         в корзине(get_basket_products), то его можно передать в качестве
-          аргумента и не пересчитывать.
+    def reconcile(self) -> bool:
+        """Приведение корзины в соответствие с наличием товаров.
+
+        Количество, превышающее наличие, уменьшается до него одним
+        запросом UPDATE, записи с нулевым количеством удаляются одним
+        DELETE. Архивные корзины не изменяются. Транзакция не фиксируется.
+
+        Возвращает:
+            bool: Была ли корзина изменена.
+        """
+        if not self.active:
+            return False
+        stock = (sa.select(Product.stock)
+                 .where(Product.id == BasketProduct.product_id)
+                 .scalar_subquery())
+        in_basket = BasketProduct.basket_id == self.id
+        clamped = db.session.execute(
+            sa.update(BasketProduct)
+            .where(in_basket, BasketProduct.amount > stock)
+            .values(amount=stock)
+            .execution_options(synchronize_session=False)).rowcount
+        purged = db.session.execute(
+            sa.delete(BasketProduct)
+            .where(in_basket, BasketProduct.amount <= 0)
+            .execution_options(synchronize_session=False)).rowcount
+        self._expire_totals()
+        return bool(clamped or purged)
+
+    @staticmethod
+    def reconcile_product(product_id: int, stock: int) -> None:
+        """Уменьшение количества товара во всех активных корзинах до его
+        наличия stock, вызывается после уменьшения наличия. Транзакция
+        не фиксируется."""
+        active = (sa.select(Basket.id).where(Basket.active)
+                  .scalar_subquery())
+        in_baskets = sa.and_(BasketProduct.product_id == product_id,
+                             BasketProduct.basket_id.in_(active))
+        stmt: Union[sa.Update, sa.Delete]
+        if stock > 0:
+            stmt = (sa.update(BasketProduct)
+                    .where(in_baskets, BasketProduct.amount > stock)
+                    .values(amount=stock))
+        else:
+            stmt = sa.delete(BasketProduct).where(in_baskets)
+        db.session.execute(
+            stmt.execution_options(synchronize_session=False))
+
+    def add_product(self, product_id: int, count: int = 1) -> Optional[int]:
+        """Добавление count единиц товара в корзину одним запросом.
+
+        Количество увеличивается атомарно (INSERT ... ON CONFLICT DO
+        UPDATE) и не превышает количества товара в наличии, поэтому
+        одновременные запросы не теряют изменений. Транзакция
+        не фиксируется.
+
+        Возвращает:
+            Optional[int]: Количество товара в корзине после добавления
+              или None, если товар не найден.
+        """
+        stock = (sa.select(Product.stock)
+                 .where(Product.id == BasketProduct.product_id)
+                 .scalar_subquery())
+        stmt = insert(BasketProduct).from_select(
+            ['basket_id', 'product_id', 'amount'],
+            sa.select(sa.literal(self.id), Product.id,
+                      least(Product.stock, count))
+            .where(Product.id == product_id, Product.stock > 0))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[BasketProduct.basket_id,
+                            BasketProduct.product_id],
+            set_={'amount': least(BasketProduct.amount + count, stock)},
+            where=BasketProduct.amount < stock)
+        amount = db.session.scalar(stmt.returning(BasketProduct.amount))
+        self._expire_totals()
+        if amount is None:  # Товара нет в наличии или достигнут предел
+            return self._get_amount(product_id)
+        return amount
+
+    def add_products(self, amounts: Dict[int, int]) -> None:
+        """Добавление нескольких товаров в корзину одним запросом
+        INSERT ... SELECT ... ON CONFLICT DO UPDATE.
+
+        Количество, как и в add_product, не превышает наличия, товары
+        не в наличии и ненайденные товары пропускаются. Транзакция
+        не фиксируется.
+
+        Аргументы:
+            amounts: Словарь, где ключ — id товара, а значение —
+              добавляемое количество.
+        """
+        if not amounts:
+            return
+        stock = (sa.select(Product.stock)
+                 .where(Product.id == BasketProduct.product_id)
+                 .scalar_subquery())
+        stmt = insert(BasketProduct).from_select(
+            ['basket_id', 'product_id', 'amount'],
+            sa.select(sa.literal(self.id), Product.id,
+                      least(Product.stock, sa.case(amounts, value=Product.id)))
+            .where(Product.id.in_(amounts), Product.stock > 0))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[BasketProduct.basket_id,
+                            BasketProduct.product_id],
+            set_={'amount': least(BasketProduct.amount
+                                  + stmt.excluded.amount, stock)},
+            where=BasketProduct.amount < stock)
+        db.session.execute(stmt)
+        self._expire_totals()
+
+    def remove_product(self, product_id: int,
+                       count: int = 1) -> Optional[int]:
+        """Удаление count единиц товара из корзины.
+
+        Количество уменьшается атомарно, удаление последней единицы
+        удаляет запись о товаре в корзине. Транзакция не фиксируется.
+
+        Возвращает:
+            Optional[int]: Количество товара в корзине после удаления
+              или None, если товар не найден.
+        """
+        in_basket = sa.and_(BasketProduct.basket_id == self.id,
+                            BasketProduct.product_id == product_id)
+        amount = db.session.scalar(
+            sa.update(BasketProduct)
+            .where(in_basket, BasketProduct.amount > count)
+            .values(amount=BasketProduct.amount - count)
+            .returning(BasketProduct.amount))
+        self._expire_totals()
+        if amount is not None:
+            return amount
+        deleted = db.session.scalar(
+            sa.delete(BasketProduct)
+            .where(in_basket, BasketProduct.amount <= count)
+            .returning(BasketProduct.product_id))
+        if deleted is not None:
+            return 0
+        return self._get_amount(product_id)
+
+    def update_products(self, deltas: Dict[int, int]
+                        ) -> Dict[int, Optional[int]]:
+        """Изменение количества нескольких товаров в корзине.
+
+        Аргументы:
+            deltas: Словарь, где ключ — id товара, а значение — на сколько
+              изменить количество (отрицательное значение уменьшает).
+
+        Возвращает:
+            Dict[int, Optional[int]]: Количество товаров после изменения,
+              None для ненайденных товаров.
+        """
+        amounts = {}
+        # Строки изменяются в порядке id, чтобы параллельные транзакции
+        # не блокировали друг друга
+        for product_id, delta in sorted(deltas.items()):
+            if delta > 0:
+                amounts[product_id] = self.add_product(product_id, delta)
+            elif delta < 0:
+                amounts[product_id] = self.remove_product(product_id, -delta)
+            else:
+                amounts[product_id] = self._get_amount(product_id)
+        return amounts
+
+    def _get_amount(self, product_id: int) -> Optional[int]:
+        """Количество товара в корзине, None если товар не найден."""
+        row = db.session.execute(
+            sa.select(Product.id, BasketProduct.amount)
+            .outerjoin(BasketProduct,
+                       sa.and_(BasketProduct.product_id == Product.id,
+                               BasketProduct.basket_id == self.id))
+            .where(Product.id == product_id)).first()
+        if row is None:
+            return None
+        return row.amount or 0
+
+    def get_total_amount(self) -> int:
+        """ Получение суммарной стоимости всех товаров в корзине.
 
         Возвращает:
             int: Суммарная стоимость товаров в корзине.
         """
-        basket_items = basket_items or self.get_basket_products()
-        return sum(product.price * amount
-                   for product, amount in basket_items.items())
+        return self.total_amount
+
+    def calculate_totals(self) -> Tuple[int, int]:
+        """Расчёт стоимости и количества товаров в корзине агрегатным
+        запросом по basket_products, для проверки хранимых значений.
+
+        Возвращает:
+            Tuple[int, int]: Стоимость и количество товаров.
+        """
+        total_amount, items_count = db.session.execute(
+            sa.select(sa.func.coalesce(
+                          sa.func.sum(Product.price * BasketProduct.amount),
+                          0),
+                      sa.func.coalesce(sa.func.sum(BasketProduct.amount), 0))
+            .join(Product, BasketProduct.product_id == Product.id)
+            .where(BasketProduct.basket_id == self.id)).one()
+        return total_amount, items_count
+
+    def _expire_totals(self) -> None:
+        """Сброс загруженных значений, изменённых триггерами."""
+        db.session.expire(self, ['total_amount', 'items_count'])
 
     def get_shipment_date(self):
         """Расчёт даты доставки.
@@ -275,9 +562,80 @@ class Basket(db.Model):  # type: ignore[name-defined]
         return date.today() + timedelta(days=7)
 
 
+# Изменение стоимости и количества товаров корзины на delta единиц товара
+# из строки row таблицы basket_products
+_BASKET_TOTALS_UPDATE = (
+    'UPDATE basket SET items_count = items_count + ({delta}), '
+    'total_amount = total_amount + ({delta}) * '
+    '(SELECT price FROM product WHERE id = {row}.product_id) '
+    'WHERE id = {row}.basket_id')
+# Изменение стоимости активных корзин с товаром при изменении его цены
+_BASKET_PRICE_UPDATE = (
+    'UPDATE basket SET total_amount = total_amount + '
+    '(NEW.price - OLD.price) * (SELECT amount FROM basket_products '
+    'WHERE basket_id = basket.id AND product_id = NEW.id) '
+    'WHERE active = {true} AND id IN '
+    '(SELECT basket_id FROM basket_products WHERE product_id = NEW.id)')
+
+# Создание триггеров вместе с таблицей basket_products (db.create_all,
+# тесты), в миграциях используются те же выражения
+BASKET_TOTALS_TRIGGERS = {
+    'sqlite': [
+        'CREATE TRIGGER IF NOT EXISTS basket_products_insert '
+        'AFTER INSERT ON basket_products BEGIN '
+        + _BASKET_TOTALS_UPDATE.format(delta='NEW.amount', row='NEW')
+        + '; END',
+        'CREATE TRIGGER IF NOT EXISTS basket_products_update '
+        'AFTER UPDATE OF amount ON basket_products BEGIN '
+        + _BASKET_TOTALS_UPDATE.format(delta='NEW.amount - OLD.amount',
+                                       row='NEW')
+        + '; END',
+        'CREATE TRIGGER IF NOT EXISTS basket_products_delete '
+        'AFTER DELETE ON basket_products BEGIN '
+        + _BASKET_TOTALS_UPDATE.format(delta='-OLD.amount', row='OLD')
+        + '; END',
+        'CREATE TRIGGER IF NOT EXISTS product_price_update '
+        'AFTER UPDATE OF price ON product BEGIN '
+        + _BASKET_PRICE_UPDATE.format(true='1') + '; END',
+    ],
+    'postgresql': [
+        'CREATE OR REPLACE FUNCTION basket_products_totals() '
+        'RETURNS trigger AS $$ BEGIN '
+        "IF TG_OP = 'INSERT' THEN "
+        + _BASKET_TOTALS_UPDATE.format(delta='NEW.amount', row='NEW')
+        + "; ELSIF TG_OP = 'UPDATE' THEN "
+        + _BASKET_TOTALS_UPDATE.format(delta='NEW.amount - OLD.amount',
+                                       row='NEW')
+        + '; ELSE '
+        + _BASKET_TOTALS_UPDATE.format(delta='-OLD.amount', row='OLD')
+        + '; END IF; RETURN NULL; END $$ LANGUAGE plpgsql',
+        'CREATE OR REPLACE TRIGGER basket_products_totals '
+        'AFTER INSERT OR UPDATE OF amount OR DELETE ON basket_products '
+        'FOR EACH ROW EXECUTE FUNCTION basket_products_totals()',
+        'CREATE OR REPLACE FUNCTION product_price_update() '
+        'RETURNS trigger AS $$ BEGIN '
+        + _BASKET_PRICE_UPDATE.format(true='true')
+        + '; RETURN NULL; END $$ LANGUAGE plpgsql',
+        'CREATE OR REPLACE TRIGGER product_price_update '
+        'AFTER UPDATE OF price ON product '
+        'FOR EACH ROW EXECUTE FUNCTION product_price_update()',
+    ],
+}
+for dialect, statements in BASKET_TOTALS_TRIGGERS.items():
+    for statement in statements:
+        sa.event.listen(BasketProduct.__table__, 'after_create',
+                        sa.DDL(statement).execute_if(dialect=dialect))
+
+
 class Order(db.Model):  # type: ignore[name-defined]
     """Модель БД таблица order."""
     __tablename__ = 'order'
+    __table_args__ = (
+        # История заказов покупателя и фильтры панели администратора
+        # выводят заказы по убыванию id
+        sa.Index('ix_order_user_id_id', 'user_id', 'id'),
+        sa.Index('ix_order_status_id_id', 'status_id', 'id'),
+    )
 
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
     order_number: so.Mapped[int] = so.mapped_column(
@@ -285,20 +643,21 @@ class Order(db.Model):  # type: ignore[name-defined]
         index=True, default=lambda: str(uuid.uuid4())
     )
     created_at: so.Mapped[Optional[datetime]] = so.mapped_column(
-        default=lambda: datetime.now(timezone.utc))
+        index=True, default=lambda: datetime.now(timezone.utc))
     shipment_date: so.Mapped[Optional[date]] = so.mapped_column()
     status_id: so.Mapped[int] = so.mapped_column(
-        sa.ForeignKey('order_status.id'), index=True)
+        sa.ForeignKey('order_status.id'))
     address: so.Mapped[Optional[str]] = so.mapped_column(sa.String(60))
     total_amount: so.Mapped[int] = so.mapped_column()
-    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey(User.id),
-                                               index=True)
+    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey(User.id))
     basket_id: so.Mapped[Optional[int]] = so.mapped_column(
-        sa.ForeignKey(Basket.id), nullable=True)
+        sa.ForeignKey(Basket.id), nullable=True, index=True)
     status: so.Mapped['OrderStatus'] = so.relationship(back_populates='orders')
     customer: so.Mapped[User] = so.relationship(back_populates='user_orders')
     basket: so.Mapped[Optional['Basket']] = so.relationship(
         back_populates='order')
+    items: so.Mapped[List['OrderItem']] = so.relationship(
+        back_populates='order', order_by='OrderItem.product_id.desc()')
 
     def __init__(self, *args, status_name: str = 'Создан', **kwargs):
         super().__init__(*args, **kwargs)
@@ -308,19 +667,57 @@ class Order(db.Model):  # type: ignore[name-defined]
         return f'<Order number {self.order_number}>'
 
     def set_status(self, status_name: str = 'Создан') -> None:
-        """ Назначение роли.
+        """ Назначение статуса. Статус ищется в кэше статусов (app.enums),
+        отсутствующий статус создаётся без фиксации транзакции.
 
         Пример использования:
         >>> order = Order()
         >>> order.set_status('Создан')
         """
-        status = db.session.scalar(sa.select(OrderStatus).where(
-            OrderStatus.name == status_name))
-        if status is None:  # В базе отсутствует статус, необходимый для работы
-            status = OrderStatus(name=status_name)
-            db.session.add(status)
-            db.session.commit()
-        self.status = status
+        self.status_id = STATUSES.get_id(status_name)
+        _expire_relationship(self, 'status')
+
+    def add_items(self, basket_items: Dict['Product', int]) -> None:
+        """Сохранение состава заказа одним запросом INSERT.
+
+        Аргументы:
+            basket_items: Словарь, где ключ — продукт, а значение —
+              количество (Basket.get_basket_products).
+        """
+        if self.id is None:
+            db.session.flush()
+        db.session.execute(sa.insert(OrderItem), [
+            {'order_id': self.id, 'product_id': product.id,
+             'name': product.name, 'unit_price': product.price,
+             'amount': amount}
+            for product, amount in basket_items.items()])
+        db.session.expire(self, ['items'])
+
+
+class OrderItem(db.Model):  # type: ignore[name-defined]
+    """Модель БД таблица order_items.
+
+    Состав заказа с названием и ценой товара на момент покупки,
+    заполняется один раз при оформлении заказа. Внешнего ключа на товар
+    нет, чтобы удаление товара не затрагивало оформленные заказы.
+    """
+    __tablename__ = 'order_items'
+    order_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey(Order.id),
+                                                primary_key=True)
+    product_id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    name: so.Mapped[str] = so.mapped_column(sa.String(64))
+    unit_price: so.Mapped[int] = so.mapped_column()
+    amount: so.Mapped[int] = so.mapped_column()
+    order: so.Mapped[Order] = so.relationship(back_populates='items')
+
+    def __repr__(self):
+        return (f'<OrderItem order_id={self.order_id},'
+                f' product_id={self.product_id}, amount={self.amount}>')
+
+    @property
+    def total_amount(self) -> int:
+        """Стоимость позиции заказа."""
+        return self.unit_price * self.amount
 
 
 class OrderStatus(db.Model):  # type: ignore[name-defined]
@@ -337,6 +734,137 @@ class OrderStatus(db.Model):  # type: ignore[name-defined]
         return self.name
 
 
+STATUSES = EnumRegistry(OrderStatus)
+
+
+class StockHold(db.Model):  # type: ignore[name-defined]
+    """Модель БД таблица stock_hold.
+
+    Резерв товара корзины на время оформления заказа, поддерживается
+    модулем app.reservations вместе со счётчиком Product.reserved.
+    """
+    __tablename__ = 'stock_hold'
+    basket_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey(Basket.id),
+                                                 primary_key=True)
+    # Резервы удаляются вместе с товаром, даже если резерв добавлен
+    # параллельно с удалением товара
+    product_id: so.Mapped[int] = so.mapped_column(
+        sa.ForeignKey(Product.id, ondelete='CASCADE'), primary_key=True)
+    amount: so.Mapped[int] = so.mapped_column()
+    expires_at: so.Mapped[datetime] = so.mapped_column(index=True)
+
+    def __repr__(self):
+        return (f'<StockHold basket_id={self.basket_id},'
+                f' product_id={self.product_id}, amount={self.amount}>')
+
+
+class IdempotencyKey(db.Model):  # type: ignore[name-defined]
+    """Модель БД таблица idempotency_key.
+
+    Результат запроса с ключом идемпотентности, поддерживается модулем
+    app.idempotency. Пока запрос выполняется, status_code не заполнен.
+    """
+    __tablename__ = 'idempotency_key'
+    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey(User.id),
+                                               primary_key=True)
+    key: so.Mapped[str] = so.mapped_column(sa.String(64), primary_key=True)
+    status_code: so.Mapped[Optional[int]] = so.mapped_column()
+    location: so.Mapped[Optional[str]] = so.mapped_column(sa.String(200))
+    message: so.Mapped[Optional[str]] = so.mapped_column(sa.String(200))
+    created_at: so.Mapped[datetime] = so.mapped_column(
+        index=True, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return (f'<IdempotencyKey {self.key!r}, user_id={self.user_id},'
+                f' status_code={self.status_code}>')
+
+
+class OutboxMessage(db.Model):  # type: ignore[name-defined]
+    """Модель БД таблица outbox.
+
+    Сообщение для фоновой обработки (app.outbox), записывается в одной
+    транзакции с изменением заказа. available_at - время следующей
+    попытки, после исчерпания попыток не заполнено.
+    """
+    __tablename__ = 'outbox'
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    kind: so.Mapped[str] = so.mapped_column(sa.String(32))
+    payload: so.Mapped[dict] = so.mapped_column(sa.JSON)
+    attempts: so.Mapped[int] = so.mapped_column(default=0)
+    available_at: so.Mapped[Optional[datetime]] = so.mapped_column(
+        index=True, default=lambda: datetime.now(timezone.utc))
+    last_error: so.Mapped[Optional[str]] = so.mapped_column(sa.String(200))
+    created_at: so.Mapped[datetime] = so.mapped_column(
+        default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return (f'<OutboxMessage {self.id}, kind={self.kind!r},'
+                f' attempts={self.attempts}>')
+
+
+class ProductTrigram(db.Model):  # type: ignore[name-defined]
+    """Модель БД таблица product_trigram.
+
+    Триграммы названия и бренда товара для нечёткого поиска на СУБД
+    без расширения pg_trgm, поддерживается модулем app.search.
+    """
+    __tablename__ = 'product_trigram'
+    trigram: so.Mapped[str] = so.mapped_column(sa.String(3),
+                                               primary_key=True)
+    product_id: so.Mapped[int] = so.mapped_column(
+        sa.ForeignKey(Product.id), primary_key=True, index=True)
+
+    def __repr__(self):
+        return (f'<ProductTrigram {self.trigram!r},'
+                f' product_id={self.product_id}>')
+
+
+class FacetCount(db.Model):  # type: ignore[name-defined]
+    """Модель БД таблица facet_count.
+
+    Предрассчитанное количество товаров для каждого значения фасета
+    (бренд, категория, диапазон цен, наличие), поддерживается модулем
+    app.facets при изменении товаров.
+    """
+    __tablename__ = 'facet_count'
+    facet: so.Mapped[str] = so.mapped_column(sa.String(20), primary_key=True)
+    value: so.Mapped[str] = so.mapped_column(sa.String(64), primary_key=True)
+    count: so.Mapped[int] = so.mapped_column(default=0)
+
+    def __repr__(self):
+        return f'<FacetCount {self.facet}={self.value}: {self.count}>'
+
+
+class ProductChange(db.Model):  # type: ignore[name-defined]
+    """Модель БД таблица product_change.
+
+    Журнал изменений товаров по версиям каталога, по которому индекс
+    подсказок (app.suggest) в каждом процессе обновляется точечно.
+    Записи старых версий удаляются при добавлении новых.
+    """
+    __tablename__ = 'product_change'
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    version: so.Mapped[int] = so.mapped_column(index=True)
+    product_id: so.Mapped[int] = so.mapped_column()
+
+    def __repr__(self):
+        return f'<ProductChange {self.product_id}@{self.version}>'
+
+
+class CacheVersion(db.Model):  # type: ignore[name-defined]
+    """Модель БД таблица cache_version.
+
+    Счётчики версий данных, по которым кэши в памяти процессов узнают
+    об изменениях, например версия каталога товаров 'catalog'.
+    """
+    __tablename__ = 'cache_version'
+    name: so.Mapped[str] = so.mapped_column(sa.String(32), primary_key=True)
+    version: so.Mapped[int] = so.mapped_column(default=0)
+
+    def __repr__(self):
+        return f'<CacheVersion {self.name}={self.version}>'
+
+
 @login.user_loader
 def load_user(id: str) -> Optional[User]:
     """Загрузка пользователя для Flask-Login."""
@@ -0,0 +1,185 @@
+"""Фоновая обработка побочных действий заказов (transactional outbox).
+
+Письма и уведомления о заказе не отправляются в запросе: маршрут
+записывает сообщение OutboxMessage в той же транзакции, в которой
+меняется заказ, поэтому сообщение появляется только вместе с
+зафиксированным изменением. Обработчик (flask worker run) забирает
+готовые сообщения пакетами по OUTBOX_BATCH_SIZE и выполняет их в пуле
+потоков gevent. Выполненные сообщения удаляются, неудачные повторяются
+с задержкой OUTBOX_RETRY_DELAY * 2 ** (попытка - 1) секунд, после
+OUTBOX_MAX_ATTEMPTS попыток сообщение остаётся в таблице с пустым
+available_at и текстом последней ошибки.
+
+Сообщение забирается запросом UPDATE ... RETURNING, который переносит
+available_at на OUTBOX_LEASE секунд вперёд, поэтому несколько
+обработчиков не выполняют одно сообщение одновременно, а сообщения
+упавшего обработчика выполняются повторно после истечения этого срока.
+
+Пример использования:
+>>> order.set_status('Подтверждён')
+>>> outbox.order_changed(order)
+>>> db.session.commit()
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import sqlalchemy as sa
+from flask import current_app, render_template
+from flask_mail import Message
+from gevent.threadpool import ThreadPool
+
+from app import db, mail
+from app.models import Order, OutboxMessage
+
+# Обработчики сообщений по виду сообщения
+HANDLERS: Dict[str, Callable[[dict], None]] = {}
+
+
+class OutboxResult(NamedTuple):
+    """Итог обработки пакета сообщений."""
+    sent: int
+    failed: int
+
+
+def handler(kind: str):
+    """Декоратор регистрации обработчика сообщений вида kind.
+
+    Обработчик получает данные сообщения и выполняется в отдельном потоке
+    в собственном контексте приложения. Исключение означает неудачную
+    попытку.
+    """
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind: str, payload: dict) -> OutboxMessage:
+    """Добавление сообщения в текущую транзакцию."""
+    message = OutboxMessage(kind=kind, payload=payload)
+    db.session.add(message)
+    return message
+
+
+def order_changed(order: Order) -> OutboxMessage:
+    """Добавление письма покупателю о текущем статусе заказа
+    в текущую транзакцию."""
+    if order.id is None:
+        db.session.flush()
+    return enqueue('order_email', {'order_id': order.id,
+                                   'status': order.status.name})
+
+
+@handler('order_email')
+def send_order_email(payload: dict) -> None:
+    """Отправка письма о статусе заказа."""
+    order = db.session.get(Order, payload['order_id'])
+    if order is None:  # Заказ удалён, письмо не нужно
+        return
+    mail.send(Message(
+        subject=f'Заказ {order.order_number}: {payload["status"]}',
+        recipients=[order.customer.email],
+        body=render_template('email/order.txt', order=order,
+                             status=payload['status'])))
+
+
+def claim(batch_size: int) -> List[sa.Row]:
+    """Забор не более batch_size готовых сообщений на OUTBOX_LEASE секунд.
+    Транзакция фиксируется.
+
+    Возвращает:
+        List[Row]: Строки (id, kind, payload, attempts).
+    """
+    now = datetime.now(timezone.utc)
+    due = OutboxMessage.available_at <= now
+    ids = (sa.select(OutboxMessage.id).where(due)
+           .order_by(OutboxMessage.available_at, OutboxMessage.id)
+           .limit(batch_size))
+    rows = db.session.execute(
+        sa.update(OutboxMessage)
+        .where(OutboxMessage.id.in_(ids), due)
+        .values(available_at=now + timedelta(
+            seconds=current_app.config['OUTBOX_LEASE']))
+        .returning(OutboxMessage.id, OutboxMessage.kind,
+                   OutboxMessage.payload, OutboxMessage.attempts)
+        .execution_options(synchronize_session=False)).all()
+    db.session.commit()
+    return sorted(rows, key=lambda row: row.id)
+
+
+def _deliver(app, row: sa.Row) -> Optional[str]:
+    """Выполнение сообщения в потоке пула.
+
+    Возвращает:
+        Optional[str]: Текст ошибки или None при успехе.
+    """
+    with app.app_context():
+        try:
+            HANDLERS[row.kind](row.payload)
+        except Exception as error:
+            return repr(error)[:200]
+    return None
+
+
+def process_batch(pool: ThreadPool, batch_size: int) -> OutboxResult:
+    """Обработка одного пакета сообщений в пуле потоков pool."""
+    rows = claim(batch_size)
+    if not rows:
+        return OutboxResult(0, 0)
+    # Потоки пула получают само приложение, а не прокси current_app
+    app = current_app._get_current_object()  # type: ignore[attr-defined]
+    errors = pool.map(lambda row: _deliver(app, row), rows)
+    sent = [row.id for row, error in zip(rows, errors) if error is None]
+    failed = [(row, error) for row, error in zip(rows, errors)
+              if error is not None]
+    if sent:
+        db.session.execute(
+            sa.delete(OutboxMessage).where(OutboxMessage.id.in_(sent)))
+    if failed:
+        now = datetime.now(timezone.utc)
+        config = current_app.config
+        table = OutboxMessage.__table__
+        retries = []
+        for row, error in failed:
+            attempts = row.attempts + 1
+            available_at = None  # Попытки исчерпаны
+            if attempts < config['OUTBOX_MAX_ATTEMPTS']:
+                available_at = now + timedelta(
+                    seconds=config['OUTBOX_RETRY_DELAY']
+                    * 2 ** (attempts - 1))
+            retries.append({'message_id': row.id, 'attempts': attempts,
+                            'available_at': available_at,
+                            'last_error': error})
+        db.session.execute(
+            sa.update(table)
+            .where(table.c.id == sa.bindparam('message_id'))
+            .values(attempts=sa.bindparam('attempts'),
+                    available_at=sa.bindparam('available_at'),
+                    last_error=sa.bindparam('last_error')),
+            retries)
+    db.session.commit()
+    return OutboxResult(len(sent), len(failed))
+
+
+def run(batch_size: int, pool_size: int, poll_interval: float,
+        once: bool = False,
+        progress: Optional[Callable[[OutboxResult], None]] = None) -> None:
+    """Обработка сообщений пакетами.
+
+    Следующий пакет забирается сразу, если предыдущий был полным, иначе
+    после паузы poll_interval секунд. При once обработка завершается,
+    когда готовых сообщений не осталось.
+    """
+    pool = ThreadPool(pool_size)
+    try:
+        while True:
+            result = process_batch(pool, batch_size)
+            if progress is not None and (result.sent or result.failed):
+                progress(result)
+            if result.sent + result.failed < batch_size:
+                if once:
+                    break
+                time.sleep(poll_interval)
+    finally:
+        pool.kill()
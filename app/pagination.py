@@ -0,0 +1,141 @@
+"""Постраничный вывод по ключу (keyset/cursor pagination).
+
+В отличие от db.paginate не выполняет COUNT(*) и OFFSET: следующая страница
+выбирается условием "ключ строки после ключа последней строки", поэтому
+стоимость любой страницы одинакова при наличии индекса по ключу.
+"""
+import base64
+import binascii
+import json
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+
+# Ключ сортировки: выражение (или атрибут модели) и признак сортировки
+# по убыванию
+SortKey = Tuple[Union[sa.ColumnElement, so.QueryableAttribute], bool]
+
+
+def encode_cursor(direction: str, values: Sequence[Any]) -> str:
+    """Кодирование курсора в строку для передачи в url."""
+    payload = json.dumps([direction, list(values)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]
+                  ) -> Optional[Tuple[str, List[Any]]]:
+    """Декодирование курсора, некорректный курсор считается отсутствующим.
+
+    Возвращает:
+        Optional[Tuple[str, List[Any]]]: Направление ('next' или 'prev')
+          и значения ключа.
+    """
+    if not cursor:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, values = json.loads(payload)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        return None
+    return direction, values
+
+
+def _after(keys: Sequence[SortKey], values: Sequence[Any]
+           ) -> sa.ColumnElement:
+    """Условие "строка находится после строки с ключом values"."""
+    conditions = []
+    for i, (column, descending) in enumerate(keys):
+        equal = [keys[j][0] == values[j] for j in range(i)]
+        step = column < values[i] if descending else column > values[i]
+        conditions.append(sa.and_(*equal, step))
+    return sa.or_(*conditions)
+
+
+class KeysetPage:
+    """Страница результатов с курсорами соседних страниц."""
+
+    def __init__(self, items: list, next_cursor: Optional[str],
+                 prev_cursor: Optional[str]):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+
+def _prepare(query: sa.Select, keys: Sequence[SortKey],
+             cursor: Optional[str]
+             ) -> Tuple[sa.Select, Optional[Tuple[str, List[Any]]], bool]:
+    """Добавление к запросу условия курсора, сортировки и столбцов ключа."""
+    decoded = decode_cursor(cursor)
+    if decoded is not None and len(decoded[1]) != len(keys):
+        decoded = None  # Курсор от другого списка
+    backwards = decoded is not None and decoded[0] == 'prev'
+    # При движении назад сортировка и условие разворачиваются
+    order = [(column, descending != backwards)
+             for column, descending in keys]
+    query = query.order_by(None).add_columns(
+        *[column.label(f'_key{i}') for i, (column, _) in enumerate(keys)])
+    if decoded is not None:
+        query = query.where(_after(order, decoded[1]))
+    query = query.order_by(*[column.desc() if descending else column.asc()
+                             for column, descending in order])
+    return query, decoded, backwards
+
+
+def _key_values(row, count: int) -> List[Any]:
+    return [row._mapping[f'_key{i}'] for i in range(count)]
+
+
+def _cursors(first: Optional[List[Any]], last: Optional[List[Any]],
+             has_more: bool, decoded, backwards: bool
+             ) -> Tuple[Optional[str], Optional[str]]:
+    """Курсоры соседних страниц по ключам первой и последней строки."""
+    next_cursor = prev_cursor = None
+    if first is not None and last is not None:
+        if has_more or backwards:
+            next_cursor = encode_cursor('next', last)
+        if (has_more and backwards) or (decoded is not None
+                                        and not backwards):
+            prev_cursor = encode_cursor('prev', first)
+    return next_cursor, prev_cursor
+
+
+def keyset_paginate(session, query: sa.Select, keys: Sequence[SortKey],
+                    cursor: Optional[str] = None,
+                    per_page: int = 10) -> KeysetPage:
+    """Получение страницы запроса query, упорядоченного по ключам keys.
+
+    Последний ключ должен быть уникальным (обычно первичный ключ), чтобы
+    порядок строк был однозначным. Элементами страницы являются значения
+    первого столбца запроса.
+
+    Пример использования:
+    >>> page = keyset_paginate(db.session, sa.select(Product),
+    ...                        [(Product.id, True)], cursor, per_page=10)
+    >>> url_for('main.explore', cursor=page.next_cursor)
+    """
+    query, decoded, backwards = _prepare(query, keys, cursor)
+    rows = session.execute(query.limit(per_page + 1)).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+    items = [row[0] for row in rows]
+    next_cursor, prev_cursor = _cursors(
+        _key_values(rows[0], len(keys)) if rows else None,
+        _key_values(rows[-1], len(keys)) if rows else None,
+        has_more, decoded, backwards)
+    return KeysetPage(items, next_cursor, prev_cursor)
@@ -0,0 +1,146 @@
+"""Резервирование товаров на время оформления заказа.
+
+При переходе к оформлению (main.checkout) количество товаров корзины
+резервируется на RESERVATION_TTL секунд: для каждого товара создаётся
+запись StockHold и увеличивается счётчик Product.reserved, поэтому
+доступное количество (stock - reserved) получается без суммирования
+резервов. При оформлении заказа (main.submit_order) резервы корзины
+снимаются в той же транзакции, в которой списывается наличие.
+
+Резервы с истёкшим сроком на товары корзины снимаются при резервировании
+и оформлении заказа этой корзины, поэтому брошенное оформление
+не уменьшает доступное количество дольше RESERVATION_TTL без внешнего
+планировщика. Команда flask reservations sweep снимает все истёкшие
+резервы разом (например, у товаров, которые больше никто не заказывает),
+её запуск по расписанию необязателен. Резервы удаляемых корзин снимаются
+функцией release_baskets.
+
+Резервы забираются запросом DELETE ... RETURNING до изменения счётчика,
+поэтому один и тот же резерв не может быть снят дважды при параллельном
+оформлении заказа и очистке.
+
+Пример использования:
+>>> if not reservations.hold(basket, basket.get_basket_products()):
+...     db.session.rollback()
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Collection, Counter, Dict, Iterable, Sequence, Tuple
+
+import sqlalchemy as sa
+from flask import current_app
+
+from app import db
+from app.models import Basket, Product, StockHold
+
+product_table = Product.__table__
+
+
+def _release(rows: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+    """Уменьшение счётчиков reserved на количество снятых резервов.
+
+    Аргументы:
+        rows: Пары (id товара, количество) удалённых записей StockHold.
+
+    Возвращает:
+        Dict[int, int]: Снятое количество по id товара.
+    """
+    released: Counter[int] = Counter()
+    for product_id, amount in rows:
+        released[product_id] += amount
+    if released:
+        db.session.execute(
+            sa.update(product_table)
+            .where(product_table.c.id == sa.bindparam('product_id'))
+            .values(reserved=product_table.c.reserved
+                    - sa.bindparam('amount')),
+            [{'product_id': product_id, 'amount': amount}
+             for product_id, amount in sorted(released.items())])
+    return dict(released)
+
+
+def _take(condition: sa.ColumnElement) -> Sequence[Tuple[int, int]]:
+    """Удаление резервов по условию одним запросом DELETE ... RETURNING.
+
+    Возвращает:
+        Sequence[Tuple[int, int]]: Пары (id товара, количество) удалённых
+          резервов.
+    """
+    return db.session.execute(
+        sa.delete(StockHold).where(condition)
+        .returning(StockHold.product_id, StockHold.amount)).tuples().all()
+
+
+def _expired(product_ids: Collection[int]) -> sa.ColumnElement:
+    """Условие "резерв товара из product_ids с истёкшим сроком"."""
+    return sa.and_(StockHold.product_id.in_(product_ids),
+                   StockHold.expires_at < datetime.now(timezone.utc))
+
+
+def release(basket: Basket,
+            product_ids: Collection[int] = ()) -> Dict[int, int]:
+    """Снятие всех резервов корзины и истёкших резервов других корзин
+    на товары product_ids одним запросом. Транзакция не фиксируется.
+
+    Возвращает:
+        Dict[int, int]: Снятое количество по id товара.
+    """
+    condition = StockHold.basket_id == basket.id
+    if product_ids:
+        condition = sa.or_(condition, _expired(product_ids))
+    return _release(_take(condition))
+
+
+def release_baskets(basket_ids: sa.Select) -> int:
+    """Снятие всех резервов корзин из подзапроса basket_ids перед
+    удалением корзин. Транзакция не фиксируется.
+
+    Возвращает:
+        int: Количество снятых резервов.
+    """
+    rows = _take(StockHold.basket_id.in_(basket_ids))
+    _release(rows)
+    return len(rows)
+
+
+def hold(basket: Basket, basket_items: Dict[Product, int]) -> bool:
+    """Резервирование товаров корзины на RESERVATION_TTL секунд.
+
+    Предыдущие резервы корзины заменяются, истёкшие резервы других корзин
+    на те же товары снимаются. Каждый товар резервируется
+    условным UPDATE, который не даёт зарезервировать больше доступного
+    количества. Транзакция не фиксируется, при неудаче её нужно откатить.
+
+    Возвращает:
+        bool: Удалось ли зарезервировать все товары.
+    """
+    release(basket, [product.id for product in basket_items])
+    expires_at = (datetime.now(timezone.utc)
+                  + timedelta(seconds=current_app.config['RESERVATION_TTL']))
+    # Строки товаров блокируются в порядке id
+    for product, amount in sorted(basket_items.items(),
+                                  key=lambda item: item[0].id):
+        reserved = db.session.execute(
+            sa.update(product_table)
+            .where(product_table.c.id == product.id,
+                   product_table.c.stock - product_table.c.reserved
+                   >= amount)
+            .values(reserved=product_table.c.reserved + amount)).rowcount
+        if not reserved:
+            return False
+    db.session.execute(sa.insert(StockHold), [
+        {'basket_id': basket.id, 'product_id': product.id,
+         'amount': amount, 'expires_at': expires_at}
+        for product, amount in basket_items.items()])
+    return True
+
+
+def release_expired() -> int:
+    """Снятие всех резервов с истёкшим сроком двумя запросами.
+    Транзакция не фиксируется.
+
+    Возвращает:
+        int: Количество снятых резервов.
+    """
+    rows = _take(StockHold.expires_at < datetime.now(timezone.utc))
+    _release(rows)
+    return len(rows)
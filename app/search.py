@@ -0,0 +1,243 @@
+"""Полнотекстовый и нечёткий поиск по каталогу товаров.
+
+На SQLite используется виртуальная таблица FTS5 (product_fts) и таблица
+триграмм (product_trigram), которые необходимо синхронизировать с таблицей
+product при каждом изменении товара. На PostgreSQL используются GIN индексы
+по выражению tsvector и по триграммам pg_trgm, которые поддерживаются
+базой данных самостоятельно.
+"""
+import math
+import re
+from typing import Any, List, Set, Tuple
+
+import sqlalchemy as sa
+from flask import current_app
+
+from app import db
+from app.models import Product, ProductTrigram
+from app.sql import dialect_name
+
+FTS_TABLE = 'product_fts'
+# Выражение документа для PostgreSQL, должно совпадать с выражением индекса
+PG_DOCUMENT = ("to_tsvector('russian', coalesce(product.name, '') || ' ' || "
+               "coalesce(product.description, ''))")
+
+_WORD_RE = re.compile(r'\w+')
+
+product_fts = sa.table(FTS_TABLE, sa.column('rowid'), sa.column('name'),
+                       sa.column('description'), sa.column('rank'))
+
+# Создание индекса вместе с таблицей product (db.create_all, тесты)
+sa.event.listen(
+    Product.__table__, 'after_create',
+    sa.DDL(f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+           'USING fts5(name, description, '
+           "tokenize=\"unicode61 remove_diacritics 2\")"
+           ).execute_if(dialect='sqlite'))
+sa.event.listen(
+    Product.__table__, 'after_create',
+    sa.DDL(f'CREATE INDEX IF NOT EXISTS ix_{FTS_TABLE} ON product '
+           f'USING gin (({PG_DOCUMENT}))').execute_if(dialect='postgresql'))
+sa.event.listen(
+    Product.__table__, 'after_create',
+    sa.DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm; '
+           'CREATE INDEX IF NOT EXISTS ix_product_name_trgm ON product '
+           'USING gin (name gin_trgm_ops); '
+           'CREATE INDEX IF NOT EXISTS ix_product_brand_trgm ON product '
+           'USING gin (brand gin_trgm_ops)').execute_if(dialect='postgresql'))
+sa.event.listen(
+    Product.__table__, 'before_drop',
+    sa.DDL(f'DROP TABLE IF EXISTS {FTS_TABLE}').execute_if(dialect='sqlite'))
+
+
+def normalize(text: str) -> str:
+    """Приведение текста к виду, в котором он хранится в индексе.
+
+    Помимо приведения регистра буква "ё" заменяется на "е", так как
+    токенизатор FTS5 их не отождествляет.
+    """
+    return text.casefold().replace('ё', 'е')
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбиение текста на нормализованные слова."""
+    return _WORD_RE.findall(normalize(text or ''))
+
+
+def trigrams(text: str) -> Set[str]:
+    """Получение триграмм текста по правилам pg_trgm.
+
+    Каждое слово дополняется двумя пробелами в начале и одним в конце,
+    например "кот" даёт {'  к', ' ко', 'кот', 'от '}.
+    """
+    result: Set[str] = set()
+    for word in tokenize(text):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(first: Set[str], second: Set[str]) -> float:
+    """Похожесть множеств триграмм (как similarity в pg_trgm)."""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def _product_trigrams(product: Product) -> Set[str]:
+    return trigrams(product.name) | trigrams(product.brand or '')
+
+
+def _fuzzy_rank(product: Product, search_query: str,
+                query_trigrams: Set[str]) -> Tuple[bool, float]:
+    """Ранг товара в нечётком поиске: точное совпадение и похожесть.
+
+    Похожесть считается как для всего названия и бренда, так и для
+    отдельных слов названия (как word_similarity в pg_trgm).
+    """
+    query = ' '.join(tokenize(search_query))
+    name = ' '.join(tokenize(product.name))
+    brand = ' '.join(tokenize(product.brand or ''))
+    exact = query in name or query == brand
+    texts = [name, brand] + tokenize(product.name)
+    score = max(similarity(query_trigrams, trigrams(text)) for text in texts)
+    return exact, score
+
+
+def fuzzy_search(search_query: str, limit: int = 10) -> List[Product]:
+    """Поиск товаров с опечатками по похожести триграмм названия и бренда.
+
+    Кандидаты выбираются по индексу триграмм, затем ранжируются: сначала
+    точные совпадения, далее по убыванию похожести. На SQLite товары
+    с похожестью ниже FUZZY_THRESHOLD отбрасываются, на PostgreSQL порог
+    задаётся pg_trgm.word_similarity_threshold.
+    """
+    query_trigrams = trigrams(search_query)
+    if not query_trigrams:
+        return []
+    candidates_limit = limit * 10
+    threshold = current_app.config['FUZZY_THRESHOLD']
+    if dialect_name() == 'postgresql':
+        query = sa.literal(search_query)
+        score = sa.func.greatest(
+            sa.func.word_similarity(query, Product.name),
+            sa.func.word_similarity(query,
+                                    sa.func.coalesce(Product.brand, '')))
+        products = db.session.scalars(
+            sa.select(Product)
+            .where(sa.or_(query.op('<%')(Product.name),
+                          query.op('<%')(Product.brand)))
+            .order_by(score.desc()).limit(candidates_limit)).all()
+        threshold = 0.0
+    else:
+        # Похожесть не меньше порога возможна, только если совпадает
+        # не меньше threshold * len(query_trigrams) триграмм запроса
+        min_shared = max(1, math.ceil(threshold * len(query_trigrams)))
+        shared = sa.func.count().label('shared')
+        candidates = (
+            sa.select(ProductTrigram.product_id)
+            .where(ProductTrigram.trigram.in_(query_trigrams))
+            .group_by(ProductTrigram.product_id)
+            .having(shared >= min_shared)
+            .order_by(shared.desc()).limit(candidates_limit))
+        products = db.session.scalars(
+            sa.select(Product).where(Product.id.in_(candidates))).all()
+    ranked = [(_fuzzy_rank(product, search_query, query_trigrams), product)
+              for product in products]
+    ranked = [(rank, product) for rank, product in ranked
+              if rank[0] or rank[1] >= threshold]
+    ranked.sort(key=lambda item: (not item[0][0], -item[0][1],
+                                  -item[1].id))
+    return [product for _, product in ranked[:limit]]
+
+
+def search_products(search_query: str) -> sa.Select:
+    """Получение запроса товаров, подходящих под поисковой запрос.
+
+    Каждое слово запроса ищется как префикс, все слова обязательны.
+    Результат отсортирован по релевантности, вторым столбцом запроса
+    возвращается её значение (relevance, чем меньше, тем релевантнее).
+
+    Пример использования:
+    >>> db.paginate(search_products('смартфон'), page=1)
+    """
+    tokens = tokenize(search_query)
+    if not tokens:  # В запросе нет слов, по которым можно искать
+        return (sa.select(Product, sa.literal(0.0).label('relevance'))
+                .where(sa.false()))
+    relevance: sa.ColumnElement[Any]
+    if dialect_name() == 'postgresql':
+        ts_query = ' & '.join(f'{token}:*' for token in tokens)
+        document: sa.ColumnElement[Any] = sa.literal_column(PG_DOCUMENT)
+        # ts_rank возвращает real; значение курсора страницы приходит
+        # из JSON как double и равно рангу, только если ранг тоже double
+        relevance = -sa.cast(
+            sa.func.ts_rank(document,
+                            sa.func.to_tsquery('russian', ts_query)),
+            sa.Double)
+        return (sa.select(Product, relevance.label('relevance'))
+                .where(document.bool_op('@@')(
+                    sa.func.to_tsquery('russian', ts_query)))
+                .order_by(relevance, Product.id.desc()))
+    fts_query = ' '.join(f'"{token}"*' for token in tokens)
+    relevance = product_fts.c.rank
+    return (sa.select(Product, relevance.label('relevance'))
+            .join(product_fts, product_fts.c.rowid == Product.id)
+            .where(sa.literal_column(FTS_TABLE).op('MATCH')(fts_query))
+            .order_by(relevance, Product.id.desc()))
+
+
+def index_product(product: Product) -> None:
+    """Добавление или обновление товара в поисковом индексе.
+
+    Товар должен иметь id, поэтому вызывается после db.session.flush().
+    """
+    if dialect_name() != 'sqlite':  # Индексы PostgreSQL обновляются сами
+        return
+    remove_product(product.id)
+    db.session.execute(sa.insert(product_fts).values(
+        rowid=product.id, name=normalize(product.name),
+        description=normalize(product.description or '')))
+    rows = [{'trigram': trigram, 'product_id': product.id}
+            for trigram in _product_trigrams(product)]
+    if rows:
+        db.session.execute(sa.insert(ProductTrigram), rows)
+
+
+def remove_product(product_id: int) -> None:
+    """Удаление товара из поискового индекса."""
+    if dialect_name() != 'sqlite':
+        return
+    db.session.execute(sa.delete(product_fts).where(
+        product_fts.c.rowid == product_id))
+    db.session.execute(sa.delete(ProductTrigram).where(
+        ProductTrigram.product_id == product_id))
+
+
+def rebuild_index(batch_size: int = 1000) -> int:
+    """Полное перестроение поискового индекса по таблице product.
+
+    Возвращает:
+        int: Количество проиндексированных товаров.
+    """
+    if dialect_name() != 'sqlite':
+        return 0
+    db.session.execute(sa.delete(product_fts))
+    db.session.execute(sa.delete(ProductTrigram))
+    count = 0
+    rows = db.session.execute(
+        sa.select(Product.id, Product.name, Product.description,
+                  Product.brand)
+        .execution_options(yield_per=batch_size))
+    for batch in rows.partitions():
+        db.session.execute(sa.insert(product_fts), [
+            {'rowid': id, 'name': normalize(name),
+             'description': normalize(description or '')}
+            for id, name, description, _ in batch])
+        trigram_rows = [{'trigram': trigram, 'product_id': id}
+                        for id, name, _, brand in batch
+                        for trigram in trigrams(name) | trigrams(brand or '')]
+        if trigram_rows:
+            db.session.execute(sa.insert(ProductTrigram), trigram_rows)
+        count += len(batch)
+    return count
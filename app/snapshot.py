@@ -0,0 +1,177 @@
+"""Неизменяемый снимок каталога товаров для страниц, которые его читают.
+
+Снимок строится двумя запросами к таблицам product и categories без
+создания ORM объектов и хранится в памяти процесса. При изменении версии
+каталога (cache.CATALOG) строится новый снимок, который заменяет старый
+одним присваиванием, поэтому запросы, начавшие работу со старым снимком,
+дочитывают его без блокировок.
+
+Количество товара в наличии меняется при каждом заказе и не меняет версию
+каталога, поэтому оно запрашивается отдельно функцией with_stock. Рейтинг
+меняется с каждым отзывом и выводится только на странице товара, поэтому
+в снимок не входит и читается этой страницей из базы.
+
+Пример использования:
+>>> snapshot = get_snapshot()
+>>> products = with_stock(snapshot.get_many([3, 2, 1]))
+"""
+import sys
+from threading import Lock
+from typing import (Dict, Iterable, Iterator, List, NamedTuple, Optional,
+                    Tuple)
+
+import sqlalchemy as sa
+from flask import current_app
+
+from app import cache, db
+from app.models import Category, Product, categories
+
+_build_lock = Lock()
+
+
+class CategoryView(NamedTuple):
+    """Категория товара в снимке."""
+    id: int
+    name: str
+
+
+class ProductView:
+    """Товар в снимке каталога, атрибуты совпадают со столбцами Product.
+
+    Объекты неизменяемы и сравниваются по id, поэтому могут быть ключами
+    словаря, как Product в шаблонах.
+    """
+    __slots__ = ('id', 'name', 'description', 'price', 'brand', 'stock',
+                 'photo_path', 'categories')
+    id: int
+    name: str
+    description: Optional[str]
+    price: int
+    brand: Optional[str]
+    stock: int
+    photo_path: Optional[str]
+    categories: Tuple[CategoryView, ...]
+
+    def __init__(self, id: int, name: str, description: Optional[str],
+                 price: int, brand: Optional[str], stock: int,
+                 photo_path: Optional[str],
+                 categories: Tuple[CategoryView, ...] = ()):
+        for field, value in zip(self.__slots__, (
+                id, name, description, price, brand, stock, photo_path,
+                categories)):
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ProductView is immutable')
+
+    def __eq__(self, other):
+        return isinstance(other, ProductView) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<ProductView {self.name}>'
+
+    def replace(self, **changes) -> 'ProductView':
+        """Получение копии товара с изменёнными атрибутами."""
+        fields = {field: getattr(self, field) for field in self.__slots__}
+        fields.update(changes)
+        return ProductView(**fields)
+
+
+class CatalogSnapshot:
+    """Снимок каталога определённой версии."""
+    __slots__ = ('version', '_products')
+
+    def __init__(self, version: int, products: Dict[int, ProductView]):
+        self.version = version
+        self._products = products
+
+    def __len__(self):
+        return len(self._products)
+
+    def __iter__(self) -> Iterator[ProductView]:
+        return iter(self._products.values())
+
+    def get(self, id: int) -> Optional[ProductView]:
+        """Получение товара по id."""
+        return self._products.get(id)
+
+    def get_many(self, ids: Iterable[int]) -> List[ProductView]:
+        """Получение товаров в порядке ids, отсутствующие пропускаются."""
+        products = self._products
+        return [products[id] for id in ids if id in products]
+
+    def memory_size(self) -> int:
+        """Оценка занимаемой снимком памяти в байтах.
+
+        Учитываются словарь, объекты товаров и их строки; объекты
+        категорий общие для всех товаров и учитываются один раз.
+        """
+        size = sys.getsizeof(self._products)
+        seen = set()
+        for product in self._products.values():
+            size += sys.getsizeof(product) + sys.getsizeof(product.id)
+            for field in ('name', 'description', 'brand', 'photo_path'):
+                value = getattr(product, field)
+                if value is not None:
+                    size += sys.getsizeof(value)
+            size += sys.getsizeof(product.categories)
+            for category in product.categories:
+                if category.id not in seen:
+                    seen.add(category.id)
+                    size += sys.getsizeof(category) + sys.getsizeof(
+                        category.name)
+        return size
+
+
+def build_snapshot(version: int) -> CatalogSnapshot:
+    """Построение снимка каталога по текущему состоянию базы."""
+    category_views = {id: CategoryView(id, name) for id, name in
+                      db.session.execute(sa.select(Category.id,
+                                                   Category.name))}
+    product_categories: Dict[int, List[CategoryView]] = {}
+    for category_id, product_id in db.session.execute(
+            sa.select(categories.c.category_id, categories.c.product_id)):
+        product_categories.setdefault(product_id, []).append(
+            category_views[category_id])
+    products = {}
+    for row in db.session.execute(sa.select(
+            Product.id, Product.name, Product.description, Product.price,
+            Product.brand, Product.stock, Product.photo_path)).tuples():
+        views = sorted(product_categories.get(row[0], ()),
+                       key=lambda category: category.name)
+        products[row[0]] = ProductView(*row, tuple(views))
+    return CatalogSnapshot(version, products)
+
+
+def get_snapshot(version: Optional[int] = None) -> CatalogSnapshot:
+    """Получение снимка каталога актуальной версии.
+
+    Версию каталога можно передать, если она уже прочитана в запросе.
+    """
+    if version is None:
+        version = cache.get_version(cache.CATALOG)
+    snapshot = current_app.extensions.get('snapshot')
+    if snapshot is not None and snapshot.version >= version:
+        return snapshot
+    with _build_lock:  # Снимок строит только один поток
+        snapshot = current_app.extensions.get('snapshot')
+        if snapshot is None or snapshot.version < version:
+            snapshot = build_snapshot(version)
+            current_app.extensions['snapshot'] = snapshot
+    return snapshot
+
+
+def with_stock(products: List[ProductView]) -> List[ProductView]:
+    """Обновление количества в наличии у товаров одним запросом."""
+    if not products:
+        return products
+    stocks: Dict[int, int] = dict(db.session.execute(
+        sa.select(Product.id, Product.stock)
+        .where(Product.id.in_([product.id for product in products])))
+        .tuples().all())
+    return [product if stocks.get(product.id, product.stock) == product.stock
+            else product.replace(stock=stocks[product.id])
+            for product in products]
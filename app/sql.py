@@ -0,0 +1,30 @@
+"""Вспомогательные функции для запросов, зависящих от СУБД."""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+
+
+def dialect_name() -> str:
+    """Название диалекта СУБД текущей сессии ('sqlite', 'postgresql')."""
+    return db.session.get_bind().dialect.name
+
+
+def insert(table):
+    """Конструкция INSERT с поддержкой ON CONFLICT для текущей СУБД.
+
+    Пример использования:
+    >>> stmt = insert(FacetCount).values(facet='brand', value='X', count=1)
+    >>> stmt.on_conflict_do_update(index_elements=['facet', 'value'],
+    ...                            set_={'count': FacetCount.count + 1})
+    """
+    if dialect_name() == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def least(*args):
+    """Наименьшее из значений (least в PostgreSQL, min в SQLite)."""
+    if dialect_name() == 'postgresql':
+        return sa.func.least(*args)
+    return sa.func.min(*args)
@@ -0,0 +1,91 @@
+// Изменения количества товаров в корзине накапливаются и отправляются
+// одним запросом после паузы в нажатиях
+const BASKET_DEBOUNCE_MS = 300;
+const basketDeltas = {};    // id товара -> накопленное изменение
+const basketElements = {};  // id товара -> id элементов количества и строки
+let basketTimer = null;
+
+function queue_basket_delta(productId, delta, elementId, parentId) {
+    basketDeltas[productId] = (basketDeltas[productId] || 0) + delta;
+    basketElements[productId] = {elementId: elementId, parentId: parentId};
+    // Количество сразу показывается с учётом нажатия, после ответа
+    // сервера оно заменяется фактическим
+    const amountElement = document.getElementById(elementId);
+    if (amountElement) {
+        const amount = Math.max((parseInt(amountElement.textContent) || 0) + delta, 0);
+        amountElement.textContent = amount > 0 ? amount : '';
+    }
+    clearTimeout(basketTimer);
+    basketTimer = setTimeout(flush_basket_deltas, BASKET_DEBOUNCE_MS);
+}
+
+function take_basket_deltas() {
+    const items = {};
+    const elements = {};
+    for (const productId of Object.keys(basketDeltas)) {
+        if (basketDeltas[productId] !== 0) {
+            items[productId] = basketDeltas[productId];
+            elements[productId] = basketElements[productId];
+        }
+        delete basketDeltas[productId];
+        delete basketElements[productId];
+    }
+    return [items, elements];
+}
+
+async function flush_basket_deltas() {
+    basketTimer = null;
+    const [items, elements] = take_basket_deltas();
+    if (Object.keys(items).length === 0) {
+        return;
+    }
+    try {
+        const response = await fetch('/basket/update', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({items: items}),
+        });
+        if (!response.ok) {
+            throw new Error('Failed to update basket');
+        }
+        const data = await response.json();
+        for (const [productId, amount] of Object.entries(data.amounts)) {
+            // Нажатия, сделанные во время запроса, ещё не отправлены
+            if (basketDeltas[productId] || amount === null) {
+                continue;
+            }
+            const amountElement = document.getElementById(elements[productId].elementId);
+            if (amountElement) {
+                amountElement.textContent = amount > 0 ? amount : '';
+            }
+            if (document.URL.includes('basket') && amount < 1) {
+                const parentElement = document.getElementById(elements[productId].parentId);
+                if (parentElement) {
+                    parentElement.remove();
+                }
+            }
+        }
+        const totalAmountElement = document.getElementById('total-amount');
+        if (totalAmountElement && document.URL.includes('basket')) {
+            totalAmountElement.textContent = data.total_amount;
+        }
+    }
+    catch (error) {
+        console.error('Error updating basket:', error);
+    }
+}
+
+// Неотправленные изменения отправляются при уходе со страницы
+window.addEventListener('pagehide', function () {
+    if (basketTimer === null) {
+        return;
+    }
+    clearTimeout(basketTimer);
+    const [items] = take_basket_deltas();
+    if (Object.keys(items).length > 0) {
+        navigator.sendBeacon('/basket/update', new Blob(
+            [JSON.stringify({items: items})], {type: 'application/json'}));
+    }
+});
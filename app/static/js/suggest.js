@@ -0,0 +1,44 @@
+// Подсказки для строки поиска товаров
+(function () {
+    const input = document.getElementById('search-input');
+    const list = document.getElementById('search-suggestions');
+    if (!input || !list) {
+        return;
+    }
+    let timer = null;
+    let urls = {};
+    input.addEventListener('input', function () {
+        // Выбор подсказки из списка переводит на её страницу
+        if (urls[input.value]) {
+            window.location = urls[input.value];
+            return;
+        }
+        clearTimeout(timer);
+        timer = setTimeout(async function () {
+            const query = input.value.trim();
+            if (!query) {
+                list.innerHTML = '';
+                return;
+            }
+            try {
+                const response = await fetch(
+                    `/explore/suggest?q=${encodeURIComponent(query)}`);
+                if (!response.ok) {
+                    throw new Error('Failed to fetch suggestions');
+                }
+                const data = await response.json();
+                urls = {};
+                list.innerHTML = '';
+                for (const item of data.suggestions) {
+                    const option = document.createElement('option');
+                    option.value = item.label;
+                    urls[item.label] = item.url;
+                    list.appendChild(option);
+                }
+            }
+            catch (error) {
+                console.error('Error fetching suggestions:', error);
+            }
+        }, 150);
+    });
+})();
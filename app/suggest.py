@@ -0,0 +1,293 @@
+"""Подсказки для строки поиска товаров.
+
+Подсказки выдаются из индекса в памяти процесса: отсортированных списков
+нормализованных названий товаров и брендов, в которых префикс ищется
+двоичным поиском (bisect). Индекс относится к версии каталога
+(cache.CATALOG) и после публикации не изменяется.
+
+Изменения товаров записываются в журнал product_change с версией
+каталога, в которой они сделаны. Процесс проверяет версию каталога
+не чаще раза в SUGGEST_REFRESH_INTERVAL секунд и при её увеличении
+строит новый индекс, в котором заменены только записанные в журнал
+товары, после чего заменяет индекс одним присваиванием. Журнал хранит
+изменения последних SUGGEST_CHANGE_LOG версий; индекс, отставший сильнее,
+и индекс при первом обращении строятся по снимку каталога целиком.
+"""
+import time
+from bisect import bisect_left, bisect_right
+from itertools import compress
+from threading import Lock
+from typing import (Dict, Iterable, List, NamedTuple, Optional, Sequence,
+                    Set, Tuple)
+
+import sqlalchemy as sa
+from flask import current_app
+
+from app import cache, db, snapshot
+from app.models import Product, ProductChange
+from app.search import normalize
+
+_build_lock = Lock()
+
+# Товар в индексе: id, название, бренд
+ProductRow = Tuple[int, str, Optional[str]]
+# Количество изменённых товаров, после которого основная часть индекса
+# перестраивается
+COMPACT_SIZE = 10000
+
+
+class Suggestion(NamedTuple):
+    """Подсказка: товар (product_id задан) или бренд."""
+    label: str
+    product_id: Optional[int] = None
+
+
+class PrefixIndex:
+    """Индекс названий товаров и брендов для поиска по префиксу.
+
+    Названия хранятся в основной части, построенной целиком, и в небольшой
+    части изменённых товаров. Обновление (updated) копирует только вторую
+    часть и список скрытых товаров основной части, а основная часть общая
+    для всех версий индекса и перестраивается, когда изменённых товаров
+    становится больше COMPACT_SIZE.
+    """
+
+    def __init__(self, version: int = 0):
+        self.version = version
+        # Время последней проверки версии каталога (time.monotonic)
+        self.checked_at = 0.0
+        # Основная часть: параллельные списки нормализованного названия
+        # и id товара, название и бренд по id
+        self._keys: List[str] = []
+        self._ids: List[int] = []
+        self._products: Dict[int, Tuple[str, Optional[str]]] = {}
+        # Товары основной части, изменённые или удалённые позднее
+        self._removed: Set[int] = set()
+        # Изменённые товары в том же виде, что и основная часть
+        self._added_keys: List[str] = []
+        self._added_ids: List[int] = []
+        self._added: Dict[int, Tuple[str, Optional[str]]] = {}
+        # Бренды: нормализованное название, название для вывода
+        # и количество товаров бренда
+        self._brand_keys: List[str] = []
+        self._brands: Dict[str, Tuple[str, int]] = {}
+
+    def __len__(self):
+        return len(self._keys) - len(self._removed) + len(self._added_keys)
+
+    def build(self, products: Sequence[ProductRow]) -> None:
+        """Построение индекса по списку (id, название, бренд)."""
+        entries = sorted((normalize(name), id) for id, name, _ in products)
+        self._set_base([key for key, _ in entries], [id for _, id in entries],
+                       {id: (name, brand) for id, name, brand in products})
+        self._brands = {}
+        for _, _, brand in products:
+            if brand:
+                label, count = self._brands.get(normalize(brand), (brand, 0))
+                self._brands[normalize(brand)] = (label, count + 1)
+        self._brand_keys = sorted(self._brands)
+
+    def _set_base(self, keys: List[str], ids: List[int],
+                  products: Dict[int, Tuple[str, Optional[str]]]) -> None:
+        """Замена основной части индекса, изменённых товаров нет."""
+        self._keys, self._ids = keys, ids
+        self._products = products
+        self._removed = set()
+        self._added_keys, self._added_ids, self._added = [], [], {}
+
+    def updated(self, version: int, product_ids: Iterable[int],
+                products: Sequence[ProductRow]) -> 'PrefixIndex':
+        """Новый индекс версии version, в котором товары product_ids
+        заменены товарами products; товары, отсутствующие в products,
+        удаляются. Текущий индекс не изменяется."""
+        index = PrefixIndex(version)
+        index._keys, index._ids = self._keys, self._ids
+        index._products, index._removed = self._products, self._removed
+        index._added_keys, index._added_ids = (self._added_keys,
+                                               self._added_ids)
+        index._added = self._added
+        index._brand_keys, index._brands = self._brand_keys, self._brands
+        product_ids = set(product_ids)
+        if not product_ids:
+            return index
+        index._removed = self._removed.copy()
+        index._added_keys = self._added_keys.copy()
+        index._added_ids = self._added_ids.copy()
+        index._added = self._added.copy()
+        index._brand_keys = self._brand_keys.copy()
+        index._brands = self._brands.copy()
+        for id in product_ids:
+            index._remove(id)
+        for id, name, brand in products:
+            index._add(id, name, brand)
+        if len(index._removed) + len(index._added) > COMPACT_SIZE:
+            index._compact()
+        return index
+
+    def _get(self, id: int) -> Optional[Tuple[str, Optional[str]]]:
+        """Название и бренд товара в индексе."""
+        if id in self._added:
+            return self._added[id]
+        if id in self._removed:
+            return None
+        return self._products.get(id)
+
+    def _add(self, id: int, name: str, brand: Optional[str]) -> None:
+        key = normalize(name)
+        position = bisect_right(self._added_keys, key)
+        self._added_keys.insert(position, key)
+        self._added_ids.insert(position, id)
+        self._added[id] = (name, brand)
+        if brand:
+            brand_key = normalize(brand)
+            label, count = self._brands.get(brand_key, (brand, 0))
+            if not count:
+                self._brand_keys.insert(
+                    bisect_left(self._brand_keys, brand_key), brand_key)
+            self._brands[brand_key] = (label, count + 1)
+
+    def _remove(self, id: int) -> None:
+        product = self._get(id)
+        if product is None:
+            return
+        name, brand = product
+        if id in self._added:
+            del self._added[id]
+            position = bisect_left(self._added_keys, normalize(name))
+            while self._added_ids[position] != id:
+                position += 1
+            del self._added_keys[position]
+            del self._added_ids[position]
+        else:
+            self._removed.add(id)
+        if brand:
+            brand_key = normalize(brand)
+            label, count = self._brands[brand_key]
+            if count > 1:
+                self._brands[brand_key] = (label, count - 1)
+            else:
+                del self._brands[brand_key]
+                del self._brand_keys[
+                    bisect_left(self._brand_keys, brand_key)]
+
+    def _compact(self) -> None:
+        """Перенос изменённых товаров в новую основную часть индекса."""
+        removed = self._removed
+        kept = [id not in removed for id in self._ids]
+        base_keys = list(compress(self._keys, kept))
+        base_ids = list(compress(self._ids, kept))
+        # Изменённые товары упорядочены, поэтому вставляются между срезами
+        # основной части
+        keys: List[str] = []
+        ids: List[int] = []
+        start = 0
+        for key, id in zip(self._added_keys, self._added_ids):
+            position = bisect_right(base_keys, key, start)
+            keys += base_keys[start:position]
+            ids += base_ids[start:position]
+            keys.append(key)
+            ids.append(id)
+            start = position
+        keys += base_keys[start:]
+        ids += base_ids[start:]
+        products = self._products.copy()
+        for id in removed:
+            del products[id]
+        products.update(self._added)
+        self._set_base(keys, ids, products)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Suggestion]:
+        """Получение подсказок по префиксу: сначала бренды, затем товары."""
+        prefix = normalize(prefix.strip())
+        if not prefix:
+            return []
+        suggestions: List[Suggestion] = []
+        keys = self._brand_keys
+        position = bisect_left(keys, prefix)
+        while (position < len(keys) and keys[position].startswith(prefix)
+               and len(suggestions) < limit):
+            suggestions.append(Suggestion(self._brands[keys[position]][0]))
+            position += 1
+        # Слияние основной части и изменённых товаров в порядке названий
+        keys, ids, removed = self._keys, self._ids, self._removed
+        added_keys, added_ids = self._added_keys, self._added_ids
+        position = bisect_left(keys, prefix)
+        added_position = bisect_left(added_keys, prefix)
+        while len(suggestions) < limit:
+            while (position < len(keys) and ids[position] in removed
+                   and keys[position].startswith(prefix)):
+                position += 1
+            in_base = (position < len(keys)
+                       and keys[position].startswith(prefix))
+            in_added = (added_position < len(added_keys)
+                        and added_keys[added_position].startswith(prefix))
+            if in_added and (not in_base
+                             or added_keys[added_position] < keys[position]):
+                id = added_ids[added_position]
+                suggestions.append(Suggestion(self._added[id][0], id))
+                added_position += 1
+            elif in_base:
+                id = ids[position]
+                suggestions.append(Suggestion(self._products[id][0], id))
+                position += 1
+            else:
+                break
+        return suggestions
+
+
+def build_index(catalog: snapshot.CatalogSnapshot) -> PrefixIndex:
+    """Построение индекса по снимку каталога."""
+    index = PrefixIndex(catalog.version)
+    index.build([(product.id, product.name, product.brand)
+                 for product in catalog])
+    return index
+
+
+def record_change(product_id: int, version: int) -> None:
+    """Запись изменения товара в журнал в текущей транзакции, version —
+    версия каталога после изменения. Записи версий, вышедших за
+    SUGGEST_CHANGE_LOG, удаляются."""
+    db.session.execute(sa.insert(ProductChange).values(
+        version=version, product_id=product_id))
+    db.session.execute(sa.delete(ProductChange).where(
+        ProductChange.version
+        <= version - current_app.config['SUGGEST_CHANGE_LOG']))
+
+
+def _apply_changes(index: PrefixIndex, version: int) -> PrefixIndex:
+    """Индекс версии version, полученный применением журнала к index."""
+    product_ids = db.session.scalars(
+        sa.select(ProductChange.product_id).distinct()
+        .where(ProductChange.version > index.version,
+               ProductChange.version <= version)).all()
+    products: Sequence[ProductRow] = []
+    if product_ids:
+        products = db.session.execute(
+            sa.select(Product.id, Product.name, Product.brand)
+            .where(Product.id.in_(product_ids))).tuples().all()
+    return index.updated(version, product_ids, products)
+
+
+def get_index() -> PrefixIndex:
+    """Получение индекса актуальной версии каталога.
+
+    Версия каталога читается из базы не чаще раза
+    в SUGGEST_REFRESH_INTERVAL секунд.
+    """
+    config = current_app.config
+    index = current_app.extensions.get('suggest')
+    if (index is not None and time.monotonic() - index.checked_at
+            < config['SUGGEST_REFRESH_INTERVAL']):
+        return index
+    version = cache.get_version(cache.CATALOG)
+    if index is None or index.version < version:
+        with _build_lock:  # Индекс обновляет только один поток
+            index = current_app.extensions.get('suggest')
+            if (index is None or version - index.version
+                    > config['SUGGEST_CHANGE_LOG']):
+                index = build_index(snapshot.get_snapshot(version))
+            elif index.version < version:
+                index = _apply_changes(index, version)
+            current_app.extensions['suggest'] = index
+    index.checked_at = time.monotonic()
+    return index
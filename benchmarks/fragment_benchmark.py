@@ -0,0 +1,85 @@
+"""Стоимость отрисовки фрагментов шаблонов с тегом cache и без него.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.fragment_benchmark 2000
+
+Для каждого фрагмента, который кэшировался тегом cache, страница из ROWS
+строк отрисовывается без кэша и с попаданием в кэш (построение ключа,
+поиск в LRUCache под блокировкой) и выводится время на одну строку.
+Кэшировать имеет смысл только фрагменты, отрисовка которых заметно дороже
+попадания.
+"""
+import sys
+import time
+from types import SimpleNamespace
+
+from app import create_app
+from config import Config
+
+# Количество строк на странице
+ROWS = 50
+
+FRAGMENTS = {
+    'product-title': '''
+        <a href="{{ url_for('main.product', id=product.id) }}">
+            <h5 class="mb-1">{{ product.name }}</h5>
+        </a>''',
+    'product-details': '''
+    <p class="mb-1">Цена: {{product.price}}</p>
+    <small>{{product.brand}}</small>''',
+    'order': '''
+<div class="list-group-item">
+    <div class="d-flex w-100 justify-content-between">
+        <a href="{{ url_for('main.order', order_number=order.order_number) }}">
+            <h5 class="mb-1">Заказ {{ order.order_number }}</h5></a>
+        <small></small>
+    </div>
+    <p class="mb-1">Общая стоимость: {{order.total_amount}}</p>
+    <small>Статус: {{order.status}}</small>
+</div>''',
+    'admin-product': '''
+                <tr>
+                    <td><a href="{{url_for('main.product', id=product.id)}}">{{ product.id }}</a></td>
+                    <td>{{ product.name }}</td>
+                    <td>{{ product.brand }}</td>
+                    <td>{{ product.price }}</td>
+                    <td>{{ product.stock }}</td>
+                    <td>
+                        <a href="{{url_for('admin.edit_product', id=product.id)}}">Редактировать</a>/<a href="{{url_for('admin.delete_product', id=product.id)}}" onclick="return confirm('Вы уверены?')">Удалить</a>
+                    </td>
+                </tr>''',  # noqa: E501
+}
+
+
+def measure(template, count: int, **context) -> float:
+    """Среднее время отрисовки одной строки страницы в микросекундах."""
+    start = time.perf_counter()
+    for _ in range(count):
+        template.render(**context)
+    return (time.perf_counter() - start) / count / ROWS * 1e6
+
+
+def run(count: int) -> None:
+    app = create_app(Config)
+    product = SimpleNamespace(id=1, name='Смартфон', price=100,
+                              brand='Apple', stock=5)
+    order = SimpleNamespace(id=1, order_number='0' * 36, total_amount=100,
+                            status='Создан', status_id=1)
+    with app.test_request_context():
+        for name, body in FRAGMENTS.items():
+            plain = app.jinja_env.from_string(
+                f'{{% for row in range({ROWS}) %}}{body}{{% endfor %}}')
+            cached = app.jinja_env.from_string(
+                f'{{% for row in range({ROWS}) %}}'
+                f"{{% cache '{name}', row, version %}}{body}{{% endcache %}}"
+                f'{{% endfor %}}')
+            cached.render(product=product, order=order, version=1)
+            plain_time = measure(plain, count, product=product, order=order)
+            cached_time = measure(cached, count, product=product, order=order,
+                                  version=1)
+            print(f'{name}: без кэша {plain_time:.1f} мкс, '
+                  f'попадание в кэш {cached_time:.1f} мкс')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
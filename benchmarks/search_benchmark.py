@@ -0,0 +1,92 @@
+"""Сравнение скорости поиска товаров: ilike против полнотекстового индекса.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.search_benchmark 10000 100000 1000000
+
+Для каждого размера каталога создаётся временная база SQLite, заполняется
+сгенерированными товарами, после чего замеряется медианное время первой
+страницы поиска (PAGE_LENGTH товаров) для нескольких запросов.
+
+Результаты на SQLite (медиана из REPEATS замеров, ilike / fts):
+    10000:    18-22 мс / 6-10 мс
+    100000:   175-220 мс / 59-100 мс
+    1000000:  1690-2050 мс / 570-990 мс
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import sqlalchemy as sa
+
+from app import create_app, db, search
+from app.models import Product
+from config import Config
+
+WORDS = ['смартфон', 'ноутбук', 'чайник', 'пылесос', 'телевизор', 'монитор',
+         'наушники', 'кофеварка', 'холодильник', 'планшет', 'клавиатура',
+         'мышь', 'колонка', 'роутер', 'часы', 'камера', 'принтер', 'утюг']
+ADJECTIVES = ['чёрный', 'белый', 'серый', 'беспроводной', 'компактный',
+              'мощный', 'новый', 'игровой', 'умный', 'тихий', 'лёгкий']
+QUERIES = ['смартфон', 'беспроводной', 'тихий пылесос', 'игров']
+REPEATS = 5
+
+
+def fill_catalog(size: int, batch_size: int = 10000) -> None:
+    """Заполнение каталога случайными товарами."""
+    rnd = random.Random(size)
+    for start in range(0, size, batch_size):
+        db.session.execute(sa.insert(Product), [
+            {'name': f'{rnd.choice(ADJECTIVES)} {rnd.choice(WORDS)} {i}',
+             'description': ' '.join(rnd.choices(ADJECTIVES + WORDS, k=8)),
+             'price': rnd.randint(100, 100000), 'stock': rnd.randint(0, 50)}
+            for i in range(start, min(start + batch_size, size))])
+    search.rebuild_index()
+    db.session.commit()
+
+
+def ilike_query(search_query: str) -> sa.Select:
+    """Поиск, использовавшийся до полнотекстового индекса."""
+    return (sa.select(Product).order_by(Product.id.desc())
+            .where(sa.or_(Product.name.ilike(f'%{search_query}%'),
+                          Product.description.ilike(f'%{search_query}%'))))
+
+
+def measure(query: sa.Select, per_page: int) -> float:
+    """Медианное время получения первой страницы в миллисекундах."""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        db.paginate(query, page=1, per_page=per_page, error_out=False).items
+        timings.append((time.perf_counter() - start) * 1000)
+        db.session.expunge_all()
+    return statistics.median(timings)
+
+
+def run(size: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = ('sqlite:///'
+                                       + os.path.join(tmp, 'bench.db'))
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            fill_catalog(size)
+            per_page = app.config['PAGE_LENGTH']
+            for search_query in QUERIES:
+                old = measure(ilike_query(search_query), per_page)
+                new = measure(search.search_products(search_query), per_page)
+                print(f'{size:>9} | {search_query:<14} | {old:>10.2f} ms'
+                      f' | {new:>10.2f} ms')
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    print(f'{"товаров":>9} | {"запрос":<14} | {"ilike":>13} | {"fts":>13}')
+    for size in sizes:
+        run(size)
@@ -0,0 +1,60 @@
+"""Память и время построения снимка каталога в сравнении с ORM объектами.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.snapshot_benchmark 100000
+
+Для каждого размера каталога создаётся временная база SQLite, после чего
+замеряются время построения снимка, его размер (memory_size и прирост
+памяти по tracemalloc) и прирост памяти при загрузке тех же товаров
+ORM объектами Product.
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import sqlalchemy as sa
+
+from app import create_app, db, snapshot
+from app.models import Product
+from benchmarks.search_benchmark import fill_catalog
+from config import Config
+
+
+def run(size: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = ('sqlite:///'
+                                       + os.path.join(tmp, 'bench.db'))
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            db.create_all()
+            fill_catalog(size)
+            start = time.perf_counter()
+            snapshot.build_snapshot(version=0)
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            catalog = snapshot.build_snapshot(version=0)
+            traced = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            print(f'{size} товаров, построение снимка: {elapsed:.2f} s')
+            print(f'  снимок (memory_size): '
+                  f'{catalog.memory_size() / 2 ** 20:.1f} MiB')
+            print(f'  снимок (tracemalloc): {traced / 2 ** 20:.1f} MiB')
+            del catalog
+            tracemalloc.start()
+            products = db.session.scalars(sa.select(Product)).all()
+            traced = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            print(f'  ORM объекты Product (tracemalloc): '
+                  f'{traced / 2 ** 20:.1f} MiB')
+            del products
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    for size in [int(arg) for arg in sys.argv[1:]] or [100000]:
+        run(size)
@@ -0,0 +1,52 @@
+"""Скорость подсказок из индекса в памяти на большом каталоге.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.suggest_benchmark 1000000
+
+Индекс строится из сгенерированного списка товаров без базы данных,
+после чего замеряется среднее время подсказки для набора префиксов
+и время получения нового индекса с изменениями товаров, в том числе
+с перестроением основной части индекса (более COMPACT_SIZE изменений).
+"""
+import random
+import sys
+import time
+
+from app.suggest import COMPACT_SIZE, PrefixIndex
+
+WORDS = ['Смартфон', 'Ноутбук', 'Чайник', 'Пылесос', 'Телевизор', 'Монитор',
+         'Наушники', 'Кофеварка', 'Холодильник', 'Планшет', 'Ёлка']
+BRANDS = ['Samsung', 'Apple', 'Xiaomi', 'Bosch', 'Philips', 'Ростех', 'Витязь']
+PREFIXES = ['с', 'смар', 'СМАРТФОН 12', 'елк', 'пыле', 'xia', 'ви', 'zzz']
+REPEATS = 10000
+# Количество изменённых товаров при обновлении индекса
+CHANGES = [1, 100, COMPACT_SIZE + 1]
+
+
+def run(size: int) -> None:
+    rnd = random.Random(size)
+    products = [(i, f'{rnd.choice(WORDS)} {rnd.randint(0, 10 ** 9)} {i}',
+                 rnd.choice(BRANDS)) for i in range(size)]
+    start = time.perf_counter()
+    index = PrefixIndex()
+    index.build(products)
+    build = time.perf_counter() - start
+    print(f'{size} товаров, построение индекса: {build:.2f} s')
+    for prefix in PREFIXES:
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            index.suggest(prefix)
+        elapsed = (time.perf_counter() - start) / REPEATS * 10 ** 6
+        print(f'  suggest({prefix!r}): {elapsed:.1f} us')
+    for changes in CHANGES:
+        ids = rnd.sample(range(size), changes)
+        start = time.perf_counter()
+        index.updated(1, ids, [(id, f'{rnd.choice(WORDS)} {id}',
+                                rnd.choice(BRANDS)) for id in ids])
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f'  обновление {changes} товаров: {elapsed:.1f} ms')
+
+
+if __name__ == '__main__':
+    for size in [int(arg) for arg in sys.argv[1:]] or [1000000]:
+        run(size)
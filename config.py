@@ -12,6 +12,49 @@ class Config:
                                              'sqlite:///app.db')
     UPLOAD_FOLDER = imagesdir
     PAGE_LENGTH = 10
+    ADMIN_PAGE_LENGTH = 50
+    # Границы диапазонов цен для фильтра каталога
+    PRICE_RANGES = [0, 1000, 5000, 20000, 100000]
+    SUGGEST_LIMIT = 10
+    # Подсказки: интервал проверки версии каталога в секундах и количество
+    # последних версий, изменения которых хранятся в журнале
+    SUGGEST_REFRESH_INTERVAL = 5
+    SUGGEST_CHANGE_LOG = 10000
+    # Минимальная похожесть триграмм для нечёткого поиска
+    FUZZY_THRESHOLD = 0.3
+    # Кэш страниц каталога: количество записей и время жизни в секундах
+    LISTING_CACHE_SIZE = 256
+    LISTING_CACHE_TTL = 60
+    # Кэш фрагментов шаблонов (строк списков и таблиц)
+    FRAGMENT_CACHE_SIZE = 4096
+    FRAGMENT_CACHE_TTL = 3600
+    # Наибольшее число разных товаров в корзине гостя (хранится в cookie)
+    GUEST_BASKET_SIZE = 50
+    # Удаление брошенных корзин (flask baskets compact): возраст в днях
+    # и количество корзин в одной транзакции
+    BASKET_MAX_AGE_DAYS = 30
+    BASKET_COMPACT_CHUNK = 500
+    # Время резервирования товаров при оформлении заказа в секундах
+    RESERVATION_TTL = 600
+    # Время хранения результатов запросов с ключом идемпотентности в секундах
+    IDEMPOTENCY_KEY_TTL = 86400
+    # Почта для писем о заказах
+    MAIL_SERVER = os.environ.get('MAIL_SERVER', 'localhost')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', 25))
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS') is not None
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER',
+                                         'shop@example.com')
+    # Фоновая обработка outbox (flask worker run): размер пакета, число
+    # потоков, пауза между опросами и повторы с экспоненциальной задержкой
+    OUTBOX_BATCH_SIZE = 100
+    OUTBOX_POOL_SIZE = 10
+    OUTBOX_POLL_INTERVAL = 5
+    OUTBOX_MAX_ATTEMPTS = 5
+    OUTBOX_RETRY_DELAY = 60
+    # Время, на которое сообщение забирается обработчиком, в секундах
+    OUTBOX_LEASE = 300
 
 
 class TestConfig(Config):
@@ -22,3 +65,5 @@ class TestConfig(Config):
     SECRET_KEY = 'you-will-never-guess'
     SERVER_NAME = 'localhost:5000'
     APPLICATION_ROOT = '/'
+    # Индекс подсказок проверяет версию каталога при каждом обращении
+    SUGGEST_REFRESH_INTERVAL = 0
@@ -4,7 +4,7 @@ import sqlalchemy as sa
 import sqlalchemy.orm as so
 from gevent.pywsgi import WSGIServer
 
-from app import create_app, db
+from app import create_app, db, suggest
 from app.models import Product, User, categories
 
 app = create_app()
@@ -24,6 +24,10 @@ if __name__ == '__main__':
     host = os.getenv('FLASK_HOST', '0.0.0.0')
     port = int(os.getenv('FLASK_PORT', '5000'))
 
+    # Построение снимка каталога и индекса подсказок до приёма запросов
+    with app.app_context():
+        suggest.get_index()
+
     # Production
     http_server = WSGIServer((host, port), app)
     print(f"Server running on http://{host}:{port}")
@@ -0,0 +1,51 @@
+"""product full text search
+
+Revision ID: 2bf6dbc8cba8
+Revises: 9b330ff29d34
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2bf6dbc8cba8'
+down_revision = '9b330ff29d34'
+branch_labels = None
+depends_on = None
+
+PG_DOCUMENT = ("to_tsvector('russian', coalesce(product.name, '') || ' ' || "
+               "coalesce(product.description, ''))")
+
+
+def normalize(text):
+    return (text or '').casefold().replace('ё', 'е')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE INDEX ix_product_fts ON product '
+                   f'USING gin (({PG_DOCUMENT}))')
+    elif bind.dialect.name == 'sqlite':
+        op.execute('CREATE VIRTUAL TABLE product_fts '
+                   'USING fts5(name, description, '
+                   'tokenize="unicode61 remove_diacritics 2")')
+        products = bind.execute(
+            sa.text('SELECT id, name, description FROM product')).all()
+        if products:
+            bind.execute(
+                sa.text('INSERT INTO product_fts(rowid, name, description) '
+                        'VALUES (:id, :name, :description)'),
+                [{'id': id, 'name': normalize(name),
+                  'description': normalize(description)}
+                 for id, name, description in products])
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('DROP INDEX ix_product_fts')
+    elif bind.dialect.name == 'sqlite':
+        op.execute('DROP TABLE product_fts')
@@ -0,0 +1,102 @@
+"""basket totals
+
+Revision ID: 4d8b1e6a9c35
+Revises: e3a9d5c2f718
+Create Date: 2026-10-18 17:26:10.552914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d8b1e6a9c35'
+down_revision = 'e3a9d5c2f718'
+branch_labels = None
+depends_on = None
+
+TOTALS_UPDATE = (
+    'UPDATE basket SET items_count = items_count + ({delta}), '
+    'total_amount = total_amount + ({delta}) * '
+    '(SELECT price FROM product WHERE id = {row}.product_id) '
+    'WHERE id = {row}.basket_id')
+PRICE_UPDATE = (
+    'UPDATE basket SET total_amount = total_amount + '
+    '(NEW.price - OLD.price) * (SELECT amount FROM basket_products '
+    'WHERE basket_id = basket.id AND product_id = NEW.id) '
+    'WHERE active = {true} AND id IN '
+    '(SELECT basket_id FROM basket_products WHERE product_id = NEW.id)')
+
+SQLITE_TRIGGERS = [
+    'CREATE TRIGGER basket_products_insert '
+    'AFTER INSERT ON basket_products BEGIN '
+    + TOTALS_UPDATE.format(delta='NEW.amount', row='NEW') + '; END',
+    'CREATE TRIGGER basket_products_update '
+    'AFTER UPDATE OF amount ON basket_products BEGIN '
+    + TOTALS_UPDATE.format(delta='NEW.amount - OLD.amount', row='NEW')
+    + '; END',
+    'CREATE TRIGGER basket_products_delete '
+    'AFTER DELETE ON basket_products BEGIN '
+    + TOTALS_UPDATE.format(delta='-OLD.amount', row='OLD') + '; END',
+    'CREATE TRIGGER product_price_update '
+    'AFTER UPDATE OF price ON product BEGIN '
+    + PRICE_UPDATE.format(true='1') + '; END',
+]
+POSTGRESQL_TRIGGERS = [
+    'CREATE FUNCTION basket_products_totals() RETURNS trigger AS $$ BEGIN '
+    "IF TG_OP = 'INSERT' THEN "
+    + TOTALS_UPDATE.format(delta='NEW.amount', row='NEW')
+    + "; ELSIF TG_OP = 'UPDATE' THEN "
+    + TOTALS_UPDATE.format(delta='NEW.amount - OLD.amount', row='NEW')
+    + '; ELSE ' + TOTALS_UPDATE.format(delta='-OLD.amount', row='OLD')
+    + '; END IF; RETURN NULL; END $$ LANGUAGE plpgsql',
+    'CREATE TRIGGER basket_products_totals '
+    'AFTER INSERT OR UPDATE OF amount OR DELETE ON basket_products '
+    'FOR EACH ROW EXECUTE FUNCTION basket_products_totals()',
+    'CREATE FUNCTION product_price_update() RETURNS trigger AS $$ BEGIN '
+    + PRICE_UPDATE.format(true='true')
+    + '; RETURN NULL; END $$ LANGUAGE plpgsql',
+    'CREATE TRIGGER product_price_update AFTER UPDATE OF price ON product '
+    'FOR EACH ROW EXECUTE FUNCTION product_price_update()',
+]
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('basket', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total_amount', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('items_count', sa.Integer(), server_default='0', nullable=False))
+
+    # ### end Alembic commands ###
+    op.execute('UPDATE basket SET '
+               'total_amount = (SELECT coalesce(sum(product.price * '
+               'basket_products.amount), 0) FROM basket_products '
+               'JOIN product ON product.id = basket_products.product_id '
+               'WHERE basket_products.basket_id = basket.id), '
+               'items_count = (SELECT coalesce(sum(amount), 0) '
+               'FROM basket_products '
+               'WHERE basket_products.basket_id = basket.id)')
+    if op.get_bind().dialect.name == 'postgresql':
+        triggers = POSTGRESQL_TRIGGERS
+    else:
+        triggers = SQLITE_TRIGGERS
+    for statement in triggers:
+        op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP TRIGGER product_price_update ON product')
+        op.execute('DROP TRIGGER basket_products_totals ON basket_products')
+        op.execute('DROP FUNCTION product_price_update()')
+        op.execute('DROP FUNCTION basket_products_totals()')
+    else:
+        for name in ('product_price_update', 'basket_products_delete',
+                     'basket_products_update', 'basket_products_insert'):
+            op.execute(f'DROP TRIGGER {name}')
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('basket', schema=None) as batch_op:
+        batch_op.drop_column('items_count')
+        batch_op.drop_column('total_amount')
+
+    # ### end Alembic commands ###
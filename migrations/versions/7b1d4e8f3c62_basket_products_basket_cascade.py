@@ -0,0 +1,78 @@
+"""basket_products basket cascade
+
+Revision ID: 7b1d4e8f3c62
+Revises: 3a7f5c9e2b14
+Create Date: 2026-10-18 13:40:12.306718
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b1d4e8f3c62'
+down_revision = '3a7f5c9e2b14'
+branch_labels = None
+depends_on = None
+
+# Имя внешнего ключа без имени: на PostgreSQL оно назначено базой,
+# на SQLite задаётся соглашением для пересоздания таблицы
+NAMING_CONVENTION = {
+    'fk': '%(table_name)s_%(column_0_name)s_fkey',
+}
+FK_NAME = 'basket_products_basket_id_fkey'
+
+# Пересоздание таблицы на SQLite удаляет её триггеры, а триггер таблицы
+# product, читающий basket_products, не даёт переименовать временную
+# таблицу, поэтому все триггеры итогов корзины пересоздаются
+# (см. 4d8b1e6a9c35)
+TOTALS_UPDATE = (
+    'UPDATE basket SET items_count = items_count + ({delta}), '
+    'total_amount = total_amount + ({delta}) * '
+    '(SELECT price FROM product WHERE id = {row}.product_id) '
+    'WHERE id = {row}.basket_id')
+PRICE_UPDATE = (
+    'UPDATE basket SET total_amount = total_amount + '
+    '(NEW.price - OLD.price) * (SELECT amount FROM basket_products '
+    'WHERE basket_id = basket.id AND product_id = NEW.id) '
+    'WHERE active = 1 AND id IN '
+    '(SELECT basket_id FROM basket_products WHERE product_id = NEW.id)')
+SQLITE_TRIGGERS = [
+    'CREATE TRIGGER basket_products_insert '
+    'AFTER INSERT ON basket_products BEGIN '
+    + TOTALS_UPDATE.format(delta='NEW.amount', row='NEW') + '; END',
+    'CREATE TRIGGER basket_products_update '
+    'AFTER UPDATE OF amount ON basket_products BEGIN '
+    + TOTALS_UPDATE.format(delta='NEW.amount - OLD.amount', row='NEW')
+    + '; END',
+    'CREATE TRIGGER basket_products_delete '
+    'AFTER DELETE ON basket_products BEGIN '
+    + TOTALS_UPDATE.format(delta='-OLD.amount', row='OLD') + '; END',
+    'CREATE TRIGGER product_price_update '
+    'AFTER UPDATE OF price ON product BEGIN ' + PRICE_UPDATE + '; END',
+]
+
+
+def replace_foreign_key(ondelete):
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    if sqlite:
+        op.execute('DROP TRIGGER product_price_update')
+    with op.batch_alter_table('basket_products', schema=None,
+                              naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(FK_NAME, type_='foreignkey')
+        batch_op.create_foreign_key(FK_NAME, 'basket', ['basket_id'], ['id'], ondelete=ondelete)
+    if sqlite:
+        for statement in SQLITE_TRIGGERS:
+            op.execute(statement)
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    replace_foreign_key('CASCADE')
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    replace_foreign_key(None)
+    # ### end Alembic commands ###
@@ -1,4 +1,6 @@
+import re
 import unittest
+from datetime import datetime
 
 from flask import url_for
 
@@ -218,6 +220,54 @@ class TestAdminRoutes(unittest.TestCase):
         self.assertIn('Дата доставки', response.data.decode('utf-8'))
         self.assertIn('Статус', response.data.decode('utf-8'))
 
+    def test_orders_filters(self):
+        """Проверка фильтров и постраничного вывода заказов."""
+        self.app.config['ADMIN_PAGE_LENGTH'] = 2
+        customer = User(username='customer', email='customer@example.com')
+        customer.set_password('password')
+        db.session.add(customer)
+        db.session.flush()
+        numbers = {}
+        for i, (user, status, day) in enumerate([
+                (customer, 'Создан', 1), (customer, 'Отменён', 2),
+                (customer, 'Создан', 3), (customer, 'Создан', 4),
+                (self.admin_user, 'Создан', 3)]):
+            order = Order(total_amount=i, user_id=user.id, status_name=status,
+                          created_at=datetime(2026, 1, day))
+            db.session.add(order)
+            db.session.flush()
+            numbers[i] = order.order_number
+        db.session.commit()
+
+        def shown(text):
+            return {i for i, number in numbers.items() if number in text}
+
+        # Фильтры сохраняются в ссылке на следующую страницу
+        response = self.client.get(url_for(
+            'admin.orders', status='Создан', customer='customer',
+            date_from='2026-01-01', date_to='2026-01-04'))
+        text = response.data.decode('utf-8')
+        self.assertEqual(shown(text), {3, 2})
+        next_url = re.findall(r'href="([^"]*cursor=[^"]*)"', text)[-1]
+        self.assertIn('customer=customer', next_url)
+        text = self.client.get(next_url.replace('&amp;', '&')).data.decode(
+            'utf-8')
+        self.assertEqual(shown(text), {0})
+        # Диапазон дат включает обе границы
+        text = self.client.get(url_for(
+            'admin.orders', date_from='2026-01-03',
+            date_to='2026-01-03')).data.decode('utf-8')
+        self.assertEqual(shown(text), {2, 4})
+        text = self.client.get(url_for(
+            'admin.orders', date_from='2026-02-01')).data.decode('utf-8')
+        self.assertEqual(shown(text), set())
+        # Ошибка в фильтре выводится, фильтры не отбрасываются молча
+        text = self.client.get(url_for(
+            'admin.orders', status='Создан',
+            date_from='01.2026')).data.decode('utf-8')
+        self.assertIn('is-invalid', text)
+        self.assertEqual(shown(text), set())
+
     def test_users_loads(self):
         """Проверка загрузки страницы пользователей."""
         response = self.client.get(url_for('admin.users'))
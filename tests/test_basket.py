@@ -0,0 +1,425 @@
+import os
+import tempfile
+import unittest
+import uuid
+
+import sqlalchemy as sa
+from flask import url_for
+from gevent.threadpool import ThreadPool
+from werkzeug.security import generate_password_hash
+
+from app import catalog, create_app, db
+from app.models import (Basket, BasketProduct, Order, OrderItem, Product,
+                        Role, User)
+from config import TestConfig
+
+# База PostgreSQL для проверок параллельных транзакций
+POSTGRES_URL = os.environ.get('DATABASE_URL', '')
+
+
+class BasketAmountCase(unittest.TestCase):
+    def config(self):
+        """Конфигурация с файловой базой, чтобы параллельные запросы шли
+        через разные соединения."""
+        self.tmp = tempfile.TemporaryDirectory()
+
+        class FileConfig(TestConfig):
+            SQLALCHEMY_DATABASE_URI = ('sqlite:///'
+                                       + os.path.join(self.tmp.name, 'db'))
+
+        return FileConfig
+
+    def setUp(self):
+        self.app = create_app(self.config())
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add(Role(name='user'))
+        db.session.add(Role(name='admin'))
+        product = Product(name='product', description='description',
+                          price=10, stock=30)
+        db.session.add(product)
+        user = User(username='user', email='user@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        self.product_id = product.id
+        self.basket_id = user.get_basket().id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.app_context.pop()
+        if hasattr(self, 'tmp'):
+            self.tmp.cleanup()
+
+    def login(self):
+        """Создание клиента с авторизованным пользователем."""
+        client = self.app.test_client()
+        # Новый контекст приложения, чтобы вход не взял пользователя из g
+        # предыдущего запроса
+        with self.app.app_context():
+            client.post(url_for('auth.login'),
+                        data=dict(username='user', password='password'))
+        return client
+
+    def stored_amount(self):
+        """Количество товара в корзине по данным базы."""
+        db.session.expire_all()
+        return db.session.scalar(sa.select(BasketProduct.amount).where(
+            BasketProduct.basket_id == self.basket_id,
+            BasketProduct.product_id == self.product_id))
+
+    def hammer(self, endpoint, requests, workers=8):
+        """Параллельные запросы к endpoint из нескольких гринлетов,
+        каждый из которых выполняется в своём потоке пула со своим
+        клиентом."""
+        url = url_for(endpoint, product_id=self.product_id)
+        clients = [self.login() for _ in range(workers)]
+
+        def clicks(worker):
+            amounts = []
+            for _ in range(worker, requests, workers):
+                response = clients[worker].post(url)
+                self.assertEqual(response.status_code, 200)
+                amounts.append(response.json['amount'])
+            return amounts
+
+        pool = ThreadPool(workers)
+        try:
+            return [amount for amounts in pool.imap_unordered(
+                clicks, range(workers)) for amount in amounts]
+        finally:
+            pool.kill()
+
+    def test_single_statement_amounts(self):
+        """ Проверка ответов на добавление и удаление единицы товара. """
+        client = self.login()
+        url = url_for('main.add_item', product_id=self.product_id)
+        self.assertEqual(client.post(url).json['amount'], 1)
+        self.assertEqual(client.post(url).json['amount'], 2)
+        url = url_for('main.remove_item', product_id=self.product_id)
+        self.assertEqual(client.post(url).json['amount'], 1)
+        self.assertEqual(client.post(url).json['amount'], 0)
+        self.assertIsNone(self.stored_amount())
+        self.assertEqual(client.post(url).json['amount'], 0)
+        # Несуществующий товар
+        url = url_for('main.add_item', product_id=100)
+        self.assertEqual(client.post(url).status_code, 404)
+
+    def test_batch_update(self):
+        """ Проверка изменения нескольких товаров одним запросом. """
+        other = Product(name='other', description='description', price=5,
+                        stock=3)
+        db.session.add(other)
+        db.session.commit()
+        other_id = other.id
+        client = self.login()
+        url = url_for('main.update_items')
+        response = client.post(url, json={'items': {
+            str(self.product_id): 10, str(other_id): 5, '100': 1}})
+        self.assertEqual(response.status_code, 200)
+        # Количество ограничено наличием, ненайденный товар — null
+        self.assertEqual(response.json['amounts'], {
+            str(self.product_id): 10, str(other_id): 3, '100': None})
+        self.assertEqual(response.json['total_amount'], 10 * 10 + 3 * 5)
+        response = client.post(url, json={'items': {
+            str(self.product_id): -4, str(other_id): -5}})
+        self.assertEqual(response.json['amounts'], {
+            str(self.product_id): 6, str(other_id): 0})
+        self.assertEqual(self.stored_amount(), 6)
+        # Некорректные запросы
+        for body in ({'items': {'x': 1}}, {'items': [1]}, [],
+                     {'items': {str(i): 1 for i in range(101)}},
+                     {'items': {str(self.product_id): 10 ** 20}},
+                     {'items': {str(self.product_id): -10_001}},
+                     {'items': {str(10 ** 20): 1}}):
+            self.assertEqual(client.post(url, json=body).status_code, 400)
+
+    def test_concurrent_clicks(self):
+        """ Проверка отсутствия потерянных обновлений при параллельных
+        запросах к одной корзине. """
+        amounts = self.hammer('main.add_item', 40)
+        # Каждое успешное добавление вернуло своё значение, лишние
+        # упёрлись в наличие
+        self.assertEqual(sorted(set(amounts)), list(range(1, 31)))
+        self.assertEqual(amounts.count(30), 11)
+        self.assertEqual(self.stored_amount(), 30)
+        amounts = self.hammer('main.remove_item', 35)
+        self.assertEqual(sorted(set(amounts)), list(range(0, 30)))
+        self.assertIsNone(self.stored_amount())
+        basket = db.session.get(Basket, self.basket_id)
+        self.assertEqual(basket.products, [])
+
+    def fill_basket(self, basket_id, amount, stock):
+        """Запись в корзину количества товара, превышающего наличие."""
+        db.session.merge(BasketProduct(basket_id=basket_id,
+                                       product_id=self.product_id,
+                                       amount=amount))
+        db.session.get(Product, self.product_id).stock = stock
+        db.session.commit()
+
+    def test_read_without_writes(self):
+        """ Проверка отсутствия изменений корзины при её просмотре. """
+        self.fill_basket(self.basket_id, 5, 0)
+        client = self.login()
+        statements = []
+
+        def before_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sa.event.listen(db.engine, 'before_cursor_execute', before_execute)
+        try:
+            response = client.get(url_for('main.basket'))
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute',
+                            before_execute)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([statement for statement in statements
+                          if 'basket_products' in statement
+                          and not statement.startswith('SELECT')])
+        self.assertEqual(self.stored_amount(), 5)
+
+    def test_reconcile(self):
+        """ Проверка приведения корзины к наличию. """
+        other = Product(name='other', description='description', price=5,
+                        stock=0)
+        db.session.add(other)
+        db.session.flush()
+        db.session.add(BasketProduct(basket_id=self.basket_id,
+                                     product_id=other.id, amount=2))
+        self.fill_basket(self.basket_id, 50, 30)
+        basket = db.session.get(Basket, self.basket_id)
+        self.assertTrue(basket.reconcile())
+        db.session.commit()
+        self.assertEqual(self.stored_amount(), 30)
+        self.assertEqual(list(basket.get_basket_products().values()), [30])
+        self.assertFalse(basket.reconcile())
+        # Оформление заказа приводит корзину к наличию
+        self.fill_basket(self.basket_id, 30, 4)
+        client = self.login()
+        response = client.post(url_for('main.checkout'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stored_amount(), 4)
+
+    def test_stock_decrease(self):
+        """ Проверка уменьшения количества в активных корзинах после
+        уменьшения наличия. """
+        user = db.session.scalar(sa.select(User))
+        archived = Basket(user_id=user.id, active=False)
+        db.session.add(archived)
+        db.session.commit()
+        archived_id = archived.id
+        self.fill_basket(self.basket_id, 20, 30)
+        self.fill_basket(archived_id, 20, 30)
+        product = db.session.get(Product, self.product_id)
+        product.stock = 10
+        catalog.stock_changed(product, 30, 10)
+        db.session.commit()
+        self.assertEqual(self.stored_amount(), 10)
+        db.session.expire_all()
+        self.assertEqual(db.session.get(
+            BasketProduct, (archived_id, self.product_id)).amount, 20)
+        product.stock = 0
+        catalog.stock_changed(product, 10, 0)
+        db.session.commit()
+        self.assertIsNone(self.stored_amount())
+        self.assertIsNotNone(db.session.get(
+            BasketProduct, (archived_id, self.product_id)))
+
+    def test_single_active_basket(self):
+        """ Проверка создания одной активной корзины при параллельных
+        первых запросах. """
+        db.session.get(Basket, self.basket_id).active = False
+        db.session.commit()
+        workers = 8
+        url = url_for('main.basket')
+        clients = [self.login() for _ in range(workers)]
+
+        def open_basket(worker):
+            return clients[worker].get(url).status_code
+
+        pool = ThreadPool(workers)
+        try:
+            codes = list(pool.imap_unordered(open_basket, range(workers)))
+        finally:
+            pool.kill()
+        self.assertEqual(codes, [200] * workers)
+        active = db.session.scalars(sa.select(Basket).where(
+            Basket.active == sa.true())).all()
+        self.assertEqual(len(active), 1)
+        # Вторую активную корзину не даёт создать уникальный индекс
+        db.session.add(Basket(user_id=active[0].user_id, active=True))
+        with self.assertRaises(sa.exc.IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+    def assert_totals(self, basket_id, total_amount, items_count):
+        """Проверка хранимых стоимости и количества товаров корзины."""
+        db.session.expire_all()
+        basket = db.session.get(Basket, basket_id)
+        self.assertEqual((basket.total_amount, basket.items_count),
+                         (total_amount, items_count))
+        self.assertEqual(basket.calculate_totals(),
+                         (total_amount, items_count))
+
+    def test_totals(self):
+        """ Проверка стоимости и количества товаров, хранимых в корзине. """
+        other = Product(name='other', description='description', price=5,
+                        stock=3)
+        db.session.add(other)
+        db.session.commit()
+        other_id = other.id
+        client = self.login()
+        response = client.post(url_for('main.add_item',
+                                       product_id=self.product_id))
+        self.assertEqual(response.json['total_amount'], 10)
+        response = client.post(url_for('main.update_items'), json={'items': {
+            str(self.product_id): 4, str(other_id): 5}})
+        self.assertEqual(response.json['total_amount'], 5 * 10 + 3 * 5)
+        self.assert_totals(self.basket_id, 65, 8)
+        response = client.post(url_for('main.remove_item',
+                                       product_id=other_id))
+        self.assertEqual(response.json['total_amount'], 60)
+        # Изменение цены меняет стоимость только активных корзин
+        user = db.session.scalar(sa.select(User))
+        archived = Basket(user_id=user.id, active=False)
+        db.session.add(archived)
+        db.session.commit()
+        archived_id = archived.id
+        self.fill_basket(archived_id, 2, 30)
+        db.session.get(Product, self.product_id).price = 20
+        db.session.commit()
+        self.assert_totals(self.basket_id, 5 * 20 + 2 * 5, 7)
+        archived = db.session.get(Basket, archived_id)
+        self.assertEqual((archived.total_amount, archived.items_count),
+                         (20, 2))
+        # Приведение к наличию и удаление товара из корзины
+        self.fill_basket(self.basket_id, 5, 1)
+        db.session.get(Basket, self.basket_id).reconcile()
+        db.session.commit()
+        self.assert_totals(self.basket_id, 20 + 2 * 5, 3)
+        client.post(url_for('main.update_items'), json={'items': {
+            str(self.product_id): -1, str(other_id): -2}})
+        self.assert_totals(self.basket_id, 0, 0)
+
+    def test_order_lock_order(self):
+        """ Проверка того, что заказ блокирует строку товара раньше своей
+        корзины и не изменяет корзины других покупателей. """
+        other = User(username='other', email='other@example.com',
+                     password_hash='-')
+        db.session.add(other)
+        db.session.commit()
+        other_basket_id = other.get_basket().id
+        self.fill_basket(other_basket_id, 25, 30)
+        self.fill_basket(self.basket_id, 10, 30)
+        client = self.login()
+        statements = []
+
+        def before_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sa.event.listen(db.engine, 'before_cursor_execute', before_execute)
+        try:
+            response = client.post(url_for('main.submit_order'),
+                                   data=dict(address='address'))
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute',
+                            before_execute)
+        self.assertEqual(response.status_code, 302)
+        updates = [statement.split()[1] for statement in statements
+                   if statement.startswith('UPDATE')]
+        self.assertLess(updates.index('product'), updates.index('basket'))
+        # Корзина другого покупателя приводится к наличию при оформлении
+        db.session.expire_all()
+        self.assertEqual(db.session.get(
+            BasketProduct, (other_basket_id, self.product_id)).amount, 25)
+        self.assertTrue(db.session.get(Basket, other_basket_id).reconcile())
+        db.session.commit()
+        self.assertEqual(db.session.get(
+            BasketProduct, (other_basket_id, self.product_id)).amount, 20)
+
+    def test_concurrent_orders(self):
+        """ Проверка отсутствия продажи сверх наличия при параллельном
+        оформлении заказов на последние единицы товара. """
+        buyers = 100
+        db.session.get(Product, self.product_id).stock = 10
+        # Быстрый хэш пароля, чтобы не тратить время на вход покупателей
+        password_hash = generate_password_hash('password',
+                                               method='pbkdf2:sha256:1')
+        for i in range(buyers):
+            user = User(username=f'buyer{i}', email=f'buyer{i}@example.com',
+                        password_hash=password_hash)
+            db.session.add(user)
+            db.session.flush()
+            basket = Basket(user_id=user.id)
+            db.session.add(basket)
+            db.session.flush()
+            db.session.add(BasketProduct(basket_id=basket.id,
+                                         product_id=self.product_id,
+                                         amount=1))
+        db.session.commit()
+        url = url_for('main.submit_order')
+        clients = []
+        for i in range(buyers):
+            client = self.app.test_client()
+            with self.app.app_context():
+                client.post(url_for('auth.login'), data=dict(
+                    username=f'buyer{i}', password='password'))
+            clients.append(client)
+
+        def buy(worker):
+            return clients[worker].post(
+                url, data=dict(address='address')).status_code
+
+        pool = ThreadPool(buyers)
+        try:
+            codes = list(pool.imap_unordered(buy, range(buyers)))
+        finally:
+            pool.kill()
+        self.assertEqual(codes, [302] * buyers)
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Product, self.product_id).stock, 0)
+        self.assertEqual(db.session.scalar(
+            sa.select(sa.func.count()).select_from(Order)), 10)
+        self.assertEqual(db.session.scalar(
+            sa.select(sa.func.sum(OrderItem.amount))), 10)
+        # Корзины покупателей без заказа остались активными
+        self.assertEqual(db.session.scalar(
+            sa.select(sa.func.count()).select_from(Basket)
+            .where(Basket.active == sa.true())), buyers - 10 + 1)
+
+
+@unittest.skipUnless(POSTGRES_URL.startswith('postgresql'),
+                     'DATABASE_URL не указывает на базу PostgreSQL')
+class PostgresBasketAmountCase(BasketAmountCase):
+    """Те же проверки на PostgreSQL, где параллельные транзакции
+    выполняются одновременно, а не по очереди, как в SQLite.
+
+    Таблицы создаются в отдельной схеме, которая удаляется после теста,
+    поэтому данные базы DATABASE_URL не затрагиваются.
+    """
+
+    def config(self):
+        self.schema = f'test_{uuid.uuid4().hex}'
+        engine = sa.create_engine(POSTGRES_URL)
+        with engine.begin() as connection:
+            connection.execute(sa.text(f'CREATE SCHEMA {self.schema}'))
+        engine.dispose()
+
+        class PostgresConfig(TestConfig):
+            SQLALCHEMY_DATABASE_URI = POSTGRES_URL
+            SQLALCHEMY_ENGINE_OPTIONS = {
+                'connect_args': {'options': f'-csearch_path={self.schema}'},
+                'pool_size': 20, 'max_overflow': 100}
+
+        return PostgresConfig
+
+    def tearDown(self):
+        super().tearDown()
+        engine = sa.create_engine(POSTGRES_URL)
+        with engine.begin() as connection:
+            connection.execute(
+                sa.text(f'DROP SCHEMA {self.schema} CASCADE'))
+        engine.dispose()
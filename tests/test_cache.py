@@ -0,0 +1,119 @@
+import unittest
+from unittest.mock import patch
+
+from flask import url_for
+
+from app import cache, catalog, create_app, db
+from app.cache import LRUCache
+from app.models import Product, Role, User
+from config import TestConfig
+
+
+class LRUCacheCase(unittest.TestCase):
+    def test_eviction_and_stats(self):
+        """ Проверка вытеснения давно использованных записей. """
+        lru = LRUCache(maxsize=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        self.assertEqual(lru.get('a'), 1)  # 'b' становится самой старой
+        lru.set('c', 3)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('c'), 3)
+        self.assertEqual(lru.stats(), {'size': 2, 'maxsize': 2, 'hits': 2,
+                                       'misses': 1, 'evictions': 1,
+                                       'hit_ratio': 2 / 3})
+
+    def test_ttl(self):
+        """ Проверка истечения времени жизни записи. """
+        lru = LRUCache(maxsize=2, ttl=10)
+        with patch('app.cache.time.monotonic', return_value=100.0):
+            lru.set('a', 1)
+        with patch('app.cache.time.monotonic', return_value=105.0):
+            self.assertEqual(lru.get('a'), 1)
+        with patch('app.cache.time.monotonic', return_value=111.0):
+            self.assertIsNone(lru.get('a'))
+        self.assertEqual(len(lru), 0)
+
+    def test_disabled(self):
+        """ Проверка отключения кэша нулевым размером. """
+        lru = LRUCache(maxsize=0)
+        lru.set('a', 1)
+        self.assertIsNone(lru.get('a'))
+
+
+class ListingCacheCase(unittest.TestCase):
+    def setUp(self):
+        # Создание объекта приложения
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        # Создание объекта DB
+        db.create_all()
+        # Создание и аутентификация админа
+        db.session.add(Role(name='user'))
+        db.session.add(Role(name='admin'))
+        db.session.commit()
+        admin_user = User(username='admin', email='admin@example.com')
+        admin_user.set_role('admin')
+        admin_user.set_password('password')
+        db.session.add(admin_user)
+        db.session.commit()
+        self.client.post(url_for('auth.login'),
+                         data=dict(username='admin', password='password'))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def create_product(self, name):
+        """Создать продукт через панель администратора."""
+        self.client.post(
+            url_for('admin.create_product'),
+            data=dict(name=name, description='description', price=100,
+                      brand='brand', stock=5))
+
+    def test_explore_cached_until_catalog_changes(self):
+        """ Проверка кэширования каталога и сброса при изменении. """
+        self.create_product('Смартфон')
+        stats = cache.get_cache('listing').stats
+        response = self.client.get(url_for('main.explore', q='смартфон'))
+        self.assertIn('Смартфон', response.text)
+        self.assertEqual(stats()['misses'], 1)
+        # Запрос нормализуется, поэтому попадает в ту же запись
+        response = self.client.get(url_for('main.explore', q=' СМАРТФОН '))
+        self.assertIn('Смартфон', response.text)
+        self.assertEqual(stats()['hits'], 1)
+        # Изменение товара увеличивает версию каталога
+        version = cache.get_version(cache.CATALOG)
+        product = db.session.scalar(
+            db.select(Product).where(Product.name == 'Смартфон'))
+        self.client.post(
+            url_for('admin.edit_product', id=product.id),
+            data=dict(name='Ноутбук', description='description', price=100,
+                      brand='brand'))
+        self.assertEqual(cache.get_version(cache.CATALOG), version + 1)
+        response = self.client.get(url_for('main.explore', q='смартфон'))
+        self.assertNotIn('Ноутбук', response.text)
+        self.assertEqual(stats()['misses'], 2)
+        response = self.client.get(url_for('admin.admin'))
+        self.assertIn('cache-stats', response.text)
+
+    def test_stock_change_keeps_versions(self):
+        """ Проверка того, что изменение наличия не меняет версии кэша,
+        а закончившийся товар не выводится в фильтре по наличию. """
+        self.create_product('Смартфон')
+        stats = cache.get_cache('listing').stats
+        response = self.client.get(url_for('main.explore', stock='in'))
+        self.assertIn('Смартфон', response.text)
+        version = cache.get_version(cache.CATALOG)
+        product = db.session.scalar(
+            db.select(Product).where(Product.name == 'Смартфон'))
+        product.stock = 0
+        catalog.stock_changed(product, 5, 0)
+        db.session.commit()
+        self.assertEqual(cache.get_version(cache.CATALOG), version)
+        response = self.client.get(url_for('main.explore', stock='in'))
+        self.assertNotIn('Смартфон', response.text)
+        self.assertEqual(stats()['hits'], 1)
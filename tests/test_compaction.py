@@ -0,0 +1,117 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+
+from app import compaction, create_app, db, reservations
+from app.models import (Basket, BasketProduct, Order, Product, Role,
+                        StockHold, User)
+from config import TestConfig
+
+
+class CompactionCase(unittest.TestCase):
+    def setUp(self):
+        # Создание объекта приложения
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        # Создание объекта DB
+        db.create_all()
+        db.session.add(Role(name='user'))
+        db.session.add(Role(name='admin'))
+        self.product = Product(name='product', description='description',
+                               price=10, stock=30)
+        db.session.add(self.product)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def create_basket(self, username, age, last_seen, active=True,
+                      order=False):
+        """Создание корзины с товаром, созданной age дней назад, у
+        пользователя, заходившего last_seen дней назад."""
+        now = datetime.now(timezone.utc)
+        user = db.session.scalar(
+            sa.select(User).where(User.username == username))
+        if user is None:
+            user = User(username=username, email=f'{username}@example.com')
+            user.set_password('password')
+            db.session.add(user)
+        user.last_seen = now - timedelta(days=last_seen)
+        basket = Basket(user=user, active=active,
+                        created_at=now - timedelta(days=age))
+        db.session.add(basket)
+        db.session.flush()
+        db.session.add(BasketProduct(basket_id=basket.id,
+                                     product_id=self.product.id, amount=2))
+        if order:
+            db.session.add(Order(shipment_date=now, total_amount=20,
+                                 user_id=user.id, basket_id=basket.id))
+        db.session.commit()
+        return basket.id
+
+    def test_compact(self):
+        """ Проверка удаления только брошенных корзин. """
+        abandoned = [
+            self.create_basket('old', 40, 40),
+            self.create_basket('old', 50, 40, active=False),
+            self.create_basket('visitor', 40, 1, active=False),
+        ]
+        kept = [
+            self.create_basket('visitor', 40, 1),
+            self.create_basket('new', 1, 40),
+            self.create_basket('buyer', 40, 40, active=False, order=True),
+        ]
+        progress = []
+        result = compaction.compact(timedelta(days=30), chunk_size=2,
+                                    progress=progress.append)
+        self.assertEqual((result.baskets, result.items), (3, 3))
+        self.assertEqual([item.baskets for item in progress], [2, 3])
+        self.assertGreater(result.rows_per_second, 0)
+        self.assertEqual(set(db.session.scalars(sa.select(Basket.id))),
+                         set(kept))
+        self.assertFalse(db.session.scalars(
+            sa.select(BasketProduct)
+            .where(BasketProduct.basket_id.in_(abandoned))).all())
+
+    def test_cli(self):
+        """ Проверка команды flask baskets compact. """
+        self.create_basket('old', 40, 40)
+        self.create_basket('new', 1, 1)
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['baskets', 'compact', '--days', '30'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('корзин 1, товаров 1', result.output)
+        self.assertEqual(db.session.scalar(
+            sa.select(sa.func.count(Basket.id))), 1)
+
+    def test_releases_holds(self):
+        """ Проверка снятия резервов удаляемых корзин. """
+        abandoned = db.session.get(Basket, self.create_basket('old', 40, 40))
+        kept = db.session.get(Basket, self.create_basket('new', 1, 1))
+        for basket in (abandoned, kept):
+            self.assertTrue(reservations.hold(
+                basket, basket.get_basket_products()))
+        db.session.commit()
+        self.assertEqual(self.product.reserved, 4)
+        compaction.compact(timedelta(days=30), chunk_size=10)
+        db.session.refresh(self.product)
+        self.assertEqual(self.product.reserved, 2)
+        self.assertEqual(db.session.scalars(
+            sa.select(StockHold.basket_id)).all(), [kept.id])
+
+    def test_skips_basket_totals(self):
+        """ Проверка того, что триггер итогов корзины не изменяет
+        удаляемые корзины. """
+        self.create_basket('old', 40, 40)
+        self.create_basket('old', 41, 40, active=False)
+        self.create_basket('old', 42, 40, active=False)
+        # total_changes() считает и строки, изменённые триггерами
+        changes = sa.text('SELECT total_changes()')
+        before = db.session.scalar(changes)
+        result = compaction.compact(timedelta(days=30), chunk_size=10)
+        self.assertEqual((result.baskets, result.items), (3, 3))
+        self.assertEqual(db.session.scalar(changes) - before, 3 + 3)
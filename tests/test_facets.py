@@ -0,0 +1,145 @@
+import unittest
+
+import sqlalchemy as sa
+from flask import url_for
+
+from app import create_app, db, facets
+from app.models import (Category, FacetCount, Order, Product, Role,
+                        User)
+from config import TestConfig
+
+
+def stored_counts():
+    """Получение ненулевых счётчиков фасетов из базы."""
+    rows = db.session.execute(
+        sa.select(FacetCount.facet, FacetCount.value, FacetCount.count)
+        .where(FacetCount.count != 0))
+    return {(facet, value): count for facet, value, count in rows}
+
+
+class FacetsCase(unittest.TestCase):
+    def setUp(self):
+        # Создание объекта приложения
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        # Создание объекта DB
+        db.create_all()
+        # Создание и аутентификация админа
+        db.session.add(Role(name='user'))
+        db.session.add(Role(name='admin'))
+        db.session.add(Category(name='Телефоны'))
+        db.session.add(Category(name='Ноутбуки'))
+        db.session.commit()
+        admin_user = User(username='admin', email='admin@example.com')
+        admin_user.set_role('admin')
+        admin_user.set_password('password')
+        db.session.add(admin_user)
+        db.session.commit()
+        self.client.post(url_for('auth.login'),
+                         data=dict(username='admin', password='password'))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def create_product(self, name, price, brand, stock, categories=()):
+        """Создать продукт, нулевое наличие задаётся отдельно."""
+        self.client.post(
+            url_for('admin.create_product'),
+            data=dict(name=name, description='description', price=price,
+                      brand=brand, stock=stock or 1,
+                      categories=list(categories)))
+        if not stock:
+            product = Product.query.filter_by(name=name).first()
+            self.client.post(url_for('admin.edit_stock', id=product.id),
+                             data=dict(amount=0))
+
+    def assert_counts_match_rebuild(self):
+        """Проверка совпадения счётчиков с полным пересчётом."""
+        maintained = stored_counts()
+        facets.rebuild_counts()
+        self.assertEqual(maintained, stored_counts())
+
+    def test_counts_follow_admin_changes(self):
+        """ Проверка изменения счётчиков при изменении товаров. """
+        self.create_product('phone', 500, 'Apple', 3, ['Телефоны'])
+        self.create_product('laptop', 50000, 'Apple', 0, ['Ноутбуки'])
+        self.create_product('phone2', 700, 'Xiaomi', 1, ['Телефоны'])
+        counts = stored_counts()
+        self.assertEqual(counts[('brand', 'Apple')], 2)
+        self.assertEqual(counts[('price', '0-1000')], 2)
+        self.assertEqual(counts[('stock', 'in')], 2)
+        self.assert_counts_match_rebuild()
+        # Редактирование товара переносит его в другие значения фасетов
+        laptop = Product.query.filter_by(name='laptop').first()
+        self.client.post(
+            url_for('admin.edit_product', id=laptop.id),
+            data=dict(name='laptop', description='description', price=900,
+                      brand='Xiaomi', categories=['Телефоны']))
+        counts = stored_counts()
+        self.assertEqual(counts[('brand', 'Apple')], 1)
+        self.assertEqual(counts[('brand', 'Xiaomi')], 2)
+        self.assertEqual(counts[('price', '0-1000')], 3)
+        self.assert_counts_match_rebuild()
+        # Изменение наличия и удаление товаров
+        self.client.post(url_for('admin.edit_stock', id=laptop.id),
+                         data=dict(amount=5))
+        self.assertEqual(stored_counts()[('stock', 'in')], 3)
+        phone = Product.query.filter_by(name='phone').first()
+        self.client.post(url_for('admin.delete_product', id=phone.id))
+        self.assertNotIn(('brand', 'Apple'), stored_counts())
+        self.assert_counts_match_rebuild()
+
+    def test_explore_filters(self):
+        """ Проверка фильтрации и отображения счётчиков на explore. """
+        self.create_product('phone', 500, 'Apple', 3, ['Телефоны'])
+        self.create_product('laptop', 50000, 'Apple', 0, ['Ноутбуки'])
+        self.create_product('phone2', 700, 'Xiaomi', 1, ['Телефоны'])
+        html = self.client.get(url_for('main.explore')).data.decode('utf-8')
+        self.assertIn('Apple', html)
+        self.assertIn('Телефоны', html)
+        category = Category.query.filter_by(name='Телефоны').first()
+        html = self.client.get(url_for(
+            'main.explore', category=category.id,
+            brand='Apple')).data.decode('utf-8')
+        self.assertIn('>phone<', html)
+        self.assertNotIn('>phone2<', html)
+        self.assertNotIn('>laptop<', html)
+        html = self.client.get(url_for(
+            'main.explore', price='20000-100000')).data.decode('utf-8')
+        self.assertIn('>laptop<', html)
+        self.assertNotIn('>phone<', html)
+        html = self.client.get(url_for(
+            'main.explore', stock='in')).data.decode('utf-8')
+        self.assertNotIn('>laptop<', html)
+
+    def test_counts_follow_orders(self):
+        """ Проверка счётчика наличия при оформлении и отмене заказа на
+        последнюю единицу товара. """
+        self.create_product('phone', 500, 'Apple', 1, ['Телефоны'])
+        phone = Product.query.filter_by(name='phone').first()
+        self.client.post(url_for('main.add_item', product_id=phone.id))
+        self.client.post(url_for('main.checkout'))
+        self.client.post(url_for('main.submit_order'),
+                         data=dict(address='address'))
+        self.assertNotIn(('stock', 'in'), stored_counts())
+        self.assert_counts_match_rebuild()
+        order = Order.query.first()
+        self.client.post(url_for('main.cancel_order',
+                                 order_number=order.order_number))
+        self.assertEqual(stored_counts()[('stock', 'in')], 1)
+        self.assert_counts_match_rebuild()
+
+    def test_delete_category(self):
+        """ Проверка удаления счётчика вместе с категорией. """
+        self.create_product('phone', 500, 'Apple', 3, ['Телефоны'])
+        category = Category.query.filter_by(name='Телефоны').first()
+        self.client.post(url_for('admin.delete_category', id=category.id))
+        self.assertNotIn(('category', str(category.id)), stored_counts())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
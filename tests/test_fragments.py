@@ -0,0 +1,76 @@
+import unittest
+
+import sqlalchemy as sa
+from flask import url_for
+
+from app import cache, create_app, db
+from app.models import Product, Role, User
+from config import TestConfig
+
+
+class FragmentCacheCase(unittest.TestCase):
+    def setUp(self):
+        # Создание объекта приложения
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        # Создание объекта DB
+        db.create_all()
+        # Создание и аутентификация админа
+        db.session.add(Role(name='user'))
+        db.session.add(Role(name='admin'))
+        db.session.commit()
+        admin_user = User(username='admin', email='admin@example.com')
+        admin_user.set_role('admin')
+        admin_user.set_password('password')
+        db.session.add(admin_user)
+        db.session.commit()
+        self.client.post(url_for('auth.login'),
+                         data=dict(username='admin', password='password'))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_cache_tag(self):
+        """ Проверка тега cache в шаблоне. """
+        template = self.app.jinja_env.from_string(
+            '{% cache "item", id, version %}{{ name }}{% endcache %}')
+        self.assertEqual(template.render(id=1, version=1, name='<a>'),
+                         '&lt;a&gt;')
+        # Совпадающий ключ возвращает сохранённый фрагмент
+        self.assertEqual(template.render(id=1, version=1, name='b'),
+                         '&lt;a&gt;')
+        self.assertEqual(template.render(id=1, version=2, name='b'), 'b')
+        # Неопределённое значение ключа отключает кэширование
+        self.assertEqual(template.render(id=1, name='c'), 'c')
+        self.assertEqual(template.render(id=1, name='d'), 'd')
+        self.assertEqual(cache.get_cache('fragment').stats()['size'], 2)
+
+    def test_product_rows(self):
+        """ Проверка обновления строк товаров после изменения. """
+        self.client.post(
+            url_for('admin.create_product'),
+            data=dict(name='Смартфон', description='description', price=100,
+                      brand='Apple', stock=5))
+        product_id = db.session.scalar(sa.select(Product.id))
+        fragments = cache.get_cache('fragment')
+        self.client.get(url_for('admin.products'))
+        misses = fragments.stats()['misses']
+        response = self.client.get(url_for('admin.products'))
+        self.assertEqual(fragments.stats()['misses'], misses)
+        self.assertIn('<td>5</td>', response.text)
+        # Изменение наличия и товара отображается в строках
+        self.client.post(url_for('admin.edit_stock', id=product_id),
+                         data=dict(amount=3))
+        response = self.client.get(url_for('admin.products'))
+        self.assertIn('<td>3</td>', response.text)
+        self.client.post(
+            url_for('admin.edit_product', id=product_id),
+            data=dict(name='Ноутбук', description='description', price=100,
+                      brand='Apple'))
+        response = self.client.get(url_for('admin.products'))
+        self.assertIn('Ноутбук', response.text)
+        self.assertNotIn('Смартфон', response.text)
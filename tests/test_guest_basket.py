@@ -0,0 +1,107 @@
+import unittest
+
+import sqlalchemy as sa
+from flask import url_for
+
+from app import create_app, db
+from app.models import Basket, BasketProduct, Product, Role, User
+from config import TestConfig
+
+
+class GuestBasketCase(unittest.TestCase):
+    def setUp(self):
+        # Создание объекта приложения
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        # Создание объекта DB
+        db.create_all()
+        db.session.add(Role(name='user'))
+        db.session.add(Role(name='admin'))
+        products = [Product(name='Смартфон', description='description',
+                            price=10, stock=5),
+                    Product(name='Ноутбук', description='description',
+                            price=100, stock=2)]
+        db.session.add_all(products)
+        user = User(username='user', email='user@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        self.phone_id, self.laptop_id = [product.id for product in products]
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def stored_amounts(self):
+        """Количество товаров в активной корзине пользователя."""
+        db.session.expire_all()
+        return dict(db.session.execute(
+            sa.select(BasketProduct.product_id, BasketProduct.amount)
+            .join(Basket, Basket.id == BasketProduct.basket_id)
+            .where(Basket.active == sa.true())).all())
+
+    def test_guest_without_writes(self):
+        """ Проверка работы с корзиной гостя без записи в базу. """
+        statements = []
+
+        def before_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sa.event.listen(db.engine, 'before_cursor_execute', before_execute)
+        try:
+            self.assertEqual(self.client.get(
+                url_for('main.explore')).status_code, 200)
+            self.assertEqual(self.client.get(
+                url_for('main.product', id=self.phone_id)).status_code, 200)
+            response = self.client.post(url_for('main.add_item',
+                                                product_id=self.phone_id))
+            self.assertEqual(response.json['amount'], 1)
+            response = self.client.post(url_for('main.update_items'), json={
+                'items': {str(self.phone_id): 2, str(self.laptop_id): 5,
+                          '100': 1}})
+            self.assertEqual(response.json['amounts'], {
+                str(self.phone_id): 3, str(self.laptop_id): 2, '100': None})
+            self.assertEqual(response.json['total_amount'], 3 * 10 + 2 * 100)
+            response = self.client.post(url_for('main.remove_item',
+                                                product_id=self.laptop_id))
+            self.assertEqual(response.json['amount'], 1)
+            response = self.client.get(url_for('main.basket'))
+            explore = self.client.get(url_for('main.explore'))
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute',
+                            before_execute)
+        self.assertIn('Ноутбук', response.text)
+        self.assertIn(f'id=\'amount-{self.phone_id}\'>3<', explore.text)
+        self.assertEqual([statement for statement in statements
+                          if not statement.startswith('SELECT')], [])
+
+    def test_merge_at_login(self):
+        """ Проверка переноса корзины гостя при входе. """
+        user = db.session.scalar(sa.select(User))
+        user.get_basket().add_product(self.phone_id, 4)
+        db.session.commit()
+        self.client.post(url_for('main.update_items'), json={'items': {
+            str(self.phone_id): 3, str(self.laptop_id): 1}})
+        self.client.post(url_for('auth.login'),
+                         data=dict(username='user', password='password'))
+        # Количество ограничено наличием
+        self.assertEqual(self.stored_amounts(),
+                         {self.phone_id: 5, self.laptop_id: 1})
+        with self.client.session_transaction() as session:
+            self.assertNotIn('basket', session)
+        response = self.client.get(url_for('main.basket'))
+        self.assertIn('Ноутбук', response.text)
+
+    def test_merge_at_register(self):
+        """ Проверка переноса корзины гостя при регистрации. """
+        self.client.post(url_for('main.add_item', product_id=self.laptop_id))
+        self.client.post(url_for('auth.register'), data=dict(
+            username='new', email='new@example.com',
+            password='Password123', password2='Password123'))
+        new_user = db.session.scalar(
+            sa.select(User).where(User.username == 'new'))
+        self.assertIsNotNone(new_user)
+        self.assertEqual(self.stored_amounts(), {self.laptop_id: 1})
@@ -0,0 +1,100 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+from flask import url_for
+
+from app import create_app, db
+from app.models import IdempotencyKey, Order, Product, Role, User
+from config import TestConfig
+
+
+class IdempotencyCase(unittest.TestCase):
+    def setUp(self):
+        # Создание объекта приложения
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        # Создание объекта DB
+        db.create_all()
+        db.session.add(Role(name='user'))
+        db.session.add(Role(name='admin'))
+        product = Product(name='product', description='description',
+                          price=10, stock=5)
+        db.session.add(product)
+        user = User(username='buyer', email='buyer@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        self.product_id = product.id
+        self.client = self.app.test_client()
+        self.client.post(url_for('auth.login'),
+                         data=dict(username='buyer', password='password'))
+        self.client.post(url_for('main.update_items'), json={
+            'items': {str(self.product_id): 2}})
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def stock(self):
+        """Наличие товара по данным базы."""
+        db.session.expire_all()
+        return db.session.get(Product, self.product_id).stock
+
+    def test_submit_twice(self):
+        """ Проверка повторной отправки формы оформления заказа. """
+        data = dict(address='address', idempotency_key='submit')
+        first = self.client.post(url_for('main.submit_order'), data=data)
+        self.assertEqual(first.status_code, 302)
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        sa.event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            second = self.client.post(url_for('main.submit_order'),
+                                      data=data)
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute', record)
+        # Повтор получает тот же ответ, не обращаясь к заказам и товарам
+        self.assertEqual(second.status_code, 302)
+        self.assertEqual(second.location, first.location)
+        self.assertFalse([statement for statement in statements
+                          if 'FROM "order"' in statement
+                          or 'INTO "order"' in statement
+                          or 'product' in statement])
+        self.assertEqual(db.session.scalar(
+            sa.select(sa.func.count(Order.id))), 1)
+        self.assertEqual(self.stock(), 3)
+
+    def test_cancel_twice(self):
+        """ Проверка повторной отправки формы отмены заказа. """
+        self.client.post(url_for('main.submit_order'),
+                         data=dict(address='address'))
+        order = db.session.scalar(sa.select(Order))
+        url = url_for('main.cancel_order', order_number=order.order_number)
+        for _ in range(2):
+            response = self.client.post(
+                url, headers={'Idempotency-Key': 'cancel'})
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.stock(), 5)
+        stored = db.session.get(IdempotencyKey, (order.user_id, 'cancel'))
+        self.assertEqual(stored.message, 'Заказ был успешно отменён')
+
+    def test_purge(self):
+        """ Проверка удаления устаревших ключей. """
+        user_id = db.session.scalar(sa.select(User.id))
+        now = datetime.now(timezone.utc)
+        db.session.add_all([
+            IdempotencyKey(user_id=user_id, key='old', status_code=302,
+                           created_at=now - timedelta(days=2)),
+            IdempotencyKey(user_id=user_id, key='new', status_code=302,
+                           created_at=now)])
+        db.session.commit()
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['idempotency', 'purge'])
+        self.assertIn('Удалено ключей: 1', result.output)
+        self.assertEqual(db.session.scalars(
+            sa.select(IdempotencyKey.key)).all(), ['new'])
@@ -1,9 +1,12 @@
+import re
 import unittest
 
+import sqlalchemy as sa
 from flask import url_for
 
-from app import create_app, db
-from app.models import Order, OrderStatus, Product, Role, User
+from app import cache, create_app, db
+from app.models import (Basket, BasketProduct, Order, OrderStatus, Product,
+                        Role, User)
 from config import TestConfig
 
 
@@ -113,6 +116,42 @@ class TestMainRoutes(unittest.TestCase):
         # Предполагается персонализированное приветствие
         self.assertIn(f', {self.USERNAME}!', response.data.decode('utf-8'))
 
+    def test_index_orders_pagination(self):
+        """Проверка постраничной истории заказов и числа запросов."""
+        self.app.config['PAGE_LENGTH'] = 5
+        user = db.session.scalar(sa.select(User))
+        # У каждого заказа свой статус, чтобы ленивая загрузка статусов
+        # выполняла запрос на каждый заказ
+        for i in range(12):
+            db.session.add(Order(total_amount=i, user_id=user.id,
+                                 status_name=f'Статус {i}'))
+        db.session.commit()
+        cursor = None
+        pages = []
+        for _ in range(3):
+            statements = []
+
+            def before_execute(conn, cursor, statement, *args):
+                statements.append(statement)
+
+            sa.event.listen(db.engine, 'before_cursor_execute',
+                            before_execute)
+            try:
+                response = self.client.get(url_for('main.index',
+                                                   cursor=cursor))
+            finally:
+                sa.event.remove(db.engine, 'before_cursor_execute',
+                                before_execute)
+            text = response.data.decode('utf-8')
+            pages.append((text.count('Общая стоимость'), len(statements)))
+            # Курсор следующей страницы из последней ссылки навигации
+            cursors = re.findall(r'cursor=([\w-]+)', text)
+            cursor = cursors[-1] if cursors else None
+        # Статусы загружаются вместе с заказами: число запросов страницы
+        # не зависит от числа заказов на ней
+        self.assertEqual([count for count, _ in pages], [5, 5, 2])
+        self.assertEqual(len({queries for _, queries in pages}), 1)
+
     def test_product_page_loads(self):
         """Проверка загрузки страницы продукта."""
         response = self.client.get(url_for('main.product', id=self.product.id))
@@ -162,6 +201,52 @@ class TestMainRoutes(unittest.TestCase):
         self.assertIn(str(self.product.price), response.data.decode('utf-8'))
         self.assertIn('Поиск товаров', response.data.decode('utf-8'))
 
+    def explore_statements(self):
+        """Получение SQL запросов, выполненных при загрузке каталога."""
+        statements = []
+        cache.get_cache('listing').clear()
+
+        def before_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sa.event.listen(db.engine, 'before_cursor_execute', before_execute)
+        try:
+            response = self.client.get(url_for('main.explore'))
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute',
+                            before_execute)
+        self.assertEqual(response.status_code, 200)
+        return statements
+
+    def test_explore_basket_amounts(self):
+        """Проверка числа запросов каталога при большой корзине."""
+        self.app.config['PAGE_LENGTH'] = 1
+        self.client.get(url_for('main.explore'))  # Построение снимка
+        self.add_product(self.product.id)
+        self.add_product(self.product.id)
+        small_basket = self.explore_statements()
+        # Корзина из множества товаров, которых нет на странице
+        user = User.query.filter_by(username=self.USERNAME).first()
+        basket = db.session.scalar(sa.select(Basket).where(
+            Basket.user_id == user.id))
+        for i in range(30):
+            product = Product(name=f'hidden{i}', description='description',
+                              price=10, photo_path='path', stock=1, id=-i - 1)
+            db.session.add(product)
+            db.session.flush()
+            db.session.add(BasketProduct(basket_id=basket.id,
+                                         product_id=product.id, amount=5))
+        db.session.commit()
+        large_basket = self.explore_statements()
+        self.assertEqual(len(small_basket), len(large_basket))
+        self.assertFalse([statement for statement in large_basket
+                          if 'basket' in statement
+                          and not statement.startswith('SELECT')])
+        # Количество в корзине отображается для товаров страницы
+        response = self.client.get(url_for('main.explore'))
+        self.assertIn(f'id=\'amount-{self.product.id}\'>2<',
+                      response.text)
+
     def test_checkout(self):
         """Проверка процесса оформления заказа."""
         # Добавляем продукт в корзину
@@ -203,6 +288,39 @@ class TestMainRoutes(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(order.status.name, 'Отменён')
 
+    def test_order_items(self):
+        """Проверка состава заказа с ценой на момент покупки."""
+        self.add_product(self.product.id)
+        self.add_product(self.product.id)
+        self.submit_order('address')
+        order = Order.query.first()
+        self.assertEqual([(item.name, item.unit_price, item.amount)
+                          for item in order.items], [('product', 10, 2)])
+        # Изменение цены не влияет на оформленный заказ
+        self.product.price = 15
+        db.session.commit()
+        statements = []
+
+        def before_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sa.event.listen(db.engine, 'before_cursor_execute', before_execute)
+        try:
+            response = self.client.get(
+                url_for('main.order', order_number=order.order_number))
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute',
+                            before_execute)
+        self.assertIn('Цена: 10', response.text)
+        self.assertIn('Стоимость: 20', response.text)
+        self.assertFalse([statement for statement in statements
+                          if 'basket_products' in statement
+                          or 'product.price' in statement])
+        # Отмена возвращает количество из состава заказа
+        self.cancel_order(order_number=order.order_number)
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Product, self.product.id).stock, 20)
+
     def test_change_amount(self):
         """Проверка добавления/удаления единицы товара в корзину."""
         # Получаем объект пользователя
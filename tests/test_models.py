@@ -1,7 +1,10 @@
 import unittest
 
-from app import create_app, db
-from app.models import (Basket, Category, Order, OrderStatus,
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+
+from app import create_app, db, enums
+from app.models import (STATUSES, Basket, Category, Order, OrderStatus,
                         Product, Role, User, Review)
 from sqlalchemy.exc import IntegrityError
 from config import TestConfig
@@ -213,6 +216,15 @@ class RoleModelCase(unittest.TestCase):
         # Проверка соответствия роли
         self.assertEqual(user1.role_id, role.id)
 
+    def test_is_admin(self):
+        """ Проверка роли администратора по кэшу ролей. """
+        user = create_example_user()
+        self.assertFalse(user.is_admin)
+        user.set_role('admin')
+        db.session.commit()
+        self.assertTrue(user.is_admin)
+        self.assertEqual(user.role.name, 'admin')
+
     def test_get_users_by_role(self):
         # Создаем роль
         role = Role(name='role')
@@ -356,6 +368,18 @@ class ProductModelCase(unittest.TestCase):
         retrievew_path = product.get_path()
         self.assertEqual(retrievew_path, product.photo_path)
 
+    def test_take_stock_respects_reserved(self):
+        """ Проверка отказа в списании, когда stock - reserved < amount. """
+        product = create_example_product()  # 20 единиц в наличии
+        product.reserved = 15
+        db.session.commit()
+        self.assertIsNone(product.take_stock(6))
+        self.assertEqual(product.take_stock(5), 15)
+        self.assertIsNone(product.take_stock(1))
+        db.session.commit()
+        db.session.refresh(product)
+        self.assertEqual((product.stock, product.reserved), (15, 15))
+
 
 class BasketModelCase(unittest.TestCase):
     def setUp(self):
@@ -555,6 +579,68 @@ class OrderModelCase(unittest.TestCase):
         retrieved_basket = order.basket
         self.assertEqual(retrieved_basket.id, basket.id)
 
+    def test_status_registry(self):
+        """ Проверка поиска статусов без запросов к базе. """
+        basket = create_example_basket()
+        # Создание статуса не фиксирует другие изменения сессии
+        db.session.add(Category(name='category'))
+        order = Order(total_amount=0, user_id=basket.user_id,
+                      basket_id=basket.id)
+        db.session.rollback()
+        self.assertIsNone(db.session.scalar(sa.select(Category)))
+        self.assertIsNone(STATUSES.find_id('Создан'))
+        order = Order(total_amount=0, user_id=basket.user_id,
+                      basket_id=basket.id)
+        db.session.add(order)
+        db.session.commit()
+        self.assertEqual(order.status.name, 'Создан')
+        user_id = basket.user_id
+        STATUSES.get_id('Отменён')
+        db.session.commit()
+        # После изменения справочник загружается одним запросом
+        STATUSES.find_id('Отменён')
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        sa.event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            Order(total_amount=0, user_id=user_id)
+            order.set_status('Отменён')
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(statements, [])
+        self.assertEqual(order.status.name, 'Отменён')
+
+    def test_status_registry_missing_name(self):
+        """ Проверка того, что отсутствующее имя запрашивается из базы
+        один раз до сброса кэша. """
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        sa.event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            for _ in range(3):
+                self.assertIsNone(STATUSES.find_id('Отменён'))
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(len(statements), 1)
+        STATUSES.get_id('Отменён')
+        db.session.commit()
+        self.assertIsNotNone(STATUSES.find_id('Отменён'))
+
+    def test_status_registry_pending_per_session(self):
+        """ Проверка того, что завершение транзакции другой сессии
+        не разрешает кэшировать неподтверждённый статус. """
+        STATUSES.get_id('Новый')
+        # Транзакция другой сессии завершается раньше
+        enums._transaction_ended(so.Session())
+        self.assertIsNotNone(STATUSES.find_id('Новый'))
+        self.assertIsNone(STATUSES._state()['ids'])
+        db.session.rollback()
+        self.assertIsNone(STATUSES.find_id('Новый'))
+
 
 class ReviewModelCase(unittest.TestCase):
     def setUp(self):
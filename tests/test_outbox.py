@@ -0,0 +1,143 @@
+import os
+import socket
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+from aiosmtpd.controller import Controller
+from flask import url_for
+
+from app import create_app, db, outbox
+from app.models import Order, OutboxMessage, Product, Role, User
+from config import TestConfig
+
+
+def free_port():
+    """Свободный порт для локального SMTP сервера."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Inbox:
+    """Обработчик aiosmtpd, сохраняющий полученные письма."""
+    def __init__(self):
+        self.envelopes = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.envelopes.append(envelope)
+        return '250 OK'
+
+
+class OutboxCase(unittest.TestCase):
+    def setUp(self):
+        # Файловая база, так как сообщения выполняются в потоках пула
+        self.tmp = tempfile.TemporaryDirectory()
+        self.port = free_port()
+
+        class MailConfig(TestConfig):
+            SQLALCHEMY_DATABASE_URI = ('sqlite:///'
+                                       + os.path.join(self.tmp.name, 'db'))
+            MAIL_SERVER = '127.0.0.1'
+            MAIL_PORT = self.port
+            MAIL_SUPPRESS_SEND = False
+            OUTBOX_BATCH_SIZE = 2
+
+        self.app = create_app(MailConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add(Role(name='user'))
+        db.session.add(Role(name='admin'))
+        product = Product(name='product', description='description',
+                          price=10, stock=5)
+        db.session.add(product)
+        user = User(username='buyer', email='buyer@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        self.client = self.app.test_client()
+        self.client.post(url_for('auth.login'),
+                         data=dict(username='buyer', password='password'))
+        self.client.post(url_for('main.update_items'), json={
+            'items': {str(product.id): 2}})
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.app_context.pop()
+        self.tmp.cleanup()
+
+    def messages(self):
+        """Сообщения outbox по данным базы."""
+        db.session.expire_all()
+        return db.session.scalars(
+            sa.select(OutboxMessage).order_by(OutboxMessage.id)).all()
+
+    def test_enqueue(self):
+        """ Проверка записи сообщений вместе с изменением заказа. """
+        self.client.post(url_for('main.submit_order'),
+                         data=dict(address='address'))
+        order = db.session.scalar(sa.select(Order))
+        self.client.post(url_for('main.cancel_order',
+                                 order_number=order.order_number))
+        self.assertEqual([message.payload for message in self.messages()],
+                         [{'order_id': order.id, 'status': 'Создан'},
+                          {'order_id': order.id, 'status': 'Отменён'}])
+        # Неудачное оформление заказа (корзина пуста) не оставляет сообщений
+        self.client.post(url_for('main.submit_order'),
+                         data=dict(address='address'))
+        self.assertEqual(len(self.messages()), 2)
+
+    def test_worker(self):
+        """ Проверка отправки писем через локальный SMTP сервер. """
+        self.client.post(url_for('main.submit_order'),
+                         data=dict(address='address'))
+        order = db.session.scalar(sa.select(Order))
+        outbox.enqueue('order_email', {'order_id': order.id,
+                                       'status': 'Подтверждён'})
+        outbox.enqueue('order_email', {'order_id': order.id,
+                                       'status': 'Завершён'})
+        db.session.commit()
+        inbox = Inbox()
+        controller = Controller(inbox, hostname='127.0.0.1', port=self.port)
+        controller.start()
+        try:
+            runner = self.app.test_cli_runner()
+            result = runner.invoke(args=['worker', 'run', '--once'])
+        finally:
+            controller.stop()
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Выполнено: 2, с ошибкой: 0', result.output)
+        self.assertIn('Выполнено: 1, с ошибкой: 0', result.output)
+        self.assertEqual(len(inbox.envelopes), 3)
+        self.assertEqual(inbox.envelopes[0].rcpt_tos, ['buyer@example.com'])
+        body = b''.join(envelope.content for envelope in inbox.envelopes)
+        self.assertIn(order.order_number.encode(), body)
+        self.assertFalse(self.messages())
+
+    def test_retry(self):
+        """ Проверка повторов с задержкой при недоступном SMTP сервере. """
+        self.client.post(url_for('main.submit_order'),
+                         data=dict(address='address'))
+        pool = outbox.ThreadPool(1)
+        self.addCleanup(pool.kill)
+        self.assertEqual(outbox.process_batch(pool, 10), (0, 1))
+        message = self.messages()[0]
+        self.assertEqual(message.attempts, 1)
+        self.assertIsNotNone(message.last_error)
+        # SQLite возвращает время UTC без часового пояса
+        self.assertGreater(message.available_at,
+                           datetime.now(timezone.utc).replace(tzinfo=None)
+                           + timedelta(seconds=50))
+        # Повтор до наступления available_at не выполняется
+        self.assertEqual(outbox.process_batch(pool, 10), (0, 0))
+        message.attempts = self.app.config['OUTBOX_MAX_ATTEMPTS'] - 1
+        message.available_at = datetime.now(timezone.utc)
+        db.session.commit()
+        self.assertEqual(outbox.process_batch(pool, 10), (0, 1))
+        # Попытки исчерпаны, сообщение больше не выполняется
+        self.assertIsNone(self.messages()[0].available_at)
+        self.assertEqual(outbox.process_batch(pool, 10), (0, 0))
@@ -0,0 +1,174 @@
+import unittest
+
+import sqlalchemy as sa
+from flask import url_for
+
+from app import create_app, db, search
+from app.models import Product, Role, User
+from app.pagination import decode_cursor, encode_cursor, keyset_paginate
+from config import TestConfig
+
+
+class KeysetPaginationCase(unittest.TestCase):
+    def setUp(self):
+        # Создание объекта приложения
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        # Создание объекта DB
+        db.create_all()
+        # Создание необходимого для тестов пресета данных
+        for i in range(25):
+            product = Product(name=f'product{i:02}', description='товар',
+                              price=i, stock=i)
+            db.session.add(product)
+            db.session.flush()
+            search.index_product(product)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def paginate(self, cursor=None, query=None, keys=None):
+        """Получение страницы товаров по убыванию id."""
+        if query is None:
+            query, keys = sa.select(Product), [(Product.id, True)]
+        return keyset_paginate(db.session, query, keys, cursor, per_page=10)
+
+    def test_cursor_encoding(self):
+        """ Проверка кодирования курсора. """
+        cursor = encode_cursor('next', [1.5, 'имя', 3])
+        self.assertEqual(decode_cursor(cursor), ('next', [1.5, 'имя', 3]))
+        self.assertIsNone(decode_cursor('мусор'))
+        self.assertIsNone(decode_cursor(None))
+
+    def test_forward_and_backward(self):
+        """ Проверка перехода по страницам вперёд и назад. """
+        first = self.paginate()
+        self.assertEqual([p.id for p in first], list(range(25, 15, -1)))
+        self.assertFalse(first.has_prev)
+        second = self.paginate(first.next_cursor)
+        self.assertEqual([p.id for p in second], list(range(15, 5, -1)))
+        third = self.paginate(second.next_cursor)
+        self.assertEqual([p.id for p in third], list(range(5, 0, -1)))
+        self.assertFalse(third.has_next)
+        # Движение назад возвращает те же страницы
+        back = self.paginate(third.prev_cursor)
+        self.assertEqual(back.items, second.items)
+        back = self.paginate(back.prev_cursor)
+        self.assertEqual(back.items, first.items)
+        self.assertFalse(back.has_prev)
+        self.assertTrue(back.has_next)
+
+    def test_compound_key(self):
+        """ Проверка постраничного вывода по нескольким ключам. """
+        query = search.search_products('товар')
+        keys = [(query.selected_columns.relevance, False),
+                (Product.id, True)]
+        seen = []
+        page = self.paginate(query=query, keys=keys)
+        seen.extend(page.items)
+        while page.has_next:
+            page = self.paginate(page.next_cursor, query, keys)
+            seen.extend(page.items)
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+    def test_no_count_query(self):
+        """ Проверка отсутствия COUNT в запросах страницы. """
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sa.event.listen(db.engine, 'before_cursor_execute',
+                        before_cursor_execute)
+        try:
+            self.paginate(self.paginate().next_cursor)
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute',
+                            before_cursor_execute)
+        self.assertEqual(len(statements), 2)
+        for statement in statements:
+            self.assertNotIn('count(', statement.lower())
+        # Вторая страница выбирается условием по ключу
+        self.assertIn('product.id < ?', statements[1])
+
+
+class PaginationRoutesCase(unittest.TestCase):
+    def setUp(self):
+        # Создание объекта приложения
+        self.app = create_app(TestConfig)
+        self.app.config['ADMIN_PAGE_LENGTH'] = 2
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        # Создание объекта DB
+        db.create_all()
+        # Создание и аутентификация админа
+        db.session.add(Role(name='user'))
+        db.session.add(Role(name='admin'))
+        db.session.commit()
+        for username in ('admin', 'bob', 'carl'):
+            user = User(username=username, email=f'{username}@example.com')
+            user.set_role('admin')
+            user.set_password('password')
+            db.session.add(user)
+        for i in range(15):
+            db.session.add(Product(name=f'product{i:02}', description='',
+                                   price=i, stock=i))
+        db.session.commit()
+        self.client.post(url_for('auth.login'),
+                         data=dict(username='admin', password='password'))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_explore_pages(self):
+        """ Проверка ссылок на соседние страницы explore. """
+        response = self.client.get(url_for('main.explore'))
+        html = response.data.decode('utf-8')
+        self.assertIn('product14', html)
+        self.assertNotIn('product04', html)
+        page = keyset_paginate(db.session, sa.select(Product),
+                               [(Product.id, True)], per_page=10)
+        next_url = url_for('main.explore', cursor=page.next_cursor,
+                           _external=False)
+        self.assertIn(next_url, html)
+        html = self.client.get(next_url).data.decode('utf-8')
+        self.assertIn('product04', html)
+        self.assertNotIn('product05', html)
+
+    def test_admin_users_pages(self):
+        """ Проверка постраничного вывода пользователей по имени. """
+        html = self.client.get(url_for('admin.users')).data.decode('utf-8')
+        self.assertIn('bob@example.com', html)
+        self.assertNotIn('carl@example.com', html)
+        page = keyset_paginate(db.session, sa.select(User),
+                               [(User.username, False)], per_page=2)
+        html = self.client.get(
+            url_for('admin.users', cursor=page.next_cursor)
+        ).data.decode('utf-8')
+        self.assertIn('carl@example.com', html)
+
+    def test_admin_tables_paged(self):
+        """ Проверка вывода таблиц панели администратора страницами
+        по ADMIN_PAGE_LENGTH строк со ссылкой на следующую страницу. """
+        response = self.client.get(url_for('admin.orders'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('cursor=', response.text)
+        for endpoint in ('admin.products', 'admin.users'):
+            response = self.client.get(url_for(endpoint))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('cursor=', response.text)
+        html = self.client.get(url_for('admin.products')).text
+        self.assertIn('product13', html)
+        self.assertNotIn('product12', html)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
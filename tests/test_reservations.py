@@ -0,0 +1,118 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+from flask import url_for
+
+from app import create_app, db, reservations
+from app.models import Order, Product, Role, StockHold, User
+from config import TestConfig
+
+
+class ReservationCase(unittest.TestCase):
+    def setUp(self):
+        # Создание объекта приложения
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        # Создание объекта DB
+        db.create_all()
+        db.session.add(Role(name='user'))
+        db.session.add(Role(name='admin'))
+        product = Product(name='product', description='description',
+                          price=10, stock=5)
+        db.session.add(product)
+        for username in ('first', 'second'):
+            user = User(username=username, email=f'{username}@example.com')
+            user.set_password('password')
+            db.session.add(user)
+        db.session.commit()
+        self.product_id = product.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def login(self, username):
+        """Создание клиента с авторизованным пользователем."""
+        client = self.app.test_client()
+        # Новый контекст приложения, чтобы вход не взял пользователя из g
+        # предыдущего запроса
+        with self.app.app_context():
+            client.post(url_for('auth.login'),
+                        data=dict(username=username, password='password'))
+        return client
+
+    def post(self, client, endpoint, **kwargs):
+        """POST запрос в отдельном контексте приложения, так как клиенты
+        принадлежат разным пользователям."""
+        with self.app.app_context():
+            return client.post(url_for(endpoint), **kwargs)
+
+    def checkout(self, client, amount):
+        """Добавление товара в корзину и переход к оформлению заказа."""
+        self.post(client, 'main.update_items', json={
+            'items': {str(self.product_id): amount}})
+        return self.post(client, 'main.checkout')
+
+    def stock(self):
+        """Наличие и резерв товара по данным базы."""
+        db.session.expire_all()
+        product = db.session.get(Product, self.product_id)
+        return product.stock, product.reserved
+
+    def test_hold_and_submit(self):
+        """ Проверка резервирования товаров при оформлении заказа. """
+        first, second = self.login('first'), self.login('second')
+        self.assertEqual(self.checkout(first, 3).status_code, 200)
+        self.assertEqual(self.stock(), (5, 3))
+        # Повторный переход к оформлению заменяет резерв
+        self.checkout(first, 0)
+        self.assertEqual(self.stock(), (5, 3))
+        # Второму покупателю доступно только 2 единицы
+        response = self.checkout(second, 3)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.stock(), (5, 3))
+        self.post(first, 'main.submit_order', data=dict(address='a'))
+        self.assertEqual(self.stock(), (2, 0))
+        self.assertEqual(db.session.scalar(
+            sa.select(sa.func.count()).select_from(StockHold)), 0)
+        self.assertIsNotNone(db.session.scalar(sa.select(Order)))
+
+    def test_release_expired(self):
+        """ Проверка снятия резервов с истёкшим сроком. """
+        first, second = self.login('first'), self.login('second')
+        self.checkout(first, 3)
+        self.checkout(second, 2)
+        self.assertEqual(self.stock(), (5, 5))
+        hold = db.session.scalar(sa.select(StockHold).where(
+            StockHold.amount == 3))
+        hold.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.session.commit()
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['reservations', 'sweep'])
+        self.assertIn('Снято резервов: 1', result.output)
+        self.assertEqual(self.stock(), (5, 2))
+        self.assertEqual(reservations.release_expired(), 0)
+
+    def test_expired_released_on_checkout(self):
+        """ Проверка снятия истёкших резервов товара при оформлении
+        без команды sweep. """
+        first, second = self.login('first'), self.login('second')
+        self.checkout(first, 4)
+        db.session.execute(sa.update(StockHold).values(
+            expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+        db.session.commit()
+        # Истёкший резерв первого покупателя не мешает второму
+        self.assertEqual(self.checkout(second, 3).status_code, 200)
+        self.assertEqual(self.stock(), (5, 3))
+        db.session.execute(sa.update(StockHold).values(
+            expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+        db.session.commit()
+        self.checkout(first, 0)  # Первый покупатель снова резервирует 4
+        self.assertEqual(self.stock(), (5, 4))
+        self.post(first, 'main.submit_order', data=dict(address='a'))
+        self.assertEqual(self.stock(), (1, 0))
+        self.assertEqual(db.session.scalar(
+            sa.select(sa.func.count()).select_from(StockHold)), 0)
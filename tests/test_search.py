@@ -0,0 +1,201 @@
+import unittest
+from unittest.mock import patch
+
+from flask import url_for
+from sqlalchemy.dialects import postgresql
+
+from app import create_app, db, search
+from app.models import Product, Role, User
+from config import TestConfig
+
+
+def create_product(name, description='description', price=10, stock=20,
+                   brand=None):
+    """ Создание товара с добавлением в поисковой индекс. """
+    product = Product(name=name, description=description, price=price,
+                      stock=stock, brand=brand)
+    db.session.add(product)
+    db.session.flush()
+    search.index_product(product)
+    db.session.commit()
+    return product
+
+
+class SearchIndexCase(unittest.TestCase):
+    def setUp(self):
+        # Создание объекта приложения
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        # Создание объекта DB
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def search(self, search_query):
+        """Получение списка найденных товаров."""
+        return db.session.scalars(search.search_products(search_query)).all()
+
+    def test_search_by_name_and_description(self):
+        """ Проверка поиска по названию и описанию товара. """
+        phone = create_product('Смартфон Ёлка', 'Чёрный корпус')
+        create_product('Ноутбук', 'Серый корпус')
+        self.assertEqual(self.search('смартфон'), [phone])
+        self.assertEqual(self.search('ЕЛКА'), [phone])
+        self.assertEqual(self.search('черный'), [phone])
+        self.assertEqual(len(self.search('корпус')), 2)
+        # Каждое слово запроса ищется как префикс
+        self.assertEqual(self.search('смарт'), [phone])
+        self.assertEqual(self.search('смарт серый'), [])
+        self.assertEqual(self.search('!!!'), [])
+
+    def test_search_ranking(self):
+        """ Проверка сортировки результатов по релевантности. """
+        create_product('Чехол', 'Чехол для смартфона, подходит к чехлу')
+        phone = create_product('Смартфон', 'Смартфон смартфон')
+        self.assertEqual(self.search('смартфон')[0], phone)
+
+    def test_postgresql_rank_is_double(self):
+        """ Проверка приведения ранга PostgreSQL к double precision, чтобы
+        значение из курсора страницы совпадало с ним при сравнении. """
+        with patch.object(search, 'dialect_name', return_value='postgresql'):
+            query = search.search_products('смартфон')
+        sql = str(query.compile(dialect=postgresql.dialect()))
+        self.assertIn('-CAST(ts_rank(', sql)
+        self.assertIn('AS DOUBLE PRECISION) AS relevance', sql)
+
+    def test_index_update_and_remove(self):
+        """ Проверка синхронизации индекса с товарами. """
+        product = create_product('Чайник')
+        product.name = 'Кофеварка'
+        search.index_product(product)
+        db.session.commit()
+        self.assertEqual(self.search('чайник'), [])
+        self.assertEqual(self.search('кофеварка'), [product])
+        search.remove_product(product.id)
+        db.session.commit()
+        self.assertEqual(self.search('кофеварка'), [])
+
+    def test_rebuild_index(self):
+        """ Проверка полного перестроения индекса. """
+        product = Product(name='Пылесос', description='description', price=1)
+        db.session.add(product)
+        db.session.commit()
+        self.assertEqual(self.search('пылесос'), [])
+        self.assertEqual(search.rebuild_index(), 1)
+        db.session.commit()
+        self.assertEqual(self.search('пылесос'), [product])
+
+
+class FuzzySearchCase(unittest.TestCase):
+    def setUp(self):
+        # Создание объекта приложения
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        # Создание объекта DB
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_trigrams(self):
+        """ Проверка разбиения текста на триграммы. """
+        self.assertEqual(search.trigrams('Кот'),
+                         {'  к', ' ко', 'кот', 'от '})
+        self.assertEqual(search.trigrams('ёж'), {'  е', ' еж', 'еж '})
+        self.assertEqual(search.similarity(search.trigrams('кот'),
+                                           search.trigrams('кот')), 1.0)
+
+    def test_misspelled_query(self):
+        """ Проверка поиска с опечатками. """
+        fridge = create_product('Холодильник Атлант')
+        create_product('Стиральная машина', brand='Indesit')
+        self.assertEqual(search.fuzzy_search('халадильник'), [fridge])
+        self.assertEqual(search.fuzzy_search('атлнт'), [fridge])
+        self.assertEqual(search.fuzzy_search('пылесос'), [])
+        self.assertEqual(
+            [product.name for product in search.fuzzy_search('indesid')],
+            ['Стиральная машина'])
+
+    def test_exact_match_first(self):
+        """ Проверка, что точное совпадение ранжируется первым. """
+        create_product('Чайник электрический')
+        exact = create_product('Чайник')
+        create_product('Чайники')
+        self.assertEqual(search.fuzzy_search('чайник')[0], exact)
+
+    def test_index_sync(self):
+        """ Проверка удаления триграмм вместе с товаром. """
+        product = create_product('Телевизор')
+        search.remove_product(product.id)
+        db.session.commit()
+        self.assertEqual(search.fuzzy_search('тилевизор'), [])
+        self.assertEqual(search.rebuild_index(), 1)
+        self.assertEqual(search.fuzzy_search('тилевизор'), [product])
+
+
+class SearchRoutesCase(unittest.TestCase):
+    def setUp(self):
+        # Создание объекта приложения
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        # Создание объекта DB
+        db.create_all()
+        # Создание и аутентификация админа
+        db.session.add(Role(name='user'))
+        db.session.add(Role(name='admin'))
+        db.session.commit()
+        admin_user = User(username='admin', email='admin@example.com')
+        admin_user.set_role('admin')
+        admin_user.set_password('password')
+        db.session.add(admin_user)
+        db.session.commit()
+        self.client.post(url_for('auth.login'),
+                         data=dict(username='admin', password='password'))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def explore(self, search_query):
+        """Поиск товаров на странице explore."""
+        return self.client.get(
+            url_for('main.explore', q=search_query)).data.decode('utf-8')
+
+    def test_admin_routes_keep_index_in_sync(self):
+        """ Проверка синхронизации индекса при изменении товаров. """
+        self.client.post(
+            url_for('admin.create_product'),
+            data=dict(name='Телевизор', description='description',
+                      price=100, brand='brand', stock=1))
+        self.assertIn('Телевизор', self.explore('телевизор'))
+        product = Product.query.first()
+        self.client.post(
+            url_for('admin.edit_product', id=product.id),
+            data=dict(name='Монитор', description='description',
+                      price=100, brand='brand'))
+        self.assertNotIn('Монитор', self.explore('телевизор'))
+        self.assertIn('Монитор', self.explore('монитор'))
+        self.client.post(url_for('admin.delete_product', id=product.id))
+        self.assertNotIn('Монитор', self.explore('монитор'))
+
+    def test_explore_fuzzy_fallback(self):
+        """ Проверка показа похожих товаров при пустом результате. """
+        create_product('Холодильник')
+        html = self.explore('халадильник')
+        self.assertIn('fuzzy-results', html)
+        self.assertIn('>Холодильник<', html)
+        self.assertNotIn('fuzzy-results', self.explore('холодильник'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,110 @@
+import unittest
+
+import sqlalchemy as sa
+from flask import url_for
+
+from app import cache, create_app, db, snapshot
+from app.models import Category, Product, Role, User
+from config import TestConfig
+
+
+class SnapshotCase(unittest.TestCase):
+    def setUp(self):
+        # Создание объекта приложения
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        # Создание объекта DB
+        db.create_all()
+        # Создание и аутентификация админа
+        db.session.add(Role(name='user'))
+        db.session.add(Role(name='admin'))
+        db.session.add(Category(name='Телефоны'))
+        db.session.commit()
+        admin_user = User(username='admin', email='admin@example.com')
+        admin_user.set_role('admin')
+        admin_user.set_password('password')
+        db.session.add(admin_user)
+        db.session.commit()
+        self.client.post(url_for('auth.login'),
+                         data=dict(username='admin', password='password'))
+        self.client.post(
+            url_for('admin.create_product'),
+            data=dict(name='Смартфон', description='description', price=100,
+                      brand='Apple', stock=5, categories=['Телефоны']))
+        self.product_id = db.session.scalar(sa.select(Product.id))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_snapshot_content(self):
+        """ Проверка содержимого и неизменяемости снимка. """
+        current = snapshot.get_snapshot()
+        view = current.get(self.product_id)
+        self.assertEqual((view.name, view.price, view.brand, view.stock),
+                         ('Смартфон', 100, 'Apple', 5))
+        self.assertEqual([category.name for category in view.categories],
+                         ['Телефоны'])
+        with self.assertRaises(AttributeError):
+            view.price = 1
+        self.assertEqual(current.get_many([100, self.product_id]), [view])
+        self.assertGreater(current.memory_size(), 0)
+        # Без изменения версии каталога снимок не перестраивается
+        self.assertIs(snapshot.get_snapshot(), current)
+
+    def test_snapshot_swapped_on_change(self):
+        """ Проверка замены снимка при изменении каталога. """
+        current = snapshot.get_snapshot()
+        self.client.post(
+            url_for('admin.edit_product', id=self.product_id),
+            data=dict(name='Смартфон 2', description='description',
+                      price=200, brand='Apple', categories=['Телефоны']))
+        updated = snapshot.get_snapshot()
+        self.assertIsNot(updated, current)
+        self.assertEqual(updated.version, cache.get_version(cache.CATALOG))
+        self.assertEqual(updated.get(self.product_id).price, 200)
+        self.assertEqual(current.get(self.product_id).price, 100)
+        # Изменение наличия не меняет снимок, но видно на страницах
+        self.client.post(url_for('admin.edit_stock', id=self.product_id),
+                         data=dict(amount=2))
+        self.assertIs(snapshot.get_snapshot(), updated)
+        view, = snapshot.with_stock([updated.get(self.product_id)])
+        self.assertEqual(view.stock, 2)
+        response = self.client.get(url_for('main.product',
+                                           id=self.product_id))
+        self.assertIn('В наличии: 2', response.text)
+
+    def test_review_keeps_snapshot(self):
+        """ Проверка, что отзыв не перестраивает снимок каталога. """
+        current = snapshot.get_snapshot()
+        version = cache.get_version(cache.CATALOG)
+        response = self.client.post(
+            url_for('main.product', id=self.product_id),
+            data=dict(review='review', rating=4))
+        self.assertIn('Рейтинг: 4.0', response.text)
+        self.assertEqual(cache.get_version(cache.CATALOG), version)
+        self.assertIs(snapshot.get_snapshot(), current)
+
+    def test_pages_without_orm_products(self):
+        """ Проверка отображения каталога без загрузки объектов Product. """
+        snapshot.get_snapshot()
+        statements = []
+
+        def before_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sa.event.listen(db.engine, 'before_cursor_execute', before_execute)
+        try:
+            explore = self.client.get(url_for('main.explore', q='смартфон'))
+            product = self.client.get(url_for('main.product',
+                                              id=self.product_id))
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute',
+                            before_execute)
+        self.assertIn('Смартфон', explore.text)
+        self.assertIn('Телефоны', product.text)
+        self.assertFalse([statement for statement in statements
+                          if 'product.description' in statement])
@@ -0,0 +1,204 @@
+import unittest
+from unittest.mock import patch
+
+import sqlalchemy as sa
+from flask import url_for
+
+from app import cache, create_app, db, suggest
+from app.models import Product, ProductChange, Role, User
+from app.suggest import PrefixIndex
+from config import TestConfig
+
+
+class PrefixIndexCase(unittest.TestCase):
+    def setUp(self):
+        self.index = PrefixIndex()
+        self.index.build([(1, 'Ёлочная игрушка', 'Новогодний'),
+                          (2, 'Смартфон Galaxy', 'Samsung'),
+                          (3, 'смарт-часы', 'Samsung'),
+                          (4, 'Телевизор', None)])
+
+    def labels(self, prefix, limit=10):
+        """Получение текстов подсказок."""
+        return [item.label for item in self.index.suggest(prefix, limit)]
+
+    def test_case_folding(self):
+        """ Проверка поиска без учёта регистра и буквы ё. """
+        self.assertEqual(self.labels('СМАРТ'),
+                         ['смарт-часы', 'Смартфон Galaxy'])
+        self.assertEqual(self.labels('елоч'), ['Ёлочная игрушка'])
+        self.assertEqual(self.labels('нов'), ['Новогодний'])
+        self.assertEqual(self.labels('sam'), ['Samsung'])
+        self.assertEqual(self.labels('   '), [])
+        self.assertEqual(self.labels('смарт', limit=1), ['смарт-часы'])
+
+    def test_duplicate_brands(self):
+        """ Проверка вывода бренда один раз. """
+        self.index.build([(1, 'Смартфон', 'Samsung'),
+                          (2, 'Телевизор', 'SAMSUNG')])
+        self.assertEqual(self.labels('sam'), ['Samsung'])
+        self.assertEqual(len(self.index), 2)
+
+    def test_updated(self):
+        """ Проверка применения изменений товаров к копии индекса. """
+        index = self.index.updated(
+            7, [2, 3, 4, 5], [(2, 'Смартфон Pixel', 'Google'),
+                              (5, 'Смарт-колонка', 'Samsung')])
+        self.assertEqual(index.version, 7)
+        self.assertEqual([item.label for item in index.suggest('смарт')],
+                         ['Смарт-колонка', 'Смартфон Pixel'])
+        self.assertEqual([item.label for item in index.suggest('g')],
+                         ['Google'])
+        self.assertEqual([item.label for item in index.suggest('тел')], [])
+        self.assertEqual(len(index), 3)
+        # Исходный индекс не изменился
+        self.assertEqual(self.labels('смарт'),
+                         ['смарт-часы', 'Смартфон Galaxy'])
+        self.assertEqual(self.labels('тел'), ['Телевизор'])
+        # Повторное изменение уже изменённого товара
+        index = index.updated(8, [2, 6], [(2, 'Смартфон Pixel 2', 'Google'),
+                                          (6, 'Смарт-часы Pixel', 'Google')])
+        self.assertEqual([item.label for item in index.suggest('смарт')],
+                         ['Смарт-колонка', 'Смарт-часы Pixel',
+                          'Смартфон Pixel 2'])
+        self.assertEqual([item.label for item in index.suggest('')], [])
+        self.assertEqual([item.label for item in index.suggest('s')],
+                         ['Samsung'])
+        self.assertEqual(len(index), 4)
+
+    def test_compact(self):
+        """ Проверка переноса изменённых товаров в основную часть. """
+        with patch.object(suggest, 'COMPACT_SIZE', 1):
+            index = self.index.updated(
+                2, [1, 4], [(1, 'Игрушка', 'Новогодний')])
+        self.assertEqual((index._removed, index._added), (set(), {}))
+        self.assertEqual(index._keys, ['игрушка', 'смарт-часы',
+                                       'смартфон galaxy'])
+        self.assertEqual([item.label for item in index.suggest('и')],
+                         ['Игрушка'])
+        self.assertEqual(len(index), 3)
+
+
+class SuggestRoutesCase(unittest.TestCase):
+    def setUp(self):
+        # Создание объекта приложения
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        # Создание объекта DB
+        db.create_all()
+        # Создание и аутентификация админа
+        db.session.add(Role(name='user'))
+        db.session.add(Role(name='admin'))
+        db.session.add(Product(name='Чайник', description='', price=1,
+                               brand='Bosch'))
+        db.session.commit()
+        admin_user = User(username='admin', email='admin@example.com')
+        admin_user.set_role('admin')
+        admin_user.set_password('password')
+        db.session.add(admin_user)
+        db.session.commit()
+        self.client.post(url_for('auth.login'),
+                         data=dict(username='admin', password='password'))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def suggest(self, search_query):
+        """Получение подсказок через json endpoint."""
+        response = self.client.get(url_for('main.suggestions',
+                                           q=search_query))
+        self.assertEqual(response.status_code, 200)
+        return [item['label'] for item in response.json['suggestions']]
+
+    def test_index_built_from_database(self):
+        """ Проверка построения индекса по таблице product. """
+        self.assertEqual(self.suggest('чай'), ['Чайник'])
+        self.assertEqual(self.suggest('bo'), ['Bosch'])
+
+    def test_index_follows_admin_changes(self):
+        """ Проверка изменения индекса при изменении товаров. """
+        self.suggest('чай')  # Построение индекса
+        self.client.post(
+            url_for('admin.create_product'),
+            data=dict(name='Чайный сервиз', description='description',
+                      price=100, brand='Luminarc', stock=1))
+        self.assertEqual(self.suggest('чай'), ['Чайник', 'Чайный сервиз'])
+        product = Product.query.filter_by(name='Чайный сервиз').first()
+        self.client.post(
+            url_for('admin.edit_product', id=product.id),
+            data=dict(name='Кофейный сервиз', description='description',
+                      price=100, brand='Luminarc'))
+        self.assertEqual(self.suggest('чай'), ['Чайник'])
+        self.assertEqual(self.suggest('коф'), ['Кофейный сервиз'])
+        self.client.post(url_for('admin.delete_product', id=product.id))
+        self.assertEqual(self.suggest('коф'), [])
+        self.assertEqual(self.suggest('lum'), [])
+
+    def test_index_follows_change_log(self):
+        """ Проверка обновления индекса по журналу изменений, записанному
+        другим процессом, без перестроения снимка каталога. """
+        index = suggest.get_index()
+        catalog = self.app.extensions['snapshot']
+        product_id = db.session.scalar(sa.insert(Product).values(
+            name='Утюг', description='', price=1).returning(Product.id))
+        db.session.commit()
+        # Версия не изменилась, индекс прежний
+        self.assertIs(suggest.get_index(), index)
+        self.assertEqual(self.suggest('утюг'), [])
+        suggest.record_change(product_id, cache.bump_version(cache.CATALOG))
+        db.session.commit()
+        self.assertEqual(self.suggest('утюг'), ['Утюг'])
+        self.assertIs(self.app.extensions['snapshot'], catalog)
+        # Отменённое изменение не меняет индекс
+        index = suggest.get_index()
+        cache.bump_version(cache.CATALOG)
+        db.session.rollback()
+        self.assertIs(suggest.get_index(), index)
+        # Изменение версии без изменения товаров не копирует индекс
+        cache.bump_version(cache.CATALOG)
+        db.session.commit()
+        self.assertIs(suggest.get_index()._keys, index._keys)
+
+    def test_refresh_interval(self):
+        """ Проверка чтения версии каталога не чаще интервала. """
+        self.app.config['SUGGEST_REFRESH_INTERVAL'] = 60
+        index = suggest.get_index()
+        statements = []
+
+        def before_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sa.event.listen(db.engine, 'before_cursor_execute', before_execute)
+        try:
+            cache.bump_version(cache.CATALOG)
+            db.session.commit()
+            statements.clear()
+            self.assertIs(suggest.get_index(), index)
+        finally:
+            sa.event.remove(db.engine, 'before_cursor_execute',
+                            before_execute)
+        self.assertEqual(statements, [])
+
+    def test_old_changes_purged(self):
+        """ Проверка удаления старых записей журнала и перестроения
+        отставшего индекса. """
+        self.app.config['SUGGEST_CHANGE_LOG'] = 2
+        index = suggest.get_index()
+        product_id = db.session.scalar(sa.insert(Product).values(
+            name='Утюг', description='', price=1).returning(Product.id))
+        for _ in range(3):
+            suggest.record_change(product_id,
+                                  cache.bump_version(cache.CATALOG))
+        db.session.commit()
+        self.assertEqual(db.session.scalars(
+            sa.select(ProductChange.version)).all(),
+            [index.version + 2, index.version + 3])
+        self.assertEqual(self.suggest('утюг'), ['Утюг'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)